@@ -0,0 +1,195 @@
+from itertools import islice
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import User
+from users.search import invalidate_user_search, rebuild_user_search_index
+from courses.models import Course, Category, Module, Ressource
+from courses.stats import rebuild_course_stats
+from courses.catalog import rebuild_search_index
+from evaluations.models import Activite, Question, Choix
+from forums.models import SujetDiscussion, MessageForum
+from forums.topics import rebuild_topic_stats
+from messaging.models import Conversation, ConversationMember, Message as ChatMessage
+from messaging.inbox import refresh_last_message
+from notifications.models import Notification
+
+Enrollment = User.courses.through
+
+class Command(BaseCommand):
+    help = 'Generates a large, reproducible synthetic dataset with batched bulk inserts, for load testing and profiling.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--teachers', type=int, default=50)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--courses', type=int, default=100)
+        parser.add_argument('--enrollments-per-student', type=int, default=5)
+        parser.add_argument('--modules-per-course', type=int, default=5)
+        parser.add_argument('--ressources-per-module', type=int, default=3)
+        parser.add_argument('--quizzes-per-course', type=int, default=1)
+        parser.add_argument('--questions-per-quiz', type=int, default=10)
+        parser.add_argument('--topics-per-course', type=int, default=3)
+        parser.add_argument('--posts-per-topic', type=int, default=10)
+        parser.add_argument('--conversations', type=int, default=1000)
+        parser.add_argument('--messages-per-conversation', type=int, default=10)
+        parser.add_argument('--notifications', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per INSERT statement.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed: the same options always produce the same dataset.')
+        parser.add_argument('--prefix', default='load', help='Prefix of generated usernames, e-mails and slugs.')
+        parser.add_argument('--password', default='password', help='Password of every generated user (hashed once).')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Des utilisateurs "{prefix}-*" existent déjà: choisissez un autre --prefix.')
+        started = time.perf_counter()
+        password = make_password(options['password'])
+
+        # Les identifiants sont relus après chaque insertion: bulk_create ne les renvoie pas sur MySQL
+        self.insert(User, (
+            User(username=f'{prefix}-teacher-{i}', email=f'{prefix}-teacher-{i}@example.com', password=password,
+                 first_name=f'Enseignant{i}', last_name=prefix.capitalize(), role=User.Role.ENSEIGNANT, specialite=f'Spécialité {i % 20}')
+            for i in range(options['teachers'])
+        ))
+        self.insert(User, (
+            User(username=f'{prefix}-student-{i}', email=f'{prefix}-student-{i}@example.com', password=password,
+                 first_name=f'Etudiant{i}', last_name=prefix.capitalize(), role=User.Role.ETUDIANT, matricule=f'{prefix.upper()}{i:07d}')
+            for i in range(options['students'])
+        ))
+        teacher_ids = self.ids(User.objects.filter(username__startswith=f'{prefix}-teacher-'))
+        student_ids = self.ids(User.objects.filter(username__startswith=f'{prefix}-student-'))
+
+        self.insert(Category, (
+            Category(name=f'Catégorie {i}', slug=f'{prefix}-category-{i}')
+            for i in range(options['categories'])
+        ))
+        category_ids = self.ids(Category.objects.filter(slug__startswith=f'{prefix}-category-'))
+
+        if options['courses'] and not teacher_ids:
+            raise CommandError('Au moins un enseignant est nécessaire pour créer des cours.')
+        self.insert(Course, (
+            Course(title=f'Cours {i}', description=f'Description du cours {i}', teacher_id=self.rng.choice(teacher_ids),
+                   category_id=self.rng.choice(category_ids) if category_ids else None)
+            for i in range(options['courses'])
+        ))
+        course_ids = self.ids(Course.objects.filter(teacher_id__in=teacher_ids))
+
+        per_student = min(options['enrollments_per_student'], len(course_ids))
+        self.insert(Enrollment, (
+            Enrollment(user_id=student_id, course_id=course_id)
+            for student_id in student_ids
+            for course_id in self.rng.sample(course_ids, per_student)
+        ))
+
+        self.insert(Module, (
+            Module(course_id=course_id, title=f'Module {order}', order=order)
+            for course_id in course_ids
+            for order in range(1, options['modules_per_course'] + 1)
+        ))
+        module_ids = self.ids(Module.objects.filter(course_id__in=course_ids))
+        self.insert(Ressource, (
+            Ressource(module_id=module_id, title=f'Ressource {i}', url=f'https://example.com/{prefix}/{module_id}/{i}')
+            for module_id in module_ids
+            for i in range(options['ressources_per_module'])
+        ))
+
+        self.insert(Activite, (
+            Activite(course_id=course_id, title=f'Quiz {i}', activity_type=Activite.ActivityType.QUIZ)
+            for course_id in course_ids
+            for i in range(options['quizzes_per_course'])
+        ))
+        quiz_ids = self.ids(Activite.objects.filter(course_id__in=course_ids, activity_type=Activite.ActivityType.QUIZ))
+        self.insert(Question, (
+            Question(activite_id=quiz_id, intitule=f'Question {i}', type_question=self.rng.choice(Question.QuestionType.values))
+            for quiz_id in quiz_ids
+            for i in range(options['questions_per_quiz'])
+        ))
+        question_ids = self.ids(Question.objects.filter(activite_id__in=quiz_ids))
+        self.insert(Choix, (
+            Choix(question_id=question_id, texte=f'Choix {j}', est_correct=(j == 0))
+            for question_id in question_ids
+            for j in range(4)
+        ))
+
+        members = list(Enrollment.objects.filter(course_id__in=course_ids).values_list('course_id', 'user_id'))
+        students_by_course = {}
+        for course_id, student_id in members:
+            students_by_course.setdefault(course_id, []).append(student_id)
+        self.insert(SujetDiscussion, (
+            SujetDiscussion(cours_id=course_id, titre=f'Sujet {i}', auteur_id=self.rng.choice(students_by_course.get(course_id) or teacher_ids))
+            for course_id in course_ids
+            for i in range(options['topics_per_course'])
+        ))
+        topics = list(SujetDiscussion.objects.filter(cours_id__in=course_ids).values_list('id', 'cours_id'))
+        self.insert(MessageForum, (
+            MessageForum(sujet_id=topic_id, auteur_id=self.rng.choice(students_by_course.get(course_id) or teacher_ids), contenu=f'Réponse {i}')
+            for topic_id, course_id in topics
+            for i in range(options['posts_per_topic'])
+        ))
+
+        if student_ids and teacher_ids:
+            first_conversation = Conversation.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            # Conversations directes: une seule par paire étudiant/enseignant (participants_key est unique)
+            wanted = min(options['conversations'], len(student_ids) * len(teacher_ids))
+            keys = {}
+            while len(keys) < wanted:
+                pair = (self.rng.choice(student_ids), self.rng.choice(teacher_ids))
+                keys.setdefault(Conversation.direct_key(*pair), pair)
+            self.insert(Conversation, (Conversation(participants_key=key) for key in keys))
+            pairs = {
+                conversation_id: keys[key]
+                for conversation_id, key in Conversation.objects.filter(id__gt=first_conversation).values_list('id', 'participants_key')
+            }
+            self.insert(ConversationMember, (
+                ConversationMember(conversation_id=conversation_id, user_id=user_id)
+                for conversation_id, pair in pairs.items()
+                for user_id in pair
+            ))
+            self.insert(ChatMessage, (
+                ChatMessage(conversation_id=conversation_id, sender_id=pair[i % 2], content=f'Message {i}')
+                for conversation_id, pair in pairs.items()
+                for i in range(options['messages_per_conversation'])
+            ))
+            refresh_last_message(Conversation.objects.filter(id__gt=first_conversation))
+            # Tous les messages lus sauf le dernier de chaque conversation
+            ConversationMember.objects.filter(conversation_id__gt=first_conversation).update(last_read_message_id=Coalesce(
+                Subquery(ChatMessage.objects.filter(conversation=OuterRef('conversation')).order_by('-id').values('id')[1:2]), 0
+            ))
+
+        if student_ids:
+            self.insert(Notification, (
+                Notification(user_id=self.rng.choice(student_ids), message=f'Notification {i}', is_read=self.rng.random() < 0.7)
+                for i in range(options['notifications'])
+            ))
+
+        # bulk_create ne déclenche pas les signaux: on recalcule les statistiques dénormalisées
+        rebuild_course_stats(Course.objects.filter(pk__in=course_ids))
+        rebuild_search_index(Course.objects.filter(pk__in=course_ids))
+        rebuild_topic_stats(SujetDiscussion.objects.filter(cours_id__in=course_ids))
+        rebuild_user_search_index(User.objects.filter(pk__in=teacher_ids + student_ids))
+        invalidate_user_search()
+        self.stdout.write(self.style.SUCCESS(f'Dataset "{prefix}" generated in {time.perf_counter() - started:.1f}s.'))
+
+    def ids(self, queryset):
+        return list(queryset.order_by('id').values_list('id', flat=True))
+
+    def insert(self, model, objects):
+        """Insère les objets d'un générateur par paquets de `batch_size`, sans tout garder en mémoire."""
+        started = time.perf_counter()
+        total = 0
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+        self.stdout.write(f'{model._meta.label}: {total} row(s) in {time.perf_counter() - started:.1f}s')
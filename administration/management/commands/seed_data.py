@@ -237,15 +237,17 @@ class Command(BaseCommand):
         self.stdout.write(self.style.MIGRATE_HEADING('Creating Messaging Conversations...'))
         for _ in range(10):
             participants = random.sample(list(User.objects.all()), random.randint(2, 3))
-            conversation = Conversation.objects.create()
-            conversation.participants.set(participants)
+            if len(participants) == 2:
+                conversation, _ = Conversation.get_or_create_direct(*participants)
+            else:
+                conversation = Conversation.objects.create()
+                conversation.participants.set(participants)
             for _ in range(random.randint(3, 10)):
                 sender = random.choice(participants)
                 ChatMessage.objects.create(
                     conversation=conversation,
                     sender=sender,
                     content=fake.sentence(nb_words=10),
-                    is_read=fake.boolean(chance_of_getting_true=70),
                 )
 
         self.stdout.write(self.style.MIGRATE_HEADING('Creating Platform Settings...'))
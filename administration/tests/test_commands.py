@@ -1,5 +1,12 @@
 from django.test import TestCase
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from users.models import User
+from courses.models import Course, CourseStats, Ressource
+from evaluations.models import Choix
+from forums.models import MessageForum
+from messaging.models import Message
+from notifications.models import Notification
 from io import StringIO
 
 class ManagementCommandsTest(TestCase):
@@ -9,3 +16,40 @@ class ManagementCommandsTest(TestCase):
         self.assertIn('Migrations applied successfully.', out.getvalue())
         self.assertIn('Static files collected successfully.', out.getvalue())
         self.assertIn('Maintenance tasks completed.', out.getvalue())
+
+class GenerateLoadDatasetCommandTest(TestCase):
+    options = dict(
+        students=20, teachers=3, categories=2, courses=4, enrollments_per_student=2, modules_per_course=2,
+        ressources_per_module=2, quizzes_per_course=1, questions_per_quiz=3, topics_per_course=2, posts_per_topic=3,
+        conversations=5, messages_per_conversation=4, notifications=50, batch_size=7,
+    )
+
+    def enrollments(self, prefix):
+        return sorted(
+            (username.split('-')[-1], title)
+            for username, title in User.courses.through.objects.filter(user__username__startswith=f'{prefix}-')
+            .values_list('user__username', 'course__title')
+        )
+
+    def test_generates_requested_volumes(self):
+        call_command('generate_load_dataset', prefix='a', stdout=StringIO(), **self.options)
+        self.assertEqual(User.objects.filter(role=User.Role.ETUDIANT).count(), 20)
+        self.assertEqual(Course.objects.count(), 4)
+        self.assertEqual(User.courses.through.objects.count(), 40)
+        self.assertEqual(Ressource.objects.count(), 16)
+        self.assertEqual(Choix.objects.count(), 48)
+        self.assertEqual(MessageForum.objects.count(), 24)
+        self.assertEqual(Message.objects.count(), 20)
+        self.assertEqual(Notification.objects.count(), 50)
+        self.assertEqual(sum(CourseStats.objects.values_list('student_count', flat=True)), 40)
+
+    def test_same_seed_gives_same_dataset(self):
+        call_command('generate_load_dataset', prefix='a', stdout=StringIO(), **self.options)
+        call_command('generate_load_dataset', prefix='b', stdout=StringIO(), **self.options)
+        self.assertEqual(len(self.enrollments('a')), 40)
+        self.assertEqual(self.enrollments('a'), self.enrollments('b'))
+
+    def test_refuses_existing_prefix(self):
+        call_command('generate_load_dataset', prefix='a', stdout=StringIO(), **self.options)
+        with self.assertRaises(CommandError):
+            call_command('generate_load_dataset', prefix='a', stdout=StringIO(), **self.options)
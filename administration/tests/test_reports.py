@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from users.models import User
+from courses.models import Course
+from courses.stats import annotate_course_stats, global_stats
+from evaluations.models import Activite, Soumission, Tentative
+
+class CourseStatsTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.ENSEIGNANT)
+        self.students = [User.objects.create_user(username=f'student{i}', password='password', role=User.Role.ETUDIANT) for i in range(3)]
+        self.course = Course.objects.create(title='Stats Course', description='Desc', teacher=self.teacher)
+        self.course.students.add(*self.students)
+        devoir = Activite.objects.create(course=self.course, title='Devoir', activity_type=Activite.ActivityType.DEVOIR)
+        Activite.objects.create(course=self.course, title='Devoir 2', activity_type=Activite.ActivityType.DEVOIR)
+        quiz = Activite.objects.create(course=self.course, title='Quiz', activity_type=Activite.ActivityType.QUIZ)
+        Soumission.objects.create(activite=devoir, etudiant=self.students[0], fichier='a.pdf', note=10)
+        Soumission.objects.create(activite=devoir, etudiant=self.students[1], fichier='b.pdf', note=16)
+        Tentative.objects.create(activite=quiz, etudiant=self.students[0], score=3)
+        self.empty_course = Course.objects.create(title='Empty Course', description='Desc', teacher=self.teacher)
+
+    def test_annotated_values(self):
+        stats = {course.pk: course for course in annotate_course_stats()}
+        course = stats[self.course.pk]
+        self.assertEqual(course.student_count, 3)
+        self.assertEqual(course.assignment_count, 2)
+        self.assertEqual(course.quiz_count, 1)
+        self.assertEqual(course.avg_assignment_grade, 13)
+        self.assertEqual(course.avg_quiz_score, 3)
+        empty = stats[self.empty_course.pk]
+        self.assertEqual((empty.student_count, empty.assignment_count, empty.quiz_count), (0, 0, 0))
+        self.assertEqual((empty.avg_assignment_grade, empty.avg_quiz_score), (0, 0))
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            list(annotate_course_stats())
+
+    def test_global_stats(self):
+        stats = global_stats()
+        self.assertEqual(stats['total_users'], 4)
+        self.assertEqual(stats['total_students'], 3)
+        self.assertEqual(stats['total_teachers'], 1)
+        self.assertEqual(stats['total_courses'], 2)
+        self.assertEqual(stats['total_enrollments'], 3)
+
+    def test_reports_page_query_count_is_constant(self):
+        admin = User.objects.create_user(username='admin', password='password', role=User.Role.ADMIN, is_staff=True, is_superuser=True)
+        client = Client()
+        client.force_login(admin)
+        url = reverse('administration:reports_page')
+        client.get(url)
+
+        with CaptureQueriesContext(connection) as before:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        for i in range(20):
+            course = Course.objects.create(title=f'Course {i}', description='Desc', teacher=self.teacher)
+            course.students.add(*self.students)
+            Activite.objects.create(course=course, title='Quiz', activity_type=Activite.ActivityType.QUIZ)
+
+        with CaptureQueriesContext(connection) as after:
+            response = client.get(url)
+        self.assertEqual(len(after), len(before))
+        self.assertContains(response, 'Course 19')
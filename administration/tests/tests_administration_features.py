@@ -1,7 +1,9 @@
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
 from users.models import User
 from courses.models import Course, Module, Ressource, Category, CourseProgress
+from courses.progress import course_progress_data
 from evaluations.models import Activite, Soumission, Tentative
 import json
 import os
@@ -58,6 +60,17 @@ class AdministrationAPITest(TestCase):
         self.student_user = User.objects.create_user(username='student', email='student@example.com', password='password', role=User.Role.ETUDIANT)
 
     # User Management API Tests
+    def test_user_search_api(self):
+        cache.clear()
+        self.client.login(username='admin', password='password')
+        response = self.client.get(reverse('administration:api_user_search'), {'q': 'teach', 'role': User.Role.ENSEIGNANT})
+        self.assertEqual([user['id'] for user in response.json()['users']], [self.teacher_user.id])
+        response = self.client.get(reverse('administration:api_user_search'), {'q': 'teach', 'role': 'INCONNU'})
+        self.assertEqual(response.status_code, 400)
+        self.client.login(username='teacher', password='password')
+        response = self.client.get(reverse('administration:api_user_search'), {'q': 'teach'})
+        self.assertNotEqual(response.status_code, 200)
+
     def test_create_user_api_admin(self):
         self.client.login(username='admin', password='password')
         response = self.client.post(reverse('administration:api_create_user'),
@@ -205,6 +218,18 @@ class CourseProgressViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, '50.00%')
 
+    def test_course_progress_view_is_read_only_and_constant_queries(self):
+        students = [User.objects.create_user(username=f'student{i}', password='password', role=User.Role.ETUDIANT) for i in range(5)]
+        self.course.students.add(*students)
+        progress = CourseProgress.objects.create(student=students[0], course=self.course)
+        progress.completed_ressources.add(self.ressource1, self.ressource2)
+        data = {row['student'].pk: row for row in course_progress_data(self.course)}
+        self.assertEqual(data[students[0].pk]['progress'], 100)
+        self.assertEqual(data[students[1].pk]['completed_ressources'], 0)
+        self.assertEqual(CourseProgress.objects.count(), 1)
+        with self.assertNumQueries(3):
+            course_progress_data(self.course)
+
 class CategoryManagementTest(TestCase):
     def setUp(self):
         self.client = Client()
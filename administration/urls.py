@@ -11,6 +11,7 @@ urlpatterns = [
     path('categories/', views.category_management_page, name='category_management_page'),
 
     # Les "API" pour les actions en arrière-plan
+    path('api/users/search/', views.user_search, name='api_user_search'),
     path('api/users/create/', views.create_user, name='api_create_user'),
     path('api/users/<int:user_id>/', views.user_detail, name='api_user_detail'),
     path('api/users/<int:user_id>/update/', views.update_user, name='api_update_user'),
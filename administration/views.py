@@ -3,22 +3,33 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from users.models import User
 from users.forms import CustomUserCreationForm, CustomUserChangeForm
-from courses.models import Course, Module, Ressource, Category, CourseProgress
+from users.search import search_users
+from courses.models import Course, Module, Category
 from courses.forms import CourseForm, ModuleForm, RessourceForm, CategoryForm
-from django.db.models import Avg, Count
-from evaluations.models import Activite, Soumission, Tentative
+from courses.stats import course_stats_report, global_stats
+from courses.progress import course_progress_data
+from courses.permissions import permissions_for
 from .decorators import admin_required, course_owner_or_admin_required
 import json
 from django.contrib import messages
 from django.contrib.admin.models import LogEntry, ADDITION, CHANGE, DELETION
 from django.contrib.contenttypes.models import ContentType
 from django.utils.text import slugify
+from django.db import transaction
 
 @admin_required
 def user_management_page(request):
     users = User.objects.all().order_by('last_name')
     return render(request, 'administration/user_management.html', {'users': users})
 
+@admin_required
+def user_search(request):
+    """Sélecteur d'utilisateurs de l'administration: même index de préfixes que la messagerie."""
+    role = request.GET.get('role')
+    if role and role not in User.Role.values:
+        return JsonResponse({'status': 'error', 'message': 'Rôle inconnu.'}, status=400)
+    return JsonResponse({'users': search_users(request.GET.get('q', ''), role=role)})
+
 @admin_required
 def course_management_page(request):
     courses = Course.objects.all().order_by('-created_at')
@@ -28,7 +39,7 @@ def course_management_page(request):
 
 @course_owner_or_admin_required
 def course_detail_page(request, course_id):
-    course = Course.objects.get(pk=course_id)
+    course = permissions_for(request).get(Course, course_id)
     enrolled_students = course.students.all()
     activites = course.activites.all().order_by('-created_at')
     annonces = course.annonces.all()
@@ -45,16 +56,18 @@ def course_detail_page(request, course_id):
 def create_user(request):
     form = CustomUserCreationForm(request.POST, request.FILES)
     if form.is_valid():
-        user = form.save()
-        # Log the action
-        LogEntry.objects.log_action(
-            user_id=request.user.id,
-            content_type_id=ContentType.objects.get_for_model(user).pk,
-            object_id=user.pk,
-            object_repr=str(user),
-            action_flag=ADDITION,
-            change_message=f'Utilisateur {user.username} créé.'
-        )
+        # L'utilisateur et son e-mail de bienvenue (outbox) sont écrits ensemble
+        with transaction.atomic():
+            user = form.save()
+            # Log the action
+            LogEntry.objects.log_action(
+                user_id=request.user.id,
+                content_type_id=ContentType.objects.get_for_model(user).pk,
+                object_id=user.pk,
+                object_repr=str(user),
+                action_flag=ADDITION,
+                change_message=f'Utilisateur {user.username} créé.'
+            )
         user_data = {
             'id': user.id,
             'username': user.username,
@@ -285,19 +298,7 @@ def unlock_user(request, user_id):
 @admin_required
 def course_progress_view(request, course_id):
     course = get_object_or_404(Course, pk=course_id)
-    students = course.students.all()
-    progress_data = []
-    for student in students:
-        progress, created = CourseProgress.objects.get_or_create(student=student, course=course)
-        total_ressources = Ressource.objects.filter(module__course=course).count()
-        completed_ressources = progress.completed_ressources.count()
-        progress_percentage = (completed_ressources / total_ressources) * 100 if total_ressources > 0 else 0
-        progress_data.append({
-            'student': student,
-            'progress': progress_percentage,
-            'completed_ressources': completed_ressources,
-            'total_ressources': total_ressources
-        })
+    progress_data = course_progress_data(course)
     return render(request, 'administration/course_progress.html', {'course': course, 'progress_data': progress_data})
 
 @admin_required
@@ -380,38 +381,9 @@ def update_category(request, category_id):
 
 @admin_required
 def reports_page(request):
-    courses = Course.objects.all()
-    reports = []
-    for course in courses:
-        student_count = course.students.count()
-        assignment_count = Activite.objects.filter(course=course, activity_type='DEVOIR').count()
-        quiz_count = Activite.objects.filter(course=course, activity_type='QUIZ').count()
-        avg_assignment_grade = Soumission.objects.filter(activite__course=course).aggregate(Avg('note'))['note__avg'] or 0
-        avg_quiz_score = Tentative.objects.filter(activite__course=course).aggregate(Avg('score'))['score__avg'] or 0
-        
-        reports.append({
-            'course': course,
-            'student_count': student_count,
-            'assignment_count': assignment_count,
-            'quiz_count': quiz_count,
-            'avg_assignment_grade': avg_assignment_grade,
-            'avg_quiz_score': avg_quiz_score
-        })
-
-    # Global statistics
-    total_users = User.objects.count()
-    total_students = User.objects.filter(role=User.Role.ETUDIANT).count()
-    total_teachers = User.objects.filter(role=User.Role.ENSEIGNANT).count()
-    total_courses = Course.objects.count()
-    total_enrollments = User.objects.filter(role=User.Role.ETUDIANT).aggregate(Count('courses'))['courses__count']
-    
     context = {
-        'reports': reports,
-        'total_users': total_users,
-        'total_students': total_students,
-        'total_teachers': total_teachers,
-        'total_courses': total_courses,
-        'total_enrollments': total_enrollments,
+        'reports': course_stats_report(),
+        **global_stats(),
     }
     return render(request, 'administration/reports.html', context)
 
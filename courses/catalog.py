@@ -0,0 +1,108 @@
+import base64
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from e_istc.text import tokenize as tokenize_text
+from .models import Course, CourseSearchTerm
+
+CATALOG_PAGE_SIZE = 12
+# Configuration plein texte PostgreSQL (contenu en français)
+SEARCH_CONFIG = 'french'
+TERM_MAX_LENGTH = CourseSearchTerm._meta.get_field('term').max_length
+
+def uses_postgres_search():
+    return connection.vendor == 'postgresql'
+
+def search_vector():
+    # Même expression que l'index GIN créé par la migration courses 0010
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector('title', 'description', config=SEARCH_CONFIG)
+
+def tokenize(text):
+    """Termes normalisés d'un texte: minuscules, sans accents, d'au moins deux caractères."""
+    return tokenize_text(text, TERM_MAX_LENGTH)
+
+def index_courses(courses):
+    """Recalcule l'index inversé des cours donnés (sans effet sous PostgreSQL, qui utilise son index GIN)."""
+    if uses_postgres_search():
+        return
+    courses = list(courses)
+    with transaction.atomic():
+        CourseSearchTerm.objects.filter(course__in=courses).delete()
+        CourseSearchTerm.objects.bulk_create([
+            CourseSearchTerm(course=course, term=term)
+            for course in courses
+            for term in tokenize(f'{course.title} {course.description}')
+        ], batch_size=1000)
+
+def rebuild_search_index(courses=None, batch_size=500):
+    if courses is None:
+        courses = Course.objects.all()
+    courses = courses.order_by('pk').only('pk', 'title', 'description')
+    last_pk = 0
+    while True:
+        batch = list(courses.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        index_courses(batch)
+        last_pk = batch[-1].pk
+
+def search_courses(courses, query):
+    """Filtre `courses` sur les cours dont le titre ou la description contient tous les mots de `query`."""
+    if uses_postgres_search():
+        from django.contrib.postgres.search import SearchQuery
+        return courses.annotate(search=search_vector()).filter(
+            search=SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        )
+    tokens = tokenize(query)
+    if not tokens:
+        return courses.none()
+    for token in tokens:
+        # Recherche par préfixe sur l'index (term, course_id)
+        courses = courses.filter(pk__in=CourseSearchTerm.objects.filter(term__startswith=token).values('course_id'))
+    return courses
+
+def encode_cursor(course):
+    return base64.urlsafe_b64encode(f'{course.created_at.isoformat()}|{course.pk}'.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+def catalog_page(query=None, category=None, cursor=None, page_size=CATALOG_PAGE_SIZE):
+    """
+    Une page du catalogue, du plus récent au plus ancien, paginée par curseur sur
+    (created_at, id): le coût d'une page ne dépend pas de sa position.
+    Retourne les cours, le curseur de la page suivante, le nombre total de résultats et
+    les facettes par catégorie (calculées sur la recherche, sans le filtre de catégorie).
+    """
+    courses = Course.objects.all()
+    if query:
+        courses = search_courses(courses, query)
+    facets = list(
+        courses.values('category_id', 'category__name', 'category__slug')
+        .annotate(count=Count('pk'))
+        .order_by('category__name')
+    )
+    if category:
+        courses = courses.filter(category__slug=category)
+    total = courses.count()
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        created_at, pk = position
+        courses = courses.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    page = list(courses.select_related('category').order_by('-created_at', '-pk')[:page_size + 1])
+    has_next = len(page) > page_size
+    page = page[:page_size]
+    return {
+        'courses': page,
+        'next_cursor': encode_cursor(page[-1]) if has_next else None,
+        'total': total,
+        'facets': facets,
+    }
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from courses.models import Course, CourseStats
+from courses.stats import annotate_course_totals, rebuild_course_stats, STATS_FIELDS
+
+class Command(BaseCommand):
+    help = 'Recomputes every CourseStats row from the source tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids', help='Only rebuild the given course id (repeatable).')
+        parser.add_argument('--check', action='store_true', help='Report courses whose stored stats differ from the source tables, without writing.')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+
+        if options['check']:
+            stored = {stats.course_id: stats for stats in CourseStats.objects.filter(course__in=courses)}
+            drifted = 0
+            for row in annotate_course_totals(courses).values('pk', 'title', *STATS_FIELDS):
+                stats = stored.get(row['pk'])
+                differences = [
+                    field for field in STATS_FIELDS
+                    if stats is None or abs(getattr(stats, field) - row[field]) > 1e-6
+                ]
+                if differences:
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(f"{row['title']} (ID: {row['pk']}): {', '.join(differences)}"))
+            self.stdout.write(self.style.SUCCESS(f'{drifted} course(s) with drifted stats.'))
+            return
+
+        count = rebuild_course_stats(courses)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} course(s).'))
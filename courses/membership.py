@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import User
+from .models import Course
+
+Enrollment = User.courses.through
+
+ENROLLED_CACHE_KEY = 'courses:enrolled:{user_id}'
+ENROLLED_CACHE_TIMEOUT = 60 * 60
+# Cache propre à chaque processus: l'invalidation n'atteint pas les autres workers,
+# la durée de vie borne donc le temps pendant lequel un désinscrit garde l'accès
+ENROLLED_LOCAL_CACHE_TIMEOUT = 30
+
+def _key(user_id):
+    return ENROLLED_CACHE_KEY.format(user_id=user_id)
+
+def get_enrolled_cache_timeout():
+    return ENROLLED_CACHE_TIMEOUT if getattr(settings, 'CACHE_IS_SHARED', False) else ENROLLED_LOCAL_CACHE_TIMEOUT
+
+def enrolled_course_ids(user):
+    """
+    Identifiants des cours auxquels l'utilisateur est inscrit, lus depuis le cache quand
+    c'est possible. Sinon une seule requête, couverte par l'index unique (user_id, course_id)
+    de la table d'inscription, au lieu de charger tous les étudiants du cours.
+    """
+    key = _key(user.pk)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(Enrollment.objects.filter(user_id=user.pk).values_list('course_id', flat=True))
+        cache.set(key, course_ids, get_enrolled_cache_timeout())
+    return course_ids
+
+def is_enrolled(user, course):
+    """Inscription de l'utilisateur au cours (accepte un cours ou son identifiant)."""
+    return getattr(course, 'pk', course) in enrolled_course_ids(user)
+
+def is_teacher(user, course):
+    """Enseignant du cours: sans requête si le cours est déjà chargé, sinon un EXISTS."""
+    if isinstance(course, Course):
+        return course.teacher_id == user.pk
+    return Course.objects.filter(pk=course, teacher_id=user.pk).exists()
+
+def is_admin(user):
+    return user.role == User.Role.ADMIN
+
+def can_access_course(user, course):
+    """Administrateur, enseignant du cours ou étudiant inscrit."""
+    if not user.is_authenticated:
+        return False
+    return is_admin(user) or is_teacher(user, course) or is_enrolled(user, course)
+
+def invalidate_enrolled_courses(user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
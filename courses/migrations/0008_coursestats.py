@@ -0,0 +1,77 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_course_stats(apps, schema_editor):
+    """
+    Une ligne CourseStats par cours existant, calculée depuis les tables sources.
+    Logique de courses.stats.rebuild_course_stats recopiée ici: la migration ne doit
+    pas dépendre du code applicatif, qui évoluera.
+    """
+    Course = apps.get_model('courses', 'Course')
+    CourseStats = apps.get_model('courses', 'CourseStats')
+    User = apps.get_model('users', 'User')
+    Activite = apps.get_model('evaluations', 'Activite')
+    Soumission = apps.get_model('evaluations', 'Soumission')
+    Tentative = apps.get_model('evaluations', 'Tentative')
+    Enrollment = User._meta.get_field('courses').remote_field.through
+
+    stats = {course_id: CourseStats(course_id=course_id) for course_id in Course.objects.values_list('pk', flat=True)}
+
+    def apply(rows, group_by, **fields):
+        for row in rows:
+            for field, key in fields.items():
+                setattr(stats[row[group_by]], field, row[key] or 0)
+
+    apply(Enrollment.objects.values('course_id').annotate(students=Count('pk')).order_by(), 'course_id', student_count='students')
+    apply(
+        Activite.objects.values('course_id').annotate(
+            devoirs=Count('pk', filter=Q(activity_type='DEVOIR')),
+            quiz=Count('pk', filter=Q(activity_type='QUIZ')),
+            sondages=Count('pk', filter=Q(activity_type='SONDAGE')),
+        ).order_by(),
+        'course_id', assignment_count='devoirs', quiz_count='quiz', sondage_count='sondages',
+    )
+    apply(
+        Soumission.objects.values('activite__course_id').annotate(
+            submissions=Count('pk'), graded=Count('note'), grades=Sum('note'),
+        ).order_by(),
+        'activite__course_id', submission_count='submissions', graded_submission_count='graded', grade_sum='grades',
+    )
+    apply(
+        Tentative.objects.values('activite__course_id').annotate(attempts=Count('pk'), scores=Sum('score')).order_by(),
+        'activite__course_id', attempt_count='attempts', score_sum='scores',
+    )
+    CourseStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_category_icon_course_image'),
+        ('evaluations', '0003_soumission_commentaires_enseignant'),
+        ('users', '0002_user_courses'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='courses.course')),
+                ('student_count', models.IntegerField(default=0)),
+                ('assignment_count', models.IntegerField(default=0)),
+                ('quiz_count', models.IntegerField(default=0)),
+                ('sondage_count', models.IntegerField(default=0)),
+                ('submission_count', models.IntegerField(default=0)),
+                ('graded_submission_count', models.IntegerField(default=0)),
+                ('grade_sum', models.FloatField(default=0)),
+                ('attempt_count', models.IntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_course_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    CourseProgress = apps.get_model('courses', 'CourseProgress')
+    Ressource = apps.get_model('courses', 'Ressource')
+    CompletedRessource = CourseProgress.completed_ressources.through
+    totals = dict(Ressource.objects.values('module__course').annotate(n=Count('pk')).values_list('module__course', 'n'))
+    completed = dict(CompletedRessource.objects.values('courseprogress').annotate(n=Count('pk')).values_list('courseprogress', 'n'))
+    progresses = list(CourseProgress.objects.all())
+    for progress in progresses:
+        progress.total_count = totals.get(progress.course_id, 0)
+        progress.completed_count = completed.get(progress.pk, 0)
+    CourseProgress.objects.bulk_update(progresses, ['total_count', 'completed_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_coursestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseprogress',
+            name='completed_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='courseprogress',
+            name='total_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
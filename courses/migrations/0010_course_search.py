@@ -0,0 +1,76 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:10
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Copies figées de courses.catalog (SEARCH_CONFIG, tokenize): la migration ne doit pas
+# changer de comportement quand le code applicatif évolue
+SEARCH_CONFIG = 'french'
+SEARCH_INDEX_NAME = 'courses_course_search_gin'
+TERM_MAX_LENGTH = 64
+
+
+def tokenize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return {token[:TERM_MAX_LENGTH] for token in re.findall(r'\w+', text) if len(token) > 1}
+
+
+def search_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+    return GinIndex(SearchVector('title', 'description', config=SEARCH_CONFIG), name=SEARCH_INDEX_NAME)
+
+
+def build_search_index(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    if schema_editor.connection.vendor == 'postgresql':
+        # Index GIN sur l'expression utilisée par courses.catalog.search_courses
+        schema_editor.add_index(Course, search_index())
+        return
+    CourseSearchTerm = apps.get_model('courses', 'CourseSearchTerm')
+    CourseSearchTerm.objects.bulk_create([
+        CourseSearchTerm(course_id=pk, term=term)
+        for pk, title, description in Course.objects.values_list('pk', 'title', 'description').iterator()
+        for term in tokenize(f'{title} {description}')
+    ], batch_size=1000)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('courses', 'Course'), search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_courseprogress_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['created_at', 'id'], name='courses_course_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='coursesearchterm',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='courses.course'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='coursesearchterm',
+            unique_together={('term', 'course')},
+        ),
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
@@ -20,6 +20,12 @@ class Course(models.Model):
     visio_link = models.URLField(blank=True, null=True)
     visio_date = models.DateTimeField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Pagination par curseur du catalogue (courses/catalog.py)
+            models.Index(fields=['created_at', 'id'], name='courses_course_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -27,10 +33,69 @@ class CourseProgress(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_progress')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='progress')
     completed_ressources = models.ManyToManyField('Ressource', blank=True)
+    # Compteurs dénormalisés, tenus à jour par courses/signals.py
+    completed_count = models.IntegerField(default=0)
+    total_count = models.IntegerField(default=0)
 
     class Meta:
         unique_together = ('student', 'course')
 
+    @property
+    def percentage(self):
+        return (self.completed_count / self.total_count) * 100 if self.total_count > 0 else 0
+
+    @classmethod
+    def get_or_create_for(cls, student, course):
+        """get_or_create qui initialise le total des ressources du cours à la création."""
+        return cls.objects.get_or_create(
+            student=student,
+            course=course,
+            defaults={'total_count': Ressource.objects.filter(module__course=course).count()},
+        )
+
+class CourseStats(models.Model):
+    """
+    Statistiques précalculées d'un cours, tenues à jour par les signaux de courses/signals.py.
+    La commande `rebuild_course_stats` les recalcule entièrement.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    student_count = models.IntegerField(default=0)
+    assignment_count = models.IntegerField(default=0)
+    quiz_count = models.IntegerField(default=0)
+    sondage_count = models.IntegerField(default=0)
+    submission_count = models.IntegerField(default=0)
+    graded_submission_count = models.IntegerField(default=0)
+    grade_sum = models.FloatField(default=0)
+    attempt_count = models.IntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Statistiques de {self.course}"
+
+    @property
+    def activity_count(self):
+        return self.assignment_count + self.quiz_count + self.sondage_count
+
+    @property
+    def avg_assignment_grade(self):
+        return self.grade_sum / self.graded_submission_count if self.graded_submission_count else 0
+
+    @property
+    def avg_quiz_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+
+class CourseSearchTerm(models.Model):
+    """
+    Index inversé (terme -> cours) de la recherche du catalogue, utilisé quand la base
+    n'est pas PostgreSQL (MySQL en local, SQLite pour les tests). Voir courses/catalog.py.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ('term', 'course')
+
 class Annonce(models.Model):
     cours = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='annonces')
     titre = models.CharField(max_length=255)
@@ -0,0 +1,100 @@
+from functools import wraps
+
+from django.core.exceptions import PermissionDenied
+
+from users.models import User
+from evaluations.models import Activite, Question, Soumission, QuestionSondage
+from .models import Course, Module, Ressource, Annonce
+from .membership import can_access_course
+
+# Chemin (select_related) de chaque objet protégé vers son cours
+COURSE_PATHS = {
+    Course: None,
+    Module: 'course',
+    Ressource: 'module__course',
+    Annonce: 'cours',
+    Activite: 'course',
+    Question: 'activite__course',
+    Soumission: 'activite__course',
+    QuestionSondage: 'activite__course',
+}
+
+class CoursePermissions:
+    """
+    Résolveur de permissions propre à une requête: chaque objet est chargé une seule fois
+    avec son cours (select_related), puis réutilisé par le décorateur et par la vue.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._objects = {}
+
+    @property
+    def is_admin(self):
+        return self.user.is_authenticated and self.user.role == User.Role.ADMIN
+
+    def get(self, model, pk):
+        """Objet `model` d'identifiant `pk`, avec son cours. Lève model.DoesNotExist s'il n'existe pas."""
+        key = (model, str(pk))
+        if key not in self._objects:
+            path = COURSE_PATHS[model]
+            queryset = model.objects.select_related(path) if path else model.objects.all()
+            self._objects[key] = queryset.filter(pk=pk).first()
+        obj = self._objects[key]
+        if obj is None:
+            raise model.DoesNotExist(f'{model.__name__} {pk} introuvable.')
+        return obj
+
+    def course_of(self, obj):
+        path = COURSE_PATHS[type(obj)]
+        for attr in path.split('__') if path else []:
+            obj = getattr(obj, attr)
+        return obj
+
+    def can_manage(self, obj):
+        """Administrateur, ou enseignant du cours de l'objet."""
+        if not self.user.is_authenticated:
+            return False
+        return self.is_admin or self.course_of(obj).teacher_id == self.user.pk
+
+    def can_participate(self, obj):
+        """Administrateur, enseignant ou étudiant inscrit au cours de l'objet."""
+        return can_access_course(self.user, self.course_of(obj))
+
+def permissions_for(request):
+    """Résolveur de la requête, créé au premier appel."""
+    permissions = getattr(request, '_course_permissions', None)
+    if permissions is None or permissions.user is not request.user:
+        permissions = request._course_permissions = CoursePermissions(request.user)
+    return permissions
+
+def course_permission_required(lookups, check='manage', admin_if_missing=False):
+    """
+    Fabrique de décorateurs: `lookups` associe un argument de l'URL au modèle qu'il désigne
+    (le premier présent est utilisé). `check` vaut 'manage' ou 'participate'.
+    Si l'objet n'existe pas, la vue est appelée pour un administrateur quand
+    `admin_if_missing` est vrai (elle renvoie alors sa propre 404), sinon 403.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                raise PermissionDenied
+            permissions = permissions_for(request)
+            for kwarg, model in lookups:
+                if kwargs.get(kwarg) is not None:
+                    break
+            else:
+                raise PermissionDenied
+            try:
+                obj = permissions.get(model, kwargs[kwarg])
+            except model.DoesNotExist:
+                if admin_if_missing and permissions.is_admin:
+                    return view_func(request, *args, **kwargs)
+                raise PermissionDenied
+            allowed = permissions.can_manage(obj) if check == 'manage' else permissions.can_participate(obj)
+            if not allowed:
+                raise PermissionDenied
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,30 @@
+from django.db.models import Count
+
+from .models import CourseProgress, Ressource
+
+CompletedRessource = CourseProgress.completed_ressources.through
+
+def course_progress_data(course):
+    """
+    Progression de chaque étudiant inscrit au cours, en un nombre fixe de requêtes:
+    le total des ressources, les étudiants, puis un comptage groupé sur la table
+    des ressources terminées. Aucune ligne CourseProgress n'est créée.
+    """
+    total_ressources = Ressource.objects.filter(module__course=course).count()
+    completed_by_student = dict(
+        CompletedRessource.objects
+        .filter(courseprogress__course=course, ressource__module__course=course)
+        .values('courseprogress__student')
+        .annotate(completed=Count('pk'))
+        .values_list('courseprogress__student', 'completed')
+    )
+    progress_data = []
+    for student in course.students.all():
+        completed_ressources = completed_by_student.get(student.pk, 0)
+        progress_data.append({
+            'student': student,
+            'progress': (completed_ressources / total_ressources) * 100 if total_ressources > 0 else 0,
+            'completed_ressources': completed_ressources,
+            'total_ressources': total_ressources,
+        })
+    return progress_data
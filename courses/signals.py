@@ -0,0 +1,200 @@
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from users.models import User
+from evaluations.models import Activite, Soumission, Tentative
+from django.db import transaction
+from django.db.models import F
+from .models import Course, CourseStats, CourseProgress, Ressource
+from .stats import bump_course_stats
+from .membership import invalidate_enrolled_courses
+from .catalog import index_courses
+
+ACTIVITY_COUNTERS = {
+    Activite.ActivityType.DEVOIR: 'assignment_count',
+    Activite.ActivityType.QUIZ: 'quiz_count',
+    Activite.ActivityType.SONDAGE: 'sondage_count',
+}
+
+def _course_id_for_activite(activite_id):
+    return Activite.objects.filter(pk=activite_id).values_list('course_id', flat=True).first()
+
+def _previous_values(sender, instance, *fields):
+    """Valeurs en base avant la sauvegarde (None pour une création)."""
+    if instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+@receiver(post_save, sender=Course)
+def create_course_stats(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.objects.get_or_create(course=instance)
+
+# Activités
+
+@receiver(pre_save, sender=Activite)
+def remember_activite_type(sender, instance, **kwargs):
+    instance._stats_previous = _previous_values(sender, instance, 'course_id', 'activity_type')
+
+@receiver(post_save, sender=Activite)
+def update_activite_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stats_previous', None)
+    if previous and (previous['course_id'], previous['activity_type']) != (instance.course_id, instance.activity_type):
+        if previous['activity_type'] in ACTIVITY_COUNTERS:
+            bump_course_stats(previous['course_id'], **{ACTIVITY_COUNTERS[previous['activity_type']]: -1})
+        previous = None
+    if previous is None and instance.activity_type in ACTIVITY_COUNTERS:
+        bump_course_stats(instance.course_id, **{ACTIVITY_COUNTERS[instance.activity_type]: 1})
+
+@receiver(post_delete, sender=Activite)
+def remove_activite_stats(sender, instance, **kwargs):
+    if instance.activity_type in ACTIVITY_COUNTERS:
+        bump_course_stats(instance.course_id, **{ACTIVITY_COUNTERS[instance.activity_type]: -1})
+
+# Soumissions (devoirs)
+
+def _soumission_deltas(note, sign):
+    deltas = {'submission_count': sign}
+    if note is not None:
+        deltas.update(graded_submission_count=sign, grade_sum=sign * note)
+    return deltas
+
+@receiver(pre_save, sender=Soumission)
+def remember_soumission_note(sender, instance, **kwargs):
+    instance._stats_previous = _previous_values(sender, instance, 'activite_id', 'note')
+
+@receiver(post_save, sender=Soumission)
+def update_soumission_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stats_previous', None)
+    if previous and (previous['activite_id'], previous['note']) == (instance.activite_id, instance.note):
+        return
+    if previous:
+        bump_course_stats(_course_id_for_activite(previous['activite_id']), **_soumission_deltas(previous['note'], -1))
+    bump_course_stats(_course_id_for_activite(instance.activite_id), **_soumission_deltas(instance.note, 1))
+
+@receiver(post_delete, sender=Soumission)
+def remove_soumission_stats(sender, instance, **kwargs):
+    bump_course_stats(_course_id_for_activite(instance.activite_id), **_soumission_deltas(instance.note, -1))
+
+# Tentatives (quiz)
+
+@receiver(pre_save, sender=Tentative)
+def remember_tentative_score(sender, instance, **kwargs):
+    instance._stats_previous = _previous_values(sender, instance, 'activite_id', 'score')
+
+@receiver(post_save, sender=Tentative)
+def update_tentative_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stats_previous', None)
+    if previous and (previous['activite_id'], previous['score']) == (instance.activite_id, instance.score):
+        return
+    if previous:
+        bump_course_stats(_course_id_for_activite(previous['activite_id']), attempt_count=-1, score_sum=-previous['score'])
+    bump_course_stats(_course_id_for_activite(instance.activite_id), attempt_count=1, score_sum=instance.score)
+
+@receiver(post_delete, sender=Tentative)
+def remove_tentative_stats(sender, instance, **kwargs):
+    bump_course_stats(_course_id_for_activite(instance.activite_id), attempt_count=-1, score_sum=-instance.score)
+
+# Inscriptions (User.courses)
+
+@receiver(m2m_changed, sender=User.courses.through)
+def update_enrollment_stats(sender, instance, action, reverse, model, pk_set, **kwargs):
+    # reverse=True: course.students.add(...), instance est le cours; sinon user.courses.add(...)
+    if action == 'pre_remove':
+        # pk_set contient aussi les valeurs absentes de la relation: on ne garde que les inscriptions réelles
+        if reverse:
+            instance._stats_removed = set(sender.objects.filter(course_id=instance.pk, user_id__in=pk_set).values_list('user_id', flat=True))
+        else:
+            instance._stats_removed = set(sender.objects.filter(user_id=instance.pk, course_id__in=pk_set).values_list('course_id', flat=True))
+        return
+    if action == 'pre_clear':
+        if reverse:
+            instance._stats_removed = set(sender.objects.filter(course_id=instance.pk).values_list('user_id', flat=True))
+        else:
+            instance._stats_removed = set(sender.objects.filter(user_id=instance.pk).values_list('course_id', flat=True))
+        return
+    if action == 'post_add':
+        changed, delta = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        changed, delta = getattr(instance, '_stats_removed', set()), -1
+    else:
+        return
+    if not changed:
+        return
+    if reverse:
+        bump_course_stats(instance.pk, student_count=delta * len(changed))
+    else:
+        for course_id in changed:
+            bump_course_stats(course_id, student_count=delta)
+
+@receiver(pre_delete, sender=User)
+def remove_deleted_user_enrollments(sender, instance, **kwargs):
+    # La suppression d'un utilisateur efface ses inscriptions sans émettre m2m_changed
+    for course_id in User.courses.through.objects.filter(user_id=instance.pk).values_list('course_id', flat=True):
+        bump_course_stats(course_id, student_count=-1)
+
+# Cache des cours suivis par chaque utilisateur (courses/membership.py)
+
+def _invalidate_enrolled_courses(user_ids):
+    # Tout de suite, puis après le commit pour écarter une relecture concurrente
+    user_ids = list(user_ids)
+    invalidate_enrolled_courses(user_ids)
+    transaction.on_commit(lambda: invalidate_enrolled_courses(user_ids))
+
+@receiver(m2m_changed, sender=User.courses.through)
+def invalidate_enrollment_cache(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _invalidate_enrolled_courses([instance.pk])
+    elif action == 'pre_clear':
+        instance._membership_cleared = list(sender.objects.filter(course_id=instance.pk).values_list('user_id', flat=True))
+    elif action == 'post_clear':
+        _invalidate_enrolled_courses(getattr(instance, '_membership_cleared', []))
+    elif action in ('post_add', 'post_remove'):
+        _invalidate_enrolled_courses(pk_set)
+
+@receiver(pre_delete, sender=Course)
+def invalidate_deleted_course_enrollments(sender, instance, **kwargs):
+    _invalidate_enrolled_courses(User.courses.through.objects.filter(course_id=instance.pk).values_list('user_id', flat=True))
+
+# Progression des étudiants (CourseProgress)
+
+@receiver(post_save, sender=Ressource)
+def increment_progress_totals(sender, instance, created, **kwargs):
+    if created:
+        CourseProgress.objects.filter(course_id=instance.module.course_id).update(total_count=F('total_count') + 1)
+
+@receiver(pre_delete, sender=Ressource)
+def decrement_progress_totals(sender, instance, **kwargs):
+    # Avant la suppression, tant que les lignes "ressource terminée" existent encore
+    CourseProgress.objects.filter(completed_ressources=instance).update(completed_count=F('completed_count') - 1)
+    CourseProgress.objects.filter(course_id=instance.module.course_id).update(total_count=F('total_count') - 1)
+
+@receiver(m2m_changed, sender=CourseProgress.completed_ressources.through)
+def update_progress_completed_count(sender, instance, action, reverse, model, pk_set, **kwargs):
+    # reverse=True: ressource.courseprogress_set.add(...), instance est la ressource
+    if action in ('pre_remove', 'pre_clear'):
+        lookup = {'ressource_id': instance.pk} if reverse else {'courseprogress_id': instance.pk}
+        removed = sender.objects.filter(**lookup)
+        if action == 'pre_remove':
+            removed = removed.filter(**{'courseprogress_id__in' if reverse else 'ressource_id__in': pk_set})
+        instance._progress_removed = set(removed.values_list('courseprogress_id' if reverse else 'ressource_id', flat=True))
+        return
+    if action == 'post_add':
+        changed, delta = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        changed, delta = getattr(instance, '_progress_removed', set()), -1
+    else:
+        return
+    if not changed:
+        return
+    if reverse:
+        CourseProgress.objects.filter(pk__in=changed).update(completed_count=F('completed_count') + delta)
+    else:
+        CourseProgress.objects.filter(pk=instance.pk).update(completed_count=F('completed_count') + delta * len(changed))
+
+# Index de recherche du catalogue (courses/catalog.py)
+
+@receiver(post_save, sender=Course)
+def index_course_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_courses([instance])
@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from users.models import User
+from evaluations.models import Activite, Soumission, Tentative
+from .models import Course, CourseStats
+
+Enrollment = User.courses.through
+
+def _scalar(queryset, group_by, aggregate, output_field):
+    """Sous-requête corrélée renvoyant un agrégat calculé par cours."""
+    return Subquery(
+        queryset.order_by().values(group_by).annotate(value=aggregate).values('value')[:1],
+        output_field=output_field,
+    )
+
+def annotate_course_stats(courses=None):
+    """
+    Annote chaque cours de ses statistiques en une seule requête SQL:
+    student_count, assignment_count, quiz_count, avg_assignment_grade, avg_quiz_score.
+    Accepte n'importe quel queryset de cours (ex: les cours d'un enseignant).
+    """
+    if courses is None:
+        courses = Course.objects.all()
+    activites = Activite.objects.filter(course=OuterRef('pk'))
+    return courses.annotate(
+        student_count=Coalesce(_scalar(Enrollment.objects.filter(course=OuterRef('pk')), 'course', Count('pk'), IntegerField()), Value(0)),
+        assignment_count=Coalesce(_scalar(activites, 'course', Count('pk', filter=Q(activity_type=Activite.ActivityType.DEVOIR)), IntegerField()), Value(0)),
+        quiz_count=Coalesce(_scalar(activites, 'course', Count('pk', filter=Q(activity_type=Activite.ActivityType.QUIZ)), IntegerField()), Value(0)),
+        avg_assignment_grade=Coalesce(_scalar(Soumission.objects.filter(activite__course=OuterRef('pk')), 'activite__course', Avg('note'), FloatField()), Value(0.0)),
+        avg_quiz_score=Coalesce(_scalar(Tentative.objects.filter(activite__course=OuterRef('pk')), 'activite__course', Avg('score'), FloatField()), Value(0.0)),
+    )
+
+def annotate_course_totals(courses=None):
+    """
+    Annote chaque cours des compteurs bruts stockés dans CourseStats, calculés depuis
+    les tables sources (une seule requête SQL).
+    """
+    if courses is None:
+        courses = Course.objects.all()
+    activites = Activite.objects.filter(course=OuterRef('pk'))
+    soumissions = Soumission.objects.filter(activite__course=OuterRef('pk'))
+    tentatives = Tentative.objects.filter(activite__course=OuterRef('pk'))
+    return courses.annotate(
+        student_count=Coalesce(_scalar(Enrollment.objects.filter(course=OuterRef('pk')), 'course', Count('pk'), IntegerField()), Value(0)),
+        assignment_count=Coalesce(_scalar(activites, 'course', Count('pk', filter=Q(activity_type=Activite.ActivityType.DEVOIR)), IntegerField()), Value(0)),
+        quiz_count=Coalesce(_scalar(activites, 'course', Count('pk', filter=Q(activity_type=Activite.ActivityType.QUIZ)), IntegerField()), Value(0)),
+        sondage_count=Coalesce(_scalar(activites, 'course', Count('pk', filter=Q(activity_type=Activite.ActivityType.SONDAGE)), IntegerField()), Value(0)),
+        submission_count=Coalesce(_scalar(soumissions, 'activite__course', Count('pk'), IntegerField()), Value(0)),
+        graded_submission_count=Coalesce(_scalar(soumissions, 'activite__course', Count('note'), IntegerField()), Value(0)),
+        grade_sum=Coalesce(_scalar(soumissions, 'activite__course', Sum('note'), FloatField()), Value(0.0)),
+        attempt_count=Coalesce(_scalar(tentatives, 'activite__course', Count('pk'), IntegerField()), Value(0)),
+        score_sum=Coalesce(_scalar(tentatives, 'activite__course', Sum('score'), FloatField()), Value(0.0)),
+    )
+
+STATS_FIELDS = [
+    'student_count', 'assignment_count', 'quiz_count', 'sondage_count', 'submission_count',
+    'graded_submission_count', 'grade_sum', 'attempt_count', 'score_sum',
+]
+
+def rebuild_course_stats(courses=None, batch_size=1000):
+    """Recalcule entièrement les lignes CourseStats des cours donnés (tous par défaut)."""
+    course_ids = list((courses if courses is not None else Course.objects.all()).values_list('pk', flat=True))
+    for start in range(0, len(course_ids), batch_size):
+        batch = course_ids[start:start + batch_size]
+        rows = annotate_course_totals(Course.objects.filter(pk__in=batch)).values('pk', *STATS_FIELDS)
+        with transaction.atomic():
+            CourseStats.objects.filter(course_id__in=batch).delete()
+            CourseStats.objects.bulk_create([
+                CourseStats(course_id=row['pk'], **{field: row[field] for field in STATS_FIELDS})
+                for row in rows
+            ])
+    return len(course_ids)
+
+def bump_course_stats(course_id, **deltas):
+    """
+    Applique des incréments atomiques (F()) à la ligne CourseStats du cours.
+    Une ligne absente est laissée telle quelle (voir la commande rebuild_course_stats).
+    """
+    if course_id is None or not deltas:
+        return
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if changes:
+        CourseStats.objects.filter(course_id=course_id).update(updated_at=timezone.now(), **changes)
+
+def course_stats_report(courses=None):
+    """
+    Statistiques par cours, au format attendu par les tableaux de bord, lues depuis
+    les lignes CourseStats précalculées (remplies par la migration puis par les signaux).
+    Lecture seule: un cours sans ligne est affiché à zéro, la commande rebuild_course_stats
+    la recrée.
+    """
+    if courses is None:
+        courses = Course.objects.all()
+    courses = list(courses.select_related('stats'))
+    for course in courses:
+        if not hasattr(course, 'stats'):
+            course.stats = CourseStats(course=course)
+    return [
+        {
+            'course': course,
+            'student_count': course.stats.student_count,
+            'assignment_count': course.stats.assignment_count,
+            'quiz_count': course.stats.quiz_count,
+            'avg_assignment_grade': course.stats.avg_assignment_grade,
+            'avg_quiz_score': course.stats.avg_quiz_score,
+        }
+        for course in courses
+    ]
+
+def global_stats():
+    """Totaux de la plateforme (utilisateurs, cours, inscriptions) en requêtes constantes."""
+    stats = User.objects.aggregate(
+        total_users=Count('pk'),
+        total_students=Count('pk', filter=Q(role=User.Role.ETUDIANT)),
+        total_teachers=Count('pk', filter=Q(role=User.Role.ENSEIGNANT)),
+    )
+    stats['total_courses'] = Course.objects.count()
+    stats['total_enrollments'] = Enrollment.objects.filter(user__role=User.Role.ETUDIANT).count()
+    return stats
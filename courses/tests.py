@@ -1,7 +1,20 @@
-from django.test import TestCase, Client
+from importlib import import_module
+from unittest import mock, skipUnless
+from django.apps import apps as global_apps
+from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
 from django.urls import reverse
 from users.models import User
-from courses.models import Course, Module, Ressource, Annonce, CourseProgress
+from courses.models import Course, Category, Module, Ressource, Annonce, CourseProgress, CourseStats, CourseSearchTerm
+from courses.stats import annotate_course_totals, course_stats_report, STATS_FIELDS
+from courses.permissions import permissions_for
+from courses.membership import ENROLLED_CACHE_TIMEOUT, ENROLLED_LOCAL_CACHE_TIMEOUT, can_access_course, is_enrolled, is_teacher
+from courses.catalog import catalog_page, rebuild_search_index, search_courses
+from evaluations.models import Activite, Soumission, Tentative
+from django.core.management import call_command
+from io import StringIO
 from courses.forms import CourseForm, ModuleForm, RessourceForm, AnnonceForm
 import json
 
@@ -338,4 +351,296 @@ class CourseProgressTest(TestCase):
         response = self.client.post(reverse('courses:api_complete_ressource', args=[self.ressource.id]))
         self.assertEqual(response.status_code, 200)
         progress = CourseProgress.objects.get(student=self.student_user, course=self.course)
-        self.assertIn(self.ressource, progress.completed_ressources.all())
\ No newline at end of file
+        self.assertIn(self.ressource, progress.completed_ressources.all())
+        self.assertEqual((progress.completed_count, progress.total_count), (1, 1))
+        self.assertEqual(progress.percentage, 100)
+
+    def test_complete_ressource_twice_counts_once(self):
+        self.client.login(username='student', password='password')
+        url = reverse('courses:api_complete_ressource', args=[self.ressource.id])
+        self.client.post(url)
+        self.client.post(url)
+        progress = CourseProgress.objects.get(student=self.student_user, course=self.course)
+        self.assertEqual(progress.completed_count, 1)
+
+    def test_counters_follow_ressource_changes(self):
+        progress, created = CourseProgress.get_or_create_for(self.student_user, self.course)
+        progress.completed_ressources.add(self.ressource)
+        other = Ressource.objects.create(module=self.module, title='Ressource 2')
+        progress.refresh_from_db()
+        self.assertEqual((progress.completed_count, progress.total_count), (1, 2))
+        self.assertEqual(progress.percentage, 50)
+
+        self.client.login(username='teacher', password='password')
+        response = self.client.post(reverse('courses:api_delete_ressource', args=[self.ressource.id]))
+        self.assertEqual(response.status_code, 200)
+        progress.refresh_from_db()
+        self.assertEqual((progress.completed_count, progress.total_count), (0, 1))
+
+        progress.completed_ressources.add(other)
+        progress.completed_ressources.clear()
+        progress.refresh_from_db()
+        self.assertEqual(progress.completed_count, 0)
+
+    def test_student_course_detail_shows_progress(self):
+        progress, created = CourseProgress.get_or_create_for(self.student_user, self.course)
+        progress.completed_ressources.add(self.ressource)
+        Ressource.objects.create(module=self.module, title='Ressource 2')
+        self.client.login(username='student', password='password')
+        response = self.client.get(reverse('users:student_course_detail', args=[self.course.id]))
+        self.assertEqual(response.context['progress'].percentage, 50)
+        self.assertContains(response, '1 / 2 ressources terminées')
+
+class CourseStatsSignalTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.ENSEIGNANT)
+        self.students = [User.objects.create_user(username=f'student{i}', password='password', role=User.Role.ETUDIANT) for i in range(3)]
+        self.course = Course.objects.create(title='Stats Course', description='Desc', teacher=self.teacher)
+
+    def stats(self):
+        return CourseStats.objects.get(course=self.course)
+
+    def assertStatsMatchSource(self):
+        live = annotate_course_totals(Course.objects.filter(pk=self.course.pk)).values(*STATS_FIELDS).get()
+        stored = self.stats()
+        for field in STATS_FIELDS:
+            self.assertAlmostEqual(getattr(stored, field), live[field], msg=field)
+
+    def test_stats_row_created_with_course(self):
+        self.assertEqual(self.stats().student_count, 0)
+
+    def test_enrollment_counts(self):
+        self.course.students.add(*self.students)
+        self.assertEqual(self.stats().student_count, 3)
+        self.course.students.add(self.students[0])
+        self.students[1].courses.remove(self.course)
+        self.course.students.remove(self.students[1])
+        self.assertEqual(self.stats().student_count, 2)
+        self.students[2].delete()
+        self.assertEqual(self.stats().student_count, 1)
+        self.course.students.clear()
+        self.assertEqual(self.stats().student_count, 0)
+        self.assertStatsMatchSource()
+
+    def test_activity_submission_and_attempt_counters(self):
+        self.course.students.add(*self.students)
+        devoir = Activite.objects.create(course=self.course, title='Devoir', activity_type=Activite.ActivityType.DEVOIR)
+        quiz = Activite.objects.create(course=self.course, title='Quiz', activity_type=Activite.ActivityType.QUIZ)
+        sondage = Activite.objects.create(course=self.course, title='Sondage', activity_type=Activite.ActivityType.SONDAGE)
+        soumission = Soumission.objects.create(activite=devoir, etudiant=self.students[0], fichier='a.pdf')
+        Soumission.objects.create(activite=devoir, etudiant=self.students[1], fichier='b.pdf', note=12)
+        soumission.note = 18
+        soumission.save()
+        Tentative.objects.create(activite=quiz, etudiant=self.students[0], score=4)
+        Tentative.objects.create(activite=quiz, etudiant=self.students[1], score=2)
+
+        stats = self.stats()
+        self.assertEqual((stats.assignment_count, stats.quiz_count, stats.sondage_count), (1, 1, 1))
+        self.assertEqual((stats.submission_count, stats.graded_submission_count), (2, 2))
+        self.assertEqual(stats.avg_assignment_grade, 15)
+        self.assertEqual(stats.avg_quiz_score, 3)
+        self.assertStatsMatchSource()
+
+        sondage.activity_type = Activite.ActivityType.DEVOIR
+        sondage.save()
+        quiz.delete()
+        stats = self.stats()
+        self.assertEqual((stats.assignment_count, stats.quiz_count, stats.sondage_count), (2, 0, 0))
+        self.assertEqual((stats.attempt_count, stats.avg_quiz_score), (0, 0))
+        self.assertStatsMatchSource()
+
+    def test_rebuild_command(self):
+        self.course.students.add(*self.students)
+        CourseStats.objects.filter(course=self.course).update(student_count=99, grade_sum=5)
+        out = StringIO()
+        call_command('rebuild_course_stats', '--check', stdout=out)
+        self.assertIn('1 course(s) with drifted stats.', out.getvalue())
+        out = StringIO()
+        call_command('rebuild_course_stats', stdout=out)
+        self.assertIn('Rebuilt stats for 1 course(s).', out.getvalue())
+        self.assertEqual(self.stats().student_count, 3)
+        self.assertStatsMatchSource()
+
+    def test_migration_backfills_existing_courses(self):
+        self.course.students.add(*self.students)
+        devoir = Activite.objects.create(course=self.course, title='Devoir', activity_type=Activite.ActivityType.DEVOIR)
+        quiz = Activite.objects.create(course=self.course, title='Quiz', activity_type=Activite.ActivityType.QUIZ)
+        Soumission.objects.create(activite=devoir, etudiant=self.students[0], fichier='a.pdf', note=14)
+        Soumission.objects.create(activite=devoir, etudiant=self.students[1], fichier='b.pdf')
+        Tentative.objects.create(activite=quiz, etudiant=self.students[0], score=5)
+        empty = Course.objects.create(title='Empty', description='Desc', teacher=self.teacher)
+        CourseStats.objects.all().delete()
+        migration = import_module('courses.migrations.0008_coursestats')
+        migration.backfill_course_stats(global_apps, None)
+        self.assertStatsMatchSource()
+        self.assertEqual(CourseStats.objects.get(course=empty).student_count, 0)
+
+    def test_report_does_not_write_missing_rows(self):
+        self.course.students.add(*self.students)
+        CourseStats.objects.filter(course=self.course).delete()
+        with CaptureQueriesContext(connection) as queries:
+            report = course_stats_report(Course.objects.filter(pk=self.course.pk))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual((report[0]['student_count'], report[0]['avg_quiz_score']), (0, 0))
+        self.assertFalse(CourseStats.objects.filter(course=self.course).exists())
+
+class CoursePermissionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.admin_user = User.objects.create_user(username='admin', password='password', role=User.Role.ADMIN)
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.ENSEIGNANT)
+        self.other_teacher = User.objects.create_user(username='other', password='password', role=User.Role.ENSEIGNANT)
+        self.student = User.objects.create_user(username='student', password='password', role=User.Role.ETUDIANT)
+        self.course = Course.objects.create(title='Course', description='Desc', teacher=self.teacher)
+        self.course.students.add(self.student)
+        self.module = Module.objects.create(course=self.course, title='Module 1', order=1)
+
+    def test_object_loaded_once_for_decorator_and_view(self):
+        self.client.login(username='teacher', password='password')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('courses:api_module_detail', args=[self.module.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in queries if 'FROM "courses_module"' in q['sql']]), 1)
+
+    def test_owner_checks(self):
+        self.client.login(username='other', password='password')
+        self.assertEqual(self.client.get(reverse('courses:api_module_detail', args=[self.module.pk])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('courses:api_module_detail', args=[0])).status_code, 403)
+        self.client.login(username='admin', password='password')
+        self.assertEqual(self.client.get(reverse('courses:api_module_detail', args=[self.module.pk])).status_code, 200)
+        # Un administrateur reçoit la 404 de la vue pour un objet inexistant
+        self.assertEqual(self.client.get(reverse('courses:api_module_detail', args=[0])).status_code, 404)
+
+    def test_resolver_is_shared_by_the_request(self):
+        request = RequestFactory().get('/')
+        request.user = self.student
+        permissions = permissions_for(request)
+        self.assertIs(permissions_for(request), permissions)
+        with self.assertNumQueries(1):
+            self.assertTrue(permissions.can_participate(self.module))
+            self.assertTrue(permissions.can_participate(self.course))
+        with self.assertNumQueries(0):
+            self.assertFalse(permissions.can_manage(self.module))
+
+class CourseMembershipTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.ENSEIGNANT)
+        self.student = User.objects.create_user(username='student', password='password', role=User.Role.ETUDIANT)
+        self.course = Course.objects.create(title='Course', description='Desc', teacher=self.teacher)
+        self.other_course = Course.objects.create(title='Other', description='Desc', teacher=self.teacher)
+
+    def test_membership_is_cached_and_invalidated(self):
+        self.assertFalse(is_enrolled(self.student, self.course))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.students.add(self.student)
+        self.assertTrue(is_enrolled(self.student, self.course))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_enrolled(self.student, self.course.pk))
+            self.assertFalse(is_enrolled(self.student, self.other_course))
+            self.assertTrue(is_teacher(self.teacher, self.course))
+            self.assertTrue(can_access_course(self.teacher, self.course))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.courses.remove(self.course)
+        self.assertFalse(is_enrolled(self.student, self.course))
+        self.student.courses.add(self.other_course)
+        self.assertTrue(is_enrolled(self.student, self.other_course))
+        self.other_course.students.clear()
+        self.assertFalse(is_enrolled(self.student, self.other_course))
+
+    def test_membership_ttl_depends_on_cache_sharing(self):
+        # Sans cache partagé, une invalidation ne vaut que pour le processus courant
+        for shared, timeout in ((True, ENROLLED_CACHE_TIMEOUT), (False, ENROLLED_LOCAL_CACHE_TIMEOUT)):
+            cache.clear()
+            with self.settings(CACHE_IS_SHARED=shared), mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+                is_enrolled(self.student, self.course)
+            self.assertEqual(cache_set.call_args.args[2], timeout)
+        self.assertLessEqual(ENROLLED_LOCAL_CACHE_TIMEOUT, 60)
+
+    def test_forum_access_does_not_load_student_list(self):
+        self.course.students.add(self.student, *[
+            User.objects.create_user(username=f'classmate{i}', password='password') for i in range(5)
+        ])
+        self.client.login(username='student', password='password')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('forums:forum_cours', args=[self.course.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'INNER JOIN "users_user_courses"' in q['sql']])
+        self.client.login(username='classmate0', password='password')
+        self.assertEqual(self.client.get(reverse('forums:forum_cours', args=[self.other_course.pk])).status_code, 403)
+
+class CourseCatalogTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.ENSEIGNANT)
+        self.web = Category.objects.create(name='Web', slug='web')
+        self.data = Category.objects.create(name='Données', slug='donnees')
+        self.python = Course.objects.create(title='Python Basics', description='Introduction à la programmation', teacher=self.teacher, category=self.data)
+        self.django = Course.objects.create(title='Django', description='Développement web avec Python', teacher=self.teacher, category=self.web)
+        self.java = Course.objects.create(title='Java Advanced', description='Programmation orientée objet', teacher=self.teacher, category=self.web)
+
+    def titles(self, page):
+        return {course.title for course in page['courses']}
+
+    def test_search_matches_words_and_prefixes_without_accents(self):
+        self.assertEqual(self.titles(catalog_page(query='python')), {'Python Basics', 'Django'})
+        self.assertEqual(self.titles(catalog_page(query='programmation python')), {'Python Basics'})
+        self.assertEqual(self.titles(catalog_page(query='develop')), {'Django'})
+        self.assertEqual(catalog_page(query='cobol')['total'], 0)
+
+    def test_index_follows_course_updates(self):
+        self.java.title = 'Kotlin'
+        self.java.save()
+        self.assertEqual(self.titles(catalog_page(query='kotlin')), {'Kotlin'})
+        self.assertEqual(catalog_page(query='java')['total'], 0)
+
+    def test_facets_and_category_filter(self):
+        page = catalog_page(query='programmation', category='web')
+        self.assertEqual(self.titles(page), {'Java Advanced'})
+        self.assertEqual(page['total'], 1)
+        self.assertEqual({facet['category__slug']: facet['count'] for facet in page['facets']}, {'web': 1, 'donnees': 1})
+
+    def test_keyset_pagination_walks_every_course_once(self):
+        for i in range(4):
+            Course.objects.create(title=f'Extra {i}', description='Desc', teacher=self.teacher)
+        seen, cursor = [], None
+        while True:
+            page = catalog_page(cursor=cursor, page_size=3)
+            seen.extend(course.pk for course in page['courses'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, list(Course.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)))
+        self.assertEqual(self.titles(catalog_page(cursor='invalide', page_size=10)), set(Course.objects.values_list('title', flat=True)))
+
+    def test_rebuild_search_index(self):
+        CourseSearchTerm.objects.all().delete()
+        rebuild_search_index(batch_size=2)
+        self.assertEqual(self.titles(catalog_page(query='objet')), {'Java Advanced'})
+
+@skipUnless(connection.vendor == 'postgresql', 'Recherche plein texte propre à PostgreSQL')
+class PostgresCourseSearchTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='teacher', password='password', role=User.Role.ENSEIGNANT)
+        self.python = Course.objects.create(title='Python Basics', description='Introduction à la programmation', teacher=self.teacher)
+        self.java = Course.objects.create(title='Java Advanced', description='Programmation orientée objet', teacher=self.teacher)
+
+    def test_gin_index_created_by_migration(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'courses_course_search_gin'")
+            row = cursor.fetchone()
+        self.assertIsNotNone(row)
+        self.assertIn('USING gin', row[0])
+        self.assertIn("to_tsvector('french'", row[0])
+
+    def test_search_uses_gin_index(self):
+        self.assertEqual({course.title for course in search_courses(Course.objects.all(), 'programmation')}, {'Python Basics', 'Java Advanced'})
+        self.assertFalse(CourseSearchTerm.objects.exists())
+        # L'expression de la requête doit être celle de l'index pour que le planificateur l'utilise
+        queryset = search_courses(Course.objects.all(), 'objet')
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        self.assertIn('courses_course_search_gin', queryset.explain())
+        self.assertEqual([course.title for course in queryset], ['Java Advanced'])
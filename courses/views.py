@@ -7,6 +7,7 @@ from users.models import User
 from .models import Course, Module, Ressource, Annonce, CourseProgress
 
 from courses.forms import ModuleForm, RessourceForm, AnnonceForm
+from courses.permissions import permissions_for
 from administration.decorators import admin_required, course_owner_or_admin_required, module_owner_or_admin_required, ressource_owner_or_admin_required, annonce_owner_or_admin_required
 import json
 from django.contrib import messages
@@ -18,7 +19,7 @@ from django.contrib import messages
 def create_module(request, course_id):
     """Crée un module pour un cours spécifique.
     """
-    course = Course.objects.get(pk=course_id)
+    course = permissions_for(request).get(Course, course_id)
     data = json.loads(request.body)
     form = ModuleForm(data)
     if form.is_valid():
@@ -39,7 +40,7 @@ def create_module(request, course_id):
 @module_owner_or_admin_required
 def module_detail(request, module_id):
     try:
-        module = Module.objects.get(pk=module_id)
+        module = permissions_for(request).get(Module, module_id)
         data = {
             'id': module.id,
             'title': module.title,
@@ -55,7 +56,7 @@ def module_detail(request, module_id):
 @require_POST
 def update_module(request, module_id):
     try:
-        module = Module.objects.get(pk=module_id)
+        module = permissions_for(request).get(Module, module_id)
         data = json.loads(request.body)
         form = ModuleForm(data, instance=module)
         if form.is_valid():
@@ -78,7 +79,7 @@ def update_module(request, module_id):
 @require_POST
 def delete_module(request, module_id):
     try:
-        module = Module.objects.get(pk=module_id)
+        module = permissions_for(request).get(Module, module_id)
         module.delete()
         messages.success(request, 'Module supprimé avec succès !')
         return JsonResponse({})
@@ -91,7 +92,7 @@ def delete_module(request, module_id):
 @ressource_owner_or_admin_required
 @require_POST
 def create_ressource(request, module_id):
-    module = Module.objects.get(pk=module_id)
+    module = permissions_for(request).get(Module, module_id)
     form = RessourceForm(request.POST, request.FILES)
     if form.is_valid():
         ressource = form.save(commit=False)
@@ -111,7 +112,7 @@ def create_ressource(request, module_id):
 @ressource_owner_or_admin_required
 def ressource_detail(request, ressource_id):
     try:
-        ressource = Ressource.objects.get(pk=ressource_id)
+        ressource = permissions_for(request).get(Ressource, ressource_id)
         data = {
             'id': ressource.id,
             'title': ressource.title,
@@ -127,7 +128,7 @@ def ressource_detail(request, ressource_id):
 @require_POST
 def update_ressource(request, ressource_id):
     try:
-        ressource = Ressource.objects.get(pk=ressource_id)
+        ressource = permissions_for(request).get(Ressource, ressource_id)
         form = RessourceForm(request.POST, request.FILES, instance=ressource)
         if form.is_valid():
             ressource = form.save()
@@ -149,7 +150,7 @@ def update_ressource(request, ressource_id):
 @require_POST
 def delete_ressource(request, ressource_id):
     try:
-        ressource = Ressource.objects.get(pk=ressource_id)
+        ressource = permissions_for(request).get(Ressource, ressource_id)
         ressource.delete()
         messages.success(request, 'Ressource supprimée avec succès !')
         return JsonResponse({})
@@ -161,7 +162,7 @@ def delete_ressource(request, ressource_id):
 @require_POST
 def remove_student_from_course(request, course_id, student_id):
     try:
-        course = Course.objects.get(pk=course_id)
+        course = permissions_for(request).get(Course, course_id)
         student = User.objects.get(pk=student_id)
         course.students.remove(student)
         messages.success(request, 'Étudiant retiré du cours avec succès !')
@@ -175,7 +176,7 @@ def remove_student_from_course(request, course_id, student_id):
 @course_owner_or_admin_required
 @require_POST
 def create_annonce(request, course_id):
-    course = Course.objects.get(pk=course_id)
+    course = permissions_for(request).get(Course, course_id)
     data = json.loads(request.body)
     form = AnnonceForm(data)
     if form.is_valid():
@@ -196,7 +197,7 @@ def create_annonce(request, course_id):
 @annonce_owner_or_admin_required
 def annonce_detail(request, annonce_id):
     try:
-        annonce = Annonce.objects.get(pk=annonce_id)
+        annonce = permissions_for(request).get(Annonce, annonce_id)
         data = {
             'id': annonce.id,
             'titre': annonce.titre,
@@ -211,7 +212,7 @@ def annonce_detail(request, annonce_id):
 @require_POST
 def update_annonce(request, annonce_id):
     try:
-        annonce = Annonce.objects.get(pk=annonce_id)
+        annonce = permissions_for(request).get(Annonce, annonce_id)
         data = json.loads(request.body)
         form = AnnonceForm(data, instance=annonce)
         if form.is_valid():
@@ -234,7 +235,7 @@ def update_annonce(request, annonce_id):
 @require_POST
 def delete_annonce(request, annonce_id):
     try:
-        annonce = Annonce.objects.get(pk=annonce_id)
+        annonce = permissions_for(request).get(Annonce, annonce_id)
         annonce.delete()
         messages.success(request, 'Annonce supprimée avec succès !')
         return JsonResponse({})
@@ -244,7 +245,7 @@ def delete_annonce(request, annonce_id):
 
 @course_owner_or_admin_required
 def list_enrollable_students(request, course_id):
-    course = Course.objects.get(pk=course_id)
+    course = permissions_for(request).get(Course, course_id)
     enrolled_student_ids = course.students.values_list('id', flat=True)
     enrollable_students = User.objects.filter(role=User.Role.ETUDIANT).exclude(id__in=enrolled_student_ids)
     students_data = [
@@ -260,7 +261,7 @@ def list_enrollable_students(request, course_id):
 @require_POST
 def enroll_student(request, course_id, student_id):
     try:
-        course = Course.objects.get(pk=course_id)
+        course = permissions_for(request).get(Course, course_id)
         student = User.objects.get(pk=student_id, role=User.Role.ETUDIANT)
         course.students.add(student)
         return JsonResponse({'status': 'success', 'student': {
@@ -278,6 +279,7 @@ def enroll_student(request, course_id, student_id):
 def complete_ressource(request, ressource_id):
     ressource = get_object_or_404(Ressource, pk=ressource_id)
     course = ressource.module.course
-    progress, created = CourseProgress.objects.get_or_create(student=request.user, course=course)
+    progress, created = CourseProgress.get_or_create_for(request.user, course)
+    # Le compteur completed_count est incrémenté par le signal m2m_changed
     progress.completed_ressources.add(ressource)
     return JsonResponse({'status': 'success'})
@@ -14,6 +14,7 @@ from pathlib import Path
 
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -129,6 +130,35 @@ else:
         }
     }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# En production, REDIS_URL permet de partager le cache entre tous les workers
+# gunicorn (paramètres de la plateforme, compteurs, etc.). Sans cette variable,
+# on se rabat sur un cache mémoire local, suffisant pour un seul processus.
+# Les invalidations (paramètres, utilisateurs, inscriptions, corrigés) ne sont vues
+# que du processus qui les fait: ce repli est donc refusé en production.
+
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_IS_SHARED = bool(REDIS_URL)
+
+if IS_PRODUCTION and not CACHE_IS_SHARED:
+    raise ImproperlyConfigured('REDIS_URL est obligatoire en production: le cache doit être partagé entre les workers.')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'e-istc',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -185,6 +215,24 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 
+# Outbox: les e-mails sont envoyés par la commande send_queued_emails
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+EMAIL_OUTBOX_LEASE_SECONDS = 300
+# Nouvel essai d'un e-mail en échec après 1 min, 2 min, 4 min... (au plus 1 h)
+EMAIL_OUTBOX_RETRY_SECONDS = 60
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+# Les e-mails envoyés (qui contiennent des liens de réinitialisation) sont supprimés après ce délai
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv('EMAIL_OUTBOX_RETENTION_DAYS', '7'))
+
+# Diffusion des notifications de cours (commande process_notification_fanouts)
+NOTIFICATION_FANOUT_CHUNK_SIZE = int(os.getenv('NOTIFICATION_FANOUT_CHUNK_SIZE', '500'))
+NOTIFICATION_FANOUT_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_FANOUT_MAX_ATTEMPTS', '5'))
+NOTIFICATION_FANOUT_LEASE_SECONDS = 300
+# Nouvel essai d'une diffusion en échec après 1 min, 2 min, 4 min... (au plus 1 h)
+NOTIFICATION_FANOUT_RETRY_SECONDS = 60
+NOTIFICATION_FANOUT_RETRY_MAX_SECONDS = 3600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,10 @@
+import re
+import unicodedata
+
+def tokenize(text, max_length=None):
+    """
+    Termes normalisés d'un texte: minuscules, sans accents, d'au moins deux caractères,
+    tronqués à `max_length`. Partagé par les index de recherche des cours et des utilisateurs.
+    """
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return {token[:max_length] for token in re.findall(r'\w+', text) if len(token) > 1}
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Question
+
+ANSWER_KEY_CACHE_KEY = 'evaluations:answer_key:{activite_id}:v{version}'
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60 * 24
+
+def _key(activite):
+    return ANSWER_KEY_CACHE_KEY.format(activite_id=activite.pk, version=activite.answer_key_version)
+
+def build_answer_key(activite_id):
+    """
+    Corrigé d'un quiz en une seule requête: {question_id: (type_question, ids des bons choix)}.
+    Les questions sans bonne réponse sont présentes avec un ensemble vide.
+    """
+    answer_key = {}
+    rows = (
+        Question.objects.filter(activite_id=activite_id)
+        .values_list('id', 'type_question', 'choix__id', 'choix__est_correct')
+        .order_by('id')
+    )
+    for question_id, type_question, choix_id, est_correct in rows:
+        entry = answer_key.setdefault(question_id, (type_question, set()))
+        if est_correct:
+            entry[1].add(choix_id)
+    return {question_id: (type_question, frozenset(correct)) for question_id, (type_question, correct) in answer_key.items()}
+
+def get_answer_key(activite):
+    """
+    Corrigé du quiz, lu depuis le cache quand c'est possible. La clé contient la version
+    stockée en base sur l'activité: après une modification, tous les workers lisent une
+    nouvelle clé, sans dépendre d'une suppression dans leur cache.
+    """
+    key = _key(activite)
+    answer_key = cache.get(key)
+    if answer_key is None:
+        answer_key = build_answer_key(activite.pk)
+        cache.set(key, answer_key, ANSWER_KEY_CACHE_TIMEOUT)
+    return answer_key
+
+def bump_answer_key_version(activites):
+    """Périme le corrigé des activités données (une requête UPDATE)."""
+    activites.update(answer_key_version=F('answer_key_version') + 1)
+
+def grade_quiz(answer_key, data):
+    """Score d'une copie (request.POST) comparée au corrigé, sans aucune requête SQL."""
+    score = 0
+    for question_id, (type_question, correct) in answer_key.items():
+        if type_question == Question.QuestionType.CHOIX_UNIQUE:
+            # Comme auparavant, seul le premier bon choix (plus petit id) est accepté
+            if correct and data.get(f'question_{question_id}') == str(min(correct)):
+                score += 1
+        elif type_question == Question.QuestionType.CHOIX_MULTIPLE:
+            submitted = {int(value) for value in data.getlist(f'question_{question_id}') if value.isdigit()}
+            if submitted == correct:
+                score += 1
+    return score
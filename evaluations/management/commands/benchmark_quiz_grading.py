@@ -0,0 +1,133 @@
+import random
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from users.models import OutgoingEmail, User
+from courses.models import Course
+from evaluations.models import Activite, Question, Choix
+
+class Command(BaseCommand):
+    help = 'Benchmarks quiz grading (take_quiz POST) on seeded quizzes and reports throughput, latency and queries per submission.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200], help='Number of questions of each benchmarked quiz.')
+        parser.add_argument('--submissions', type=int, default=100, help='Number of submissions (one per student) for each quiz.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of threads posting submissions at the same time.')
+        parser.add_argument('--choices', type=int, default=4, help='Number of choices per question.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for reproducible quizzes and answers.')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark data instead of deleting it afterwards.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        # bulk_create n'envoie pas post_save: pas d'e-mail de bienvenue mis en file pour les comptes de benchmark.
+        # Les identifiants sont relus après l'insertion: bulk_create ne les renvoie pas sur MySQL
+        User.objects.bulk_create([
+            User(username=f'{prefix}-teacher', email=f'{prefix}-teacher@example.com', role=User.Role.ENSEIGNANT),
+            *(
+                User(username=f'{prefix}-student-{i}', email=f'{prefix}-student-{i}@example.com', role=User.Role.ETUDIANT)
+                for i in range(options['submissions'])
+            ),
+        ])
+        teacher = User.objects.get(username=f'{prefix}-teacher')
+        course = Course.objects.create(title=f'Benchmark {prefix}', description='Données de benchmark', teacher=teacher)
+        students = list(User.objects.filter(username__startswith=f'{prefix}-student-').order_by('pk'))
+        course.students.add(*students)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['submissions']} submissions per quiz, concurrency {options['concurrency']}"
+        ))
+        try:
+            for size in options['sizes']:
+                quiz, answers = self.seed_quiz(course, size, options['choices'], rng)
+                self.report(size, self.run(quiz, students, answers, options['concurrency']))
+        finally:
+            if not options['keep']:
+                course.delete()
+                User.objects.filter(username__startswith=prefix).delete()
+                OutgoingEmail.objects.filter(to__startswith=f'{prefix}-').delete()
+
+    def seed_quiz(self, course, size, choices, rng):
+        """Crée un quiz de `size` questions et une copie aléatoire par étudiant (tirée à l'avance)."""
+        quiz = Activite.objects.create(course=course, title=f'Quiz {size} questions', activity_type=Activite.ActivityType.QUIZ)
+        Question.objects.bulk_create([
+            Question(activite=quiz, intitule=f'Question {i}', type_question=rng.choice(Question.QuestionType.values))
+            for i in range(size)
+        ])
+        questions = list(quiz.questions.order_by('pk'))
+        Choix.objects.bulk_create([
+            Choix(
+                question=question,
+                texte=f'Choix {j}',
+                est_correct=(j == 0) if question.type_question == Question.QuestionType.CHOIX_UNIQUE else rng.random() < 0.5,
+            )
+            for question in questions
+            for j in range(choices)
+        ])
+        choice_ids = {}
+        for question_id, choix_id in Choix.objects.filter(question__activite=quiz).values_list('question_id', 'id'):
+            choice_ids.setdefault(question_id, []).append(choix_id)
+
+        def answer():
+            data = {}
+            for question in questions:
+                ids = [str(choix_id) for choix_id in choice_ids[question.pk]]
+                if question.type_question == Question.QuestionType.CHOIX_UNIQUE:
+                    data[f'question_{question.pk}'] = rng.choice(ids)
+                else:
+                    data[f'question_{question.pk}'] = rng.sample(ids, rng.randint(1, len(ids)))
+            return data
+        return quiz, answer
+
+    def run(self, quiz, students, answers, concurrency):
+        url = reverse('users:take_quiz', args=[quiz.pk])
+        jobs = [(student, answers()) for student in students]
+        chunks = [jobs[i::concurrency] for i in range(concurrency)]
+
+        def submit_all(chunk):
+            client = Client()
+            results = []
+            try:
+                for student, data in chunk:
+                    client.force_login(student)
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = client.post(url, data)
+                        elapsed = time.perf_counter() - start
+                    if response.status_code != 200:
+                        raise RuntimeError(f'take_quiz a répondu {response.status_code} pour {student.username}')
+                    results.append((elapsed, len(queries)))
+            finally:
+                if concurrency > 1:
+                    connection.close()
+            return results
+
+        # Le client de test s'annonce comme "testserver", absent d'ALLOWED_HOSTS hors des tests
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            start = time.perf_counter()
+            if concurrency > 1:
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    results = [result for chunk in executor.map(submit_all, chunks) for result in chunk]
+            else:
+                results = submit_all(jobs)
+            return time.perf_counter() - start, results
+
+    def report(self, size, run):
+        wall_time, results = run
+        latencies = sorted(elapsed for elapsed, _ in results)
+        queries = [count for _, count in results]
+        p50 = statistics.median(latencies) * 1000
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'{size:>4} questions: {len(results) / wall_time:8.1f} submissions/s | '
+            f'p50 {p50:7.1f} ms | p95 {p95:7.1f} ms | '
+            f'{statistics.mean(queries):5.1f} queries/submission (max {max(queries)})'
+        ))
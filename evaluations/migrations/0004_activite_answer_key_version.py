@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluations', '0003_soumission_commentaires_enseignant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activite',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
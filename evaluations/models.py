@@ -15,10 +15,23 @@ class Activite(models.Model):
     due_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Incrémenté à chaque modification d'une question ou d'un choix (evaluations.signals):
+    # fait partie de la clé de cache du corrigé, partagée par tous les workers
+    answer_key_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Une instance chargée avant une modification du quiz ne doit pas réécrire l'ancienne
+        # version du corrigé: elle n'est écrite que si update_fields la nomme explicitement
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'answer_key_version'
+            ]
+        super().save(*args, **kwargs)
+
 class Question(models.Model):
     class QuestionType(models.TextChoices):
         CHOIX_UNIQUE = 'UNIQUE', 'Choix Unique'
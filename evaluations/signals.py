@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Activite, Question, Choix
+from .answer_key import bump_answer_key_version
+
+# Toute modification du corrigé, d'où qu'elle vienne (vues, admin, shell, suppressions
+# en cascade), change la version de l'activité et donc la clé de cache du corrigé
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_answer_key_version(Activite.objects.filter(pk=instance.activite_id))
+
+@receiver(post_save, sender=Choix)
+@receiver(post_delete, sender=Choix)
+def choix_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_answer_key_version(Activite.objects.filter(questions=instance.question_id))
@@ -1,12 +1,19 @@
 from django.test import TestCase, Client
 from django.urls import reverse
-from users.models import User
+from users.models import OutgoingEmail, User
 from courses.models import Course
 from evaluations.models import Activite, Question, Choix, Soumission, Tentative, QuestionSondage, ReponseSondage
 from evaluations.forms import ActiviteForm, QuestionForm, ChoixForm, SoumissionForm, QuestionSondageForm, ReponseSondageForm
 import json
 from datetime import datetime, timedelta
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from io import StringIO
+from django.http import QueryDict
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from evaluations.answer_key import build_answer_key, get_answer_key, grade_quiz
 
 class EvaluationModelTest(TestCase):
     def setUp(self):
@@ -310,3 +317,123 @@ class EvaluationAPITest(TestCase):
         response = self.client.post(reverse('evaluations:api_delete_sondage_question', args=[question_sondage.id]))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(QuestionSondage.objects.count(), 0)
+
+class AnswerKeyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.teacher_user = User.objects.create_user(username='teacher', email='teacher@example.com', password='password', role=User.Role.ENSEIGNANT)
+        self.student_user = User.objects.create_user(username='student', email='student@example.com', password='password', role=User.Role.ETUDIANT)
+        self.course = Course.objects.create(title='Test Course', description='Desc', teacher=self.teacher_user)
+        self.course.students.add(self.student_user)
+        self.quiz = Activite.objects.create(course=self.course, title='Quiz', activity_type=Activite.ActivityType.QUIZ)
+        self.unique = Question.objects.create(activite=self.quiz, intitule='Q1', type_question=Question.QuestionType.CHOIX_UNIQUE)
+        self.unique_good = Choix.objects.create(question=self.unique, texte='Bon', est_correct=True)
+        self.unique_bad = Choix.objects.create(question=self.unique, texte='Mauvais', est_correct=False)
+        self.multiple = Question.objects.create(activite=self.quiz, intitule='Q2', type_question=Question.QuestionType.CHOIX_MULTIPLE)
+        self.multiple_good = [Choix.objects.create(question=self.multiple, texte=f'Bon {i}', est_correct=True) for i in range(2)]
+        Choix.objects.create(question=self.multiple, texte='Mauvais', est_correct=False)
+
+    def test_build_answer_key(self):
+        self.assertEqual(build_answer_key(self.quiz.pk), {
+            self.unique.pk: (Question.QuestionType.CHOIX_UNIQUE, frozenset([self.unique_good.pk])),
+            self.multiple.pk: (Question.QuestionType.CHOIX_MULTIPLE, frozenset(c.pk for c in self.multiple_good)),
+        })
+
+    def test_take_quiz_grades_without_per_question_queries(self):
+        for i in range(10):
+            question = Question.objects.create(activite=self.quiz, intitule=f'Extra {i}', type_question=Question.QuestionType.CHOIX_UNIQUE)
+            Choix.objects.create(question=question, texte='Bon', est_correct=True)
+        self.quiz.refresh_from_db()
+        get_answer_key(self.quiz)
+        self.client.login(username='student', password='password')
+        data = {
+            f'question_{self.unique.pk}': str(self.unique_good.pk),
+            f'question_{self.multiple.pk}': [str(c.pk) for c in self.multiple_good],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('users:take_quiz', args=[self.quiz.pk]), data)
+        # La correction se fait entièrement depuis le corrigé en cache
+        self.assertFalse([q['sql'] for q in queries if 'evaluations_question' in q['sql'] or 'evaluations_choix' in q['sql']])
+        self.assertEqual(response.context['score'], 2)
+        self.assertEqual(response.context['total_questions'], 12)
+        self.assertEqual(Tentative.objects.get(etudiant=self.student_user).score, 2)
+
+    def test_wrong_answers_score_zero(self):
+        self.assertEqual(grade_quiz(get_answer_key(self.quiz), QueryDict(
+            f'question_{self.unique.pk}={self.unique_bad.pk}&question_{self.multiple.pk}={self.multiple_good[0].pk}'
+        )), 0)
+
+    def fresh_answer_key(self):
+        # Chaque requête relit l'activité, donc sa version courante
+        return get_answer_key(Activite.objects.get(pk=self.quiz.pk))
+
+    def test_question_api_invalidates_answer_key(self):
+        self.fresh_answer_key()
+        self.client.login(username='teacher', password='password')
+        self.client.post(reverse('evaluations:api_update_question', args=[self.unique.pk]),
+                         json.dumps({'intitule': 'Q1', 'type_question': 'UNIQUE', 'choices': [{'text': 'Nouveau', 'is_correct': True}]}),
+                         content_type='application/json')
+        new_choice = Choix.objects.get(question=self.unique)
+        self.assertEqual(self.fresh_answer_key()[self.unique.pk][1], frozenset([new_choice.pk]))
+
+        self.client.post(reverse('evaluations:api_delete_question', args=[self.multiple.pk]))
+        self.assertNotIn(self.multiple.pk, self.fresh_answer_key())
+
+        self.client.post(reverse('evaluations:api_create_question', args=[self.quiz.pk]),
+                         json.dumps({'intitule': 'Q3', 'type_question': 'UNIQUE', 'choices': [{'text': 'Opt', 'is_correct': True}]}),
+                         content_type='application/json')
+        self.assertEqual(len(self.fresh_answer_key()), 2)
+
+    def test_direct_changes_bump_answer_key_version(self):
+        # Modifications hors des vues (admin, shell): la version en base change quand même
+        self.fresh_answer_key()
+        self.unique_bad.est_correct = True
+        self.unique_bad.save()
+        self.assertEqual(self.fresh_answer_key()[self.unique.pk][1], frozenset([self.unique_good.pk, self.unique_bad.pk]))
+
+        self.unique_good.delete()
+        self.assertEqual(self.fresh_answer_key()[self.unique.pk][1], frozenset([self.unique_bad.pk]))
+
+        # Suppression en cascade des choix avec la question
+        self.multiple.delete()
+        self.assertNotIn(self.multiple.pk, self.fresh_answer_key())
+
+    def test_stale_activity_save_keeps_answer_key_version(self):
+        # Formulaire ouvert avant la modification d'un choix, enregistré après
+        stale = Activite.objects.get(pk=self.quiz.pk)
+        get_answer_key(stale)
+        self.unique_bad.est_correct = True
+        self.unique_bad.save()
+        stale.title = 'Quiz renommé'
+        stale.save()
+        activite = Activite.objects.get(pk=self.quiz.pk)
+        self.assertEqual(activite.title, 'Quiz renommé')
+        self.assertGreater(activite.answer_key_version, stale.answer_key_version)
+        self.assertEqual(get_answer_key(activite)[self.unique.pk][1], frozenset([self.unique_good.pk, self.unique_bad.pk]))
+
+    def test_cache_key_follows_stored_version(self):
+        version = Activite.objects.get(pk=self.quiz.pk).answer_key_version
+        Choix.objects.create(question=self.unique, texte='Autre', est_correct=False)
+        self.assertGreater(Activite.objects.get(pk=self.quiz.pk).answer_key_version, version)
+        # Un worker qui relit l'activité ne trouve pas l'ancienne entrée: une seule requête pour reconstruire
+        activite = Activite.objects.get(pk=self.quiz.pk)
+        with self.assertNumQueries(1):
+            get_answer_key(activite)
+        with self.assertNumQueries(0):
+            get_answer_key(activite)
+
+class BenchmarkQuizGradingCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_benchmark_reports_and_cleans_up(self):
+        out = StringIO()
+        call_command('benchmark_quiz_grading', sizes=[3, 5], submissions=2, concurrency=1, stdout=out)
+        output = out.getvalue()
+        self.assertIn('3 questions', output)
+        self.assertIn('5 questions', output)
+        self.assertIn('queries/submission', output)
+        self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+        self.assertFalse(OutgoingEmail.objects.filter(to__startswith='bench-').exists())
+        self.assertFalse(Activite.objects.exists())
@@ -2,6 +2,7 @@ from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from courses.models import Course
+from courses.permissions import permissions_for
 from .models import Activite, Question, Choix, Soumission, QuestionSondage, ReponseSondage
 from .forms import ActiviteForm, QuestionForm, ChoixForm, QuestionSondageForm, ReponseSondageForm
 from administration.decorators import course_owner_or_admin_required
@@ -12,7 +13,7 @@ from django.contrib import messages
 @course_owner_or_admin_required
 @require_POST
 def create_activity(request, course_id):
-    course = Course.objects.get(pk=course_id)
+    course = permissions_for(request).get(Course, course_id)
     data = json.loads(request.body)
     form = ActiviteForm(data)
     if form.is_valid():
@@ -36,7 +37,7 @@ def create_activity(request, course_id):
 @activity_owner_or_admin_required
 def activity_detail(request, activity_id):
     try:
-        activite = Activite.objects.get(pk=activity_id)
+        activite = permissions_for(request).get(Activite, activity_id)
         data = {
             'id': activite.id,
             'title': activite.title,
@@ -53,7 +54,7 @@ def activity_detail(request, activity_id):
 @require_POST
 def update_activity(request, activity_id):
     try:
-        activite = Activite.objects.get(pk=activity_id)
+        activite = permissions_for(request).get(Activite, activity_id)
         data = json.loads(request.body)
         form = ActiviteForm(data, instance=activite)
         if form.is_valid():
@@ -79,7 +80,7 @@ def update_activity(request, activity_id):
 @require_POST
 def delete_activity(request, activity_id):
     try:
-        activite = Activite.objects.get(pk=activity_id)
+        activite = permissions_for(request).get(Activite, activity_id)
         activite.delete()
         messages.success(request, 'Activité supprimée avec succès !')
         messages.success(request, 'Activité supprimée avec succès !')
@@ -106,7 +107,7 @@ def list_questions(request, quiz_id):
 @question_owner_or_admin_required
 def question_detail(request, question_id):
     try:
-        question = Question.objects.get(pk=question_id)
+        question = permissions_for(request).get(Question, question_id)
         choix = question.choix.all()
         data = {
             'id': question.id,
@@ -128,7 +129,7 @@ def question_detail(request, question_id):
 @activity_owner_or_admin_required
 @require_POST
 def create_question(request, quiz_id):
-    activite = Activite.objects.get(pk=quiz_id)
+    activite = permissions_for(request).get(Activite, quiz_id)
     data = json.loads(request.body)
     question = Question.objects.create(
         activite=activite,
@@ -148,7 +149,7 @@ def create_question(request, quiz_id):
 @require_POST
 def update_question(request, question_id):
     try:
-        question = Question.objects.get(pk=question_id)
+        question = permissions_for(request).get(Question, question_id)
         data = json.loads(request.body)
         question.intitule = data['intitule']
         question.type_question = data['type_question']
@@ -170,7 +171,7 @@ def update_question(request, question_id):
 @require_POST
 def delete_question(request, question_id):
     try:
-        question = Question.objects.get(pk=question_id)
+        question = permissions_for(request).get(Question, question_id)
         question.delete()
         messages.success(request, 'Question supprimée avec succès !')
         return JsonResponse({})
@@ -182,7 +183,7 @@ def delete_question(request, question_id):
 
 @activity_owner_or_admin_required
 def list_submissions(request, activity_id):
-    activite = Activite.objects.get(pk=activity_id)
+    activite = permissions_for(request).get(Activite, activity_id)
     soumissions = Soumission.objects.filter(activite=activite).select_related('etudiant')
     data = {
         'soumissions': [
@@ -201,7 +202,7 @@ def list_submissions(request, activity_id):
 @require_POST
 def grade_submission(request, submission_id):
     try:
-        soumission = Soumission.objects.get(pk=submission_id)
+        soumission = permissions_for(request).get(Soumission, submission_id)
         data = json.loads(request.body)
         note = data.get('note')
         commentaires = data.get('commentaires_enseignant', '')
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_topic_stats(apps, schema_editor):
+    SujetDiscussion = apps.get_model('forums', 'SujetDiscussion')
+    MessageForum = apps.get_model('forums', 'MessageForum')
+    latest = MessageForum.objects.filter(sujet=OuterRef('pk')).order_by('-cree_le', '-pk')
+    counts = dict(MessageForum.objects.values('sujet').annotate(n=Count('pk')).values_list('sujet', 'n'))
+    sujets = list(SujetDiscussion.objects.only('pk'))
+    for sujet in sujets:
+        sujet.reply_count = counts.get(sujet.pk, 0)
+    SujetDiscussion.objects.bulk_update(sujets, ['reply_count'], batch_size=1000)
+    SujetDiscussion.objects.update(
+        last_post_at=Subquery(latest.values('cree_le')[:1]),
+        last_poster=Subquery(latest.values('auteur_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sujetdiscussion',
+            name='last_post_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sujetdiscussion',
+            name='last_poster',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='sujetdiscussion',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, help_text='Nombre de messages du sujet, message initial compris.'),
+        ),
+        migrations.RunPython(backfill_topic_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_activity(apps, schema_editor):
+    # last_post_at vient d'être calculé par la migration 0002 depuis le dernier message de chaque sujet
+    SujetDiscussion = apps.get_model('forums', 'SujetDiscussion')
+    SujetDiscussion.objects.exclude(last_post_at=None).update(mis_a_jour_le=F('last_post_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0002_topic_post_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sujetdiscussion',
+            index=models.Index(fields=['cours', 'mis_a_jour_le', 'id'], name='forums_sujet_activity_idx'),
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
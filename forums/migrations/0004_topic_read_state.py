@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0003_sujet_activity_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_post_id', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='messageforum',
+            index=models.Index(fields=['sujet', 'id'], name='forums_message_sujet_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='topicreadstate',
+            name='sujet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='forums.sujetdiscussion'),
+        ),
+        migrations.AddField(
+            model_name='topicreadstate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forum_read_states', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='topicreadstate',
+            unique_together={('user', 'sujet')},
+        ),
+    ]
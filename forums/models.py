@@ -11,12 +11,20 @@ class SujetDiscussion(models.Model):
     auteur = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sujets_crees')
     cree_le = models.DateTimeField(auto_now_add=True)
     mis_a_jour_le = models.DateTimeField(auto_now=True)
+    # Dénormalisés pour la liste des sujets, maintenus par forums.signals
+    reply_count = models.PositiveIntegerField(default=0, help_text="Nombre de messages du sujet, message initial compris.")
+    last_post_at = models.DateTimeField(null=True, blank=True)
+    last_poster = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
 
     def __str__(self):
         return self.titre
 
     class Meta:
         ordering = ['-mis_a_jour_le']
+        indexes = [
+            # Liste des sujets d'un cours par activité récente: parcours de plage sur l'index
+            models.Index(fields=['cours', 'mis_a_jour_le', 'id'], name='forums_sujet_activity_idx'),
+        ]
 
 class MessageForum(models.Model):
     """
@@ -32,4 +40,24 @@ class MessageForum(models.Model):
         return f"Réponse de {self.auteur} sur '{self.sujet.titre}'"
 
     class Meta:
-        ordering = ['cree_le']
\ No newline at end of file
+        ordering = ['cree_le']
+        indexes = [
+            # Pagination du fil et comptage des non lus: plages d'identifiants dans un sujet
+            models.Index(fields=['sujet', 'id'], name='forums_message_sujet_id_idx'),
+        ]
+
+class TopicReadState(models.Model):
+    """
+    Filigrane de lecture d'un utilisateur dans un sujet: les messages d'identifiant
+    supérieur à `last_read_post_id` sont non lus. Voir forums/threads.py.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='forum_read_states')
+    sujet = models.ForeignKey(SujetDiscussion, on_delete=models.CASCADE, related_name='read_states')
+    # Identifiant brut: la suppression d'un message ne doit pas faire reculer le filigrane
+    last_read_post_id = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'sujet')
+
+    def __str__(self):
+        return f"{self.user.username} a lu '{self.sujet.titre}' jusqu'au message {self.last_read_post_id}"
\ No newline at end of file
@@ -0,0 +1,36 @@
+from django.db.models import F, OuterRef, QuerySet, Subquery
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from courses.models import Course
+from .models import SujetDiscussion, MessageForum
+
+def latest_post(field, sujet_ref='pk'):
+    return Subquery(MessageForum.objects.filter(sujet=OuterRef(sujet_ref)).order_by('-cree_le', '-pk').values(field)[:1])
+
+@receiver(post_save, sender=MessageForum)
+def add_post_to_topic(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Une seule requête UPDATE: compteurs et remontée du sujet dans la liste (mis_a_jour_le)
+        SujetDiscussion.objects.filter(pk=instance.sujet_id).update(
+            mis_a_jour_le=instance.cree_le,
+            reply_count=F('reply_count') + 1,
+            last_post_at=instance.cree_le,
+            last_poster=instance.auteur_id,
+        )
+
+def deletes_topics(origin):
+    """Suppression partie d'un sujet ou d'un cours: les sujets disparaissent avec leurs messages."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (SujetDiscussion, Course)
+
+@receiver(post_delete, sender=MessageForum)
+def remove_post_from_topic(sender, instance, origin=None, **kwargs):
+    # Suppression en cascade d'un sujet (ou de son cours): inutile de recompter un sujet supprimé
+    if deletes_topics(origin):
+        return
+    # Le dernier message est relu depuis la base: celui qui a été supprimé était peut-être le plus récent
+    SujetDiscussion.objects.filter(pk=instance.sujet_id, reply_count__gt=0).update(
+        reply_count=F('reply_count') - 1,
+        last_post_at=latest_post('cree_le'),
+        last_poster=latest_post('auteur_id'),
+    )
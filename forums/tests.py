@@ -1,8 +1,12 @@
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from users.models import User
 from courses.models import Course
-from forums.models import SujetDiscussion, MessageForum
+from forums.models import SujetDiscussion, MessageForum, TopicReadState
+from forums.threads import POSTS_PAGE_SIZE, unread_counts
+from forums.topics import topic_page, rebuild_topic_stats
 
 class ForumModelTest(TestCase):
     def setUp(self):
@@ -116,4 +120,161 @@ class ForumViewTest(TestCase):
     def test_supprimer_sujet_permission(self):
         self.client.login(username='other_student', password='password')
         response = self.client.post(reverse('forums:supprimer_sujet', args=[self.sujet.id]))
-        self.assertEqual(response.status_code, 403)
\ No newline at end of file
+        self.assertEqual(response.status_code, 403)
+
+class TopicStatsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.teacher_user = User.objects.create_user(username='teacher', email='teacher@example.com', password='password', role=User.Role.ENSEIGNANT)
+        self.student_user = User.objects.create_user(username='student', email='student@example.com', password='password', role=User.Role.ETUDIANT)
+        self.course = Course.objects.create(title='Forum Course', description='Desc', teacher=self.teacher_user)
+        self.course.students.add(self.student_user)
+        self.sujets = []
+        for i in range(5):
+            sujet = SujetDiscussion.objects.create(cours=self.course, titre=f'Sujet {i}', auteur=self.teacher_user)
+            MessageForum.objects.create(sujet=sujet, auteur=self.teacher_user, contenu='Question')
+            self.sujets.append(sujet)
+
+    def test_counters_maintained_on_create_and_delete(self):
+        sujet = self.sujets[0]
+        reply = MessageForum.objects.create(sujet=sujet, auteur=self.student_user, contenu='Réponse')
+        sujet.refresh_from_db()
+        self.assertEqual((sujet.reply_count, sujet.last_poster, sujet.last_post_at), (2, self.student_user, reply.cree_le))
+        reply.delete()
+        sujet.refresh_from_db()
+        self.assertEqual((sujet.reply_count, sujet.last_poster), (1, self.teacher_user))
+
+    def test_topic_and_course_deletion_skip_recount(self):
+        for i in range(10):
+            MessageForum.objects.create(sujet=self.sujets[0], auteur=self.student_user, contenu=f'Réponse {i}')
+        for origin in (self.sujets[0], SujetDiscussion.objects.filter(pk=self.sujets[1].pk), self.course):
+            with CaptureQueriesContext(connection) as queries:
+                origin.delete()
+            self.assertFalse([q['sql'] for q in queries if q['sql'].startswith('UPDATE "forums_sujetdiscussion"')])
+        self.assertFalse(MessageForum.objects.exists())
+
+    def test_user_deletion_updates_remaining_topics(self):
+        MessageForum.objects.create(sujet=self.sujets[0], auteur=self.student_user, contenu='Réponse')
+        self.student_user.delete()
+        sujet = SujetDiscussion.objects.get(pk=self.sujets[0].pk)
+        self.assertEqual((sujet.reply_count, sujet.last_poster), (1, self.teacher_user))
+
+    def test_reply_bumps_topic_with_one_update(self):
+        oldest = self.sujets[0]
+        self.assertNotEqual(topic_page(self.course)['sujets'][0], oldest)
+        with self.assertNumQueries(2):
+            reply = MessageForum.objects.create(sujet=oldest, auteur=self.student_user, contenu='Réponse')
+        self.assertEqual(topic_page(self.course)['sujets'][0], oldest)
+        oldest.refresh_from_db()
+        self.assertEqual(oldest.mis_a_jour_le, reply.cree_le)
+
+    def test_listing_uses_activity_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Plan d'exécution propre à SQLite (les autres bases choisissent selon le volume).")
+        plan = SujetDiscussion.objects.filter(cours=self.course).order_by('-mis_a_jour_le', '-pk').explain()
+        self.assertIn('forums_sujet_activity_idx', plan)
+
+    def test_rebuild_fixes_drift(self):
+        SujetDiscussion.objects.update(reply_count=42, last_poster=None)
+        rebuild_topic_stats()
+        sujet = SujetDiscussion.objects.get(pk=self.sujets[0].pk)
+        self.assertEqual((sujet.reply_count, sujet.last_poster), (1, self.teacher_user))
+
+    def test_keyset_pagination(self):
+        first = topic_page(self.course, page_size=3)
+        second = topic_page(self.course, cursor=first['next_cursor'], page_size=3)
+        self.assertIsNone(second['next_cursor'])
+        seen = [sujet.pk for sujet in first['sujets'] + second['sujets']]
+        self.assertEqual(sorted(seen), sorted(sujet.pk for sujet in self.sujets))
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_forum_page_query_count_is_constant(self):
+        self.client.login(username='student', password='password')
+        url = reverse('forums:forum_cours', args=[self.course.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for i in range(10):
+            sujet = SujetDiscussion.objects.create(cours=self.course, titre=f'Autre {i}', auteur=self.student_user)
+            MessageForum.objects.create(sujet=sujet, auteur=self.student_user, contenu='Question')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(few), len(many))
+        self.assertContains(response, '1 message(s)', count=15)
+
+
+class ThreadViewTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.teacher_user = User.objects.create_user(username='teacher', email='teacher@example.com', password='password', role=User.Role.ENSEIGNANT)
+        self.student_user = User.objects.create_user(username='student', email='student@example.com', password='password', role=User.Role.ETUDIANT)
+        self.course = Course.objects.create(title='Forum Course', description='Desc', teacher=self.teacher_user)
+        self.course.students.add(self.student_user)
+        self.sujet = SujetDiscussion.objects.create(cours=self.course, titre='Long fil', auteur=self.teacher_user)
+        self.posts = [
+            MessageForum.objects.create(sujet=self.sujet, auteur=self.teacher_user, contenu=f'Message numéro {i}')
+            for i in range(POSTS_PAGE_SIZE * 2 + 5)
+        ]
+        self.url = reverse('forums:details_sujet', args=[self.sujet.id])
+        self.client.login(username='student', password='password')
+
+    def watermark(self):
+        return TopicReadState.objects.get(user=self.student_user, sujet=self.sujet).last_read_post_id
+
+    def test_page_based_pagination(self):
+        response = self.client.get(self.url, {'page': 3})
+        self.assertEqual([m.id for m in response.context['messages']], [m.id for m in self.posts[POSTS_PAGE_SIZE * 2:]])
+        self.assertEqual(response.context['thread']['num_pages'], 3)
+        self.assertContains(response, 'Page 3 sur 3')
+
+    def test_cursor_pagination(self):
+        middle = self.posts[10]
+        response = self.client.get(self.url, {'after': middle.id})
+        self.assertEqual(response.context['messages'][0], self.posts[11])
+        response = self.client.get(self.url, {'before': middle.id})
+        self.assertEqual([m.id for m in response.context['messages']], [m.id for m in self.posts[:10]])
+        self.assertFalse(response.context['thread']['has_previous'])
+
+    def test_opens_at_first_unread_post(self):
+        self.client.get(self.url)
+        self.assertEqual(self.watermark(), self.posts[POSTS_PAGE_SIZE - 1].id)
+        new = MessageForum.objects.create(sujet=self.sujet, auteur=self.teacher_user, contenu='Tout nouveau')
+        # Lecture jusqu'à la fin de la page 2, puis ouverture sans page: le premier non lu est sur la page 3
+        self.client.get(self.url, {'page': 2})
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['thread']['page'], 3)
+        self.assertEqual(response.context['first_unread_id'], self.posts[POSTS_PAGE_SIZE * 2].id)
+        self.assertContains(response, 'id="premier-non-lu"')
+        self.assertEqual(self.watermark(), new.id)
+
+    def test_watermark_never_moves_back(self):
+        self.client.get(self.url, {'page': 3})
+        self.client.get(self.url, {'page': 1})
+        self.assertEqual(self.watermark(), self.posts[-1].id)
+
+    def test_reply_redirects_to_last_page(self):
+        response = self.client.post(reverse('forums:ajouter_message', args=[self.sujet.id]), {'contenu': 'Ma réponse'})
+        reply = MessageForum.objects.latest('id')
+        self.assertRedirects(response, f'{self.url}?page=3#message-{reply.id}', fetch_redirect_response=False)
+
+    def test_thread_query_count_does_not_depend_on_page_size(self):
+        # Filigrane déjà à jour: les deux lectures comparées ne font aucune écriture
+        self.client.get(self.url, {'page': 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'page': 2})
+        for message in self.posts:
+            MessageForum.objects.create(sujet=self.sujet, auteur=self.student_user, contenu='Réponse')
+        with CaptureQueriesContext(connection) as more_queries:
+            self.client.get(self.url, {'page': 2})
+        self.assertEqual(len(queries), len(more_queries))
+
+    def test_unread_badges_from_one_query(self):
+        other = SujetDiscussion.objects.create(cours=self.course, titre='Autre', auteur=self.teacher_user)
+        MessageForum.objects.create(sujet=other, auteur=self.teacher_user, contenu='Question')
+        MessageForum.objects.create(sujet=other, auteur=self.student_user, contenu='Ma propre réponse')
+        self.client.get(self.url, {'page': 1})
+        with self.assertNumQueries(1):
+            counts = unread_counts(self.student_user, [self.sujet, other])
+        self.assertEqual(counts, {self.sujet.id: len(self.posts) - POSTS_PAGE_SIZE, other.id: 1})
+        response = self.client.get(reverse('forums:forum_cours', args=[self.course.id]))
+        self.assertContains(response, f'{len(self.posts) - POSTS_PAGE_SIZE} non lu(s)')
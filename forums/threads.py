@@ -0,0 +1,88 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+
+from .models import MessageForum, TopicReadState
+
+POSTS_PAGE_SIZE = 20
+
+def thread_posts(sujet):
+    """Messages du fil dans l'ordre, avec leur auteur (pas de requête par message)."""
+    return sujet.messages.select_related('auteur').order_by('id')
+
+def page_count(sujet, page_size=POSTS_PAGE_SIZE):
+    # reply_count est dénormalisé: pas de COUNT(*) sur le fil
+    return max(1, -(-sujet.reply_count // page_size))
+
+def thread_page(sujet, page=1, page_size=POSTS_PAGE_SIZE):
+    """Page numérotée du fil (la dernière si `page` la dépasse)."""
+    num_pages = page_count(sujet, page_size)
+    page = min(max(page, 1), num_pages)
+    posts = list(thread_posts(sujet)[(page - 1) * page_size:page * page_size])
+    return {
+        'posts': posts,
+        'page': page,
+        'num_pages': num_pages,
+        'has_previous': page > 1,
+        'has_next': page < num_pages,
+    }
+
+def thread_slice(sujet, after=None, before=None, page_size=POSTS_PAGE_SIZE):
+    """
+    Tranche du fil paginée par curseur: les messages qui suivent `after` ou qui précèdent
+    `before`, lus par plage sur l'index (sujet, id) quelle que soit la longueur du fil.
+    """
+    posts = thread_posts(sujet)
+    if after is not None:
+        page = list(posts.filter(id__gt=after)[:page_size + 1])
+        has_next, has_previous = len(page) > page_size, True
+        page = page[:page_size]
+    else:
+        page = list(posts.filter(id__lt=before).order_by('-id')[:page_size + 1])
+        has_previous, has_next = len(page) > page_size, True
+        page = page[:page_size][::-1]
+    return {
+        'posts': page,
+        'has_previous': has_previous,
+        'has_next': has_next,
+    }
+
+def page_of_post(sujet, post_id, page_size=POSTS_PAGE_SIZE):
+    """Numéro de la page qui contient le message `post_id`."""
+    return sujet.messages.filter(id__lt=post_id).count() // page_size + 1
+
+def read_watermark(user, sujet):
+    state = TopicReadState.objects.filter(user=user, sujet=sujet).values_list('last_read_post_id', flat=True).first()
+    return state or 0
+
+def first_unread_post_id(sujet, watermark):
+    return sujet.messages.filter(id__gt=watermark).order_by('id').values_list('id', flat=True).first()
+
+def mark_read(user, sujet, post_id):
+    """Avance le filigrane de lecture jusqu'à `post_id`, sans jamais le faire reculer."""
+    if TopicReadState.objects.filter(user=user, sujet=sujet, last_read_post_id__lt=post_id).update(last_read_post_id=post_id):
+        return
+    try:
+        with transaction.atomic():
+            TopicReadState.objects.get_or_create(user=user, sujet=sujet, defaults={'last_read_post_id': post_id})
+    except IntegrityError:
+        # Créé entre-temps par une requête concurrente: on retente la mise à jour conditionnelle
+        TopicReadState.objects.filter(user=user, sujet=sujet, last_read_post_id__lt=post_id).update(last_read_post_id=post_id)
+
+def unread_counts(user, sujets):
+    """
+    Messages non lus (écrits par d'autres) de chaque sujet, en une seule requête groupée:
+    jointure externe sur le filigrane de l'utilisateur, absent pour un sujet jamais ouvert.
+    Retourne {sujet_id: nombre}; les sujets sans message non lu sont absents.
+    """
+    rows = (
+        MessageForum.objects.filter(sujet__in=sujets)
+        .exclude(auteur=user)
+        .annotate(state=FilteredRelation('sujet__read_states', condition=Q(sujet__read_states__user=user)))
+        .annotate(watermark=Coalesce(F('state__last_read_post_id'), 0))
+        .filter(id__gt=F('watermark'))
+        .values('sujet_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return {row['sujet_id']: row['count'] for row in rows}
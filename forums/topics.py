@@ -0,0 +1,52 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Count, F, Q
+
+from .models import SujetDiscussion, MessageForum
+from .signals import latest_post
+
+TOPICS_PAGE_SIZE = 20
+
+def encode_cursor(sujet):
+    return base64.urlsafe_b64encode(f'{sujet.mis_a_jour_le.isoformat()}|{sujet.pk}'.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        mis_a_jour_le, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(mis_a_jour_le), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+def topic_page(course, cursor=None, page_size=TOPICS_PAGE_SIZE):
+    """
+    Une page des sujets d'un cours, paginée par curseur sur (mis_a_jour_le, id).
+    Auteur et dernier participant sont chargés avec le sujet; le nombre de messages
+    est dénormalisé: la page coûte une requête, quel que soit le nombre de sujets.
+    """
+    sujets = SujetDiscussion.objects.filter(cours=course)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        mis_a_jour_le, pk = position
+        sujets = sujets.filter(Q(mis_a_jour_le__lt=mis_a_jour_le) | Q(mis_a_jour_le=mis_a_jour_le, pk__lt=pk))
+    page = list(sujets.select_related('auteur', 'last_poster').order_by('-mis_a_jour_le', '-pk')[:page_size + 1])
+    has_next = len(page) > page_size
+    page = page[:page_size]
+    return {
+        'sujets': page,
+        'next_cursor': encode_cursor(page[-1]) if has_next else None,
+    }
+
+def rebuild_topic_stats(sujets=None):
+    """Recalcule les compteurs dénormalisés des sujets (après un bulk_create ou pour corriger une dérive)."""
+    if sujets is None:
+        sujets = SujetDiscussion.objects.all()
+    counts = dict(
+        MessageForum.objects.filter(sujet__in=sujets).values('sujet').annotate(n=Count('pk')).values_list('sujet', 'n')
+    )
+    rows = list(sujets.only('pk'))
+    for sujet in rows:
+        sujet.reply_count = counts.get(sujet.pk, 0)
+    SujetDiscussion.objects.bulk_update(rows, ['reply_count'], batch_size=1000)
+    sujets.update(last_post_at=latest_post('cree_le'), last_poster=latest_post('auteur_id'))
+    sujets.exclude(last_post_at=None).update(mis_a_jour_le=F('last_post_at'))
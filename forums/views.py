@@ -4,7 +4,12 @@ from django.core.exceptions import PermissionDenied
 from django.urls import reverse
 from django.views.decorators.http import require_POST
 from courses.models import Course
+from courses.membership import can_access_course
 from .models import SujetDiscussion, MessageForum
+from .topics import topic_page
+from .threads import (
+    first_unread_post_id, mark_read, page_of_post, read_watermark, thread_page, thread_slice, unread_counts,
+)
 from .forms import SujetForm, MessageForm
 from users.models import User
 from django.contrib import messages
@@ -14,9 +19,7 @@ def check_user_permission_for_course(user, course):
     Vérifie si l'utilisateur a la permission de voir le contenu d'un cours.
     (Admin, enseignant du cours, ou étudiant inscrit)
     """
-    if user.role == User.Role.ADMIN or course.teacher == user or user in course.students.all():
-        return True
-    return False
+    return can_access_course(user, course)
 
 @login_required
 def forum_cours(request, course_id):
@@ -24,16 +27,31 @@ def forum_cours(request, course_id):
     if not check_user_permission_for_course(request.user, course):
         raise PermissionDenied
 
-    sujets = SujetDiscussion.objects.filter(cours=course)
+    page = topic_page(course, cursor=request.GET.get('after'))
+    unread = unread_counts(request.user, page['sujets'])
+    for sujet in page['sujets']:
+        sujet.unread_count = unread.get(sujet.pk, 0)
     context = {
         'course': course,
-        'sujets': sujets,
+        'sujets': page['sujets'],
+        'next_cursor': page['next_cursor'],
     }
     return render(request, 'forums/forum_cours.html', context)
 
+def _int_param(request, name):
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+def _redirect_to_post(message):
+    """Redirige vers la page du fil qui contient `message` (et non vers tout le fil)."""
+    url = reverse('forums:details_sujet', args=[message.sujet_id])
+    return redirect(f'{url}?page={page_of_post(message.sujet, message.pk)}#message-{message.pk}')
+
 @login_required
 def details_sujet(request, sujet_id):
-    sujet = get_object_or_404(SujetDiscussion, pk=sujet_id)
+    sujet = get_object_or_404(SujetDiscussion.objects.select_related('cours'), pk=sujet_id)
     course = sujet.cours
     if not check_user_permission_for_course(request.user, course):
         raise PermissionDenied
@@ -46,17 +64,33 @@ def details_sujet(request, sujet_id):
             message.auteur = request.user
             message.save()
             messages.success(request, 'Message envoyé avec succès !')
-            return redirect('forums:details_sujet', sujet_id=sujet.id)
+            return _redirect_to_post(message)
         else:
             messages.error(request, 'Erreur lors de l\'envoi du message.')
     else:
         message_form = MessageForm()
 
-    messages_list = sujet.messages.all()
+    watermark = read_watermark(request.user, sujet)
+    after, before, page = _int_param(request, 'after'), _int_param(request, 'before'), _int_param(request, 'page')
+    first_unread_id = None
+    if after is not None or before is not None:
+        thread = thread_slice(sujet, after=after, before=before)
+    else:
+        if page is None:
+            # Sans page demandée: ouvrir le fil au premier message non lu
+            first_unread_id = first_unread_post_id(sujet, watermark) if watermark else None
+            page = page_of_post(sujet, first_unread_id) if first_unread_id else 1
+        thread = thread_page(sujet, page)
+    posts = thread['posts']
+    if posts and posts[-1].pk > watermark:
+        mark_read(request.user, sujet, posts[-1].pk)
+
     context = {
         'sujet': sujet,
         'course': course,
-        'messages': messages_list,
+        'messages': posts,
+        'thread': thread,
+        'first_unread_id': first_unread_id,
         'message_form': message_form,
     }
     return render(request, 'forums/details_sujet.html', context)
@@ -109,8 +143,8 @@ def ajouter_message(request, sujet_id):
         message.auteur = request.user
         message.save()
         messages.success(request, 'Message ajouté avec succès !')
-    else:
-        messages.error(request, 'Erreur lors de l\'ajout du message.')
+        return _redirect_to_post(message)
+    messages.error(request, 'Erreur lors de l\'ajout du message.')
     return redirect('forums:details_sujet', sujet_id=sujet.id)
 
 
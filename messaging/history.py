@@ -0,0 +1,36 @@
+from django.utils.dateformat import format as date_format
+from django.utils.timezone import localtime
+
+HISTORY_PAGE_SIZE = 30
+HISTORY_MAX_PAGE_SIZE = 100
+
+def message_page(conversation, before_id=None, after_id=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Une tranche de l'historique, toujours en ordre chronologique, lue par plage sur l'index
+    (conversation, id): les `limit` derniers messages, ceux qui précèdent `before_id`
+    ou ceux qui suivent `after_id`. `has_more` indique s'il reste des messages dans ce sens.
+    """
+    messages = conversation.messages.select_related('sender').only(
+        'id', 'conversation_id', 'content', 'timestamp', 'sender_id', 'sender__first_name', 'sender__last_name', 'sender__username'
+    )
+    if after_id is not None:
+        page = list(messages.filter(id__gt=after_id).order_by('id')[:limit + 1])
+        has_more = len(page) > limit
+        return page[:limit], has_more
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    page = list(messages.order_by('-id')[:limit + 1])
+    has_more = len(page) > limit
+    return page[:limit][::-1], has_more
+
+def serialize_message(message, user):
+    timestamp = localtime(message.timestamp)
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'sender_name': f'{message.sender.first_name} {message.sender.last_name}'.strip() or message.sender.username,
+        'content': message.content,
+        'timestamp': timestamp.isoformat(),
+        'time': date_format(timestamp, 'H:i'),
+        'is_mine': message.sender_id == user.pk,
+    }
@@ -0,0 +1,57 @@
+import base64
+from datetime import datetime
+
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+
+from users.models import User
+from .models import Message
+from .unread import unread_counts_by_conversation
+
+INBOX_PAGE_SIZE = 20
+
+def latest_message_id(conversation_ref='pk'):
+    return Subquery(
+        Message.objects.filter(conversation=OuterRef(conversation_ref)).order_by('-id').values('id')[:1]
+    )
+
+def refresh_last_message(conversations):
+    """Recalcule le dernier message des conversations données (après une suppression ou un bulk_create)."""
+    conversations.update(last_message=latest_message_id())
+
+def encode_cursor(conversation):
+    return base64.urlsafe_b64encode(f'{conversation.updated_at.isoformat()}|{conversation.pk}'.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        updated_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(updated_at), int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+def inbox_page(user, cursor=None, page_size=INBOX_PAGE_SIZE):
+    """
+    Une page de la boîte de réception, de l'activité la plus récente à la plus ancienne,
+    paginée par curseur sur (updated_at, id). Le dernier message et son auteur viennent de
+    la même requête (select_related), les participants d'un prefetch et les non lus d'une
+    seule requête groupée: le nombre de requêtes ne dépend pas de la taille de la page.
+    """
+    conversations = user.conversations.all()
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        updated_at, pk = position
+        conversations = conversations.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, pk__lt=pk))
+    page = list(
+        conversations
+        .select_related('last_message__sender')
+        .prefetch_related(Prefetch('participants', queryset=User.objects.only('id', 'first_name', 'last_name')))
+        .order_by('-updated_at', '-pk')[:page_size + 1]
+    )
+    has_next = len(page) > page_size
+    page = page[:page_size]
+    unread = unread_counts_by_conversation(user, page)
+    for conversation in page:
+        conversation.unread_count = unread.get(conversation.pk, 0)
+    return {
+        'conversations': page,
+        'next_cursor': encode_cursor(page[-1]) if has_next else None,
+    }
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from users.models import User
+from messaging.unread import compute_unread_counts, set_unread_counts
+
+class Command(BaseCommand):
+    help = 'Recomputes the cached unread message counters from the database to fix any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of users written to the cache at once.')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'CACHE_IS_SHARED', False):
+            # Avec un cache propre à chaque processus, seuls les compteurs de cette commande seraient corrigés
+            raise CommandError('The configured cache is not shared between processes (set REDIS_URL): reconciling it would not fix the counters served by the web workers.')
+        batch_size = options['batch_size']
+        counts = compute_unread_counts()
+        user_ids = list(User.objects.values_list('id', flat=True))
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            set_unread_counts({user_id: counts.get(user_id, 0) for user_id in batch})
+        self.stdout.write(self.style.SUCCESS(f'Reconciled unread counters for {len(user_ids)} users.'))
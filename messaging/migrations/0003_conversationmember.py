@@ -0,0 +1,73 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def backfill_watermarks(apps, schema_editor):
+    """
+    Filigrane de chaque participant: juste avant son plus ancien message non lu
+    (is_read partagé, envoyé par un autre), sinon le dernier message de la conversation.
+    """
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationMember = apps.get_model('messaging', 'ConversationMember')
+    Message = apps.get_model('messaging', 'Message')
+    last_ids = dict(Conversation.objects.exclude(last_message=None).values_list('pk', 'last_message_id'))
+    members = list(ConversationMember.objects.all())
+    for member in members:
+        first_unread = (
+            Message.objects.filter(conversation_id=member.conversation_id, is_read=False)
+            .exclude(sender_id=member.user_id)
+            .aggregate(first=Min('id'))['first']
+        )
+        member.last_read_message_id = first_unread - 1 if first_unread else last_ids.get(member.conversation_id, 0)
+    ConversationMember.objects.bulk_update(members, ['last_read_message_id'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_conversation_last_message'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # La table de jointure existante devient le modèle intermédiaire ConversationMember
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ConversationMember',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='messaging.conversation')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'messaging_conversation_participants',
+                        'unique_together': {('conversation', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='conversations', through='messaging.ConversationMember', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversationmember',
+            name='last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='messaging_msg_conv_id_idx'),
+        ),
+        migrations.RunPython(backfill_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
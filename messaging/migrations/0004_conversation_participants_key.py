@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_participants_key(apps, schema_editor):
+    """
+    Clé des conversations à exactement deux participants. Si plusieurs conversations relient
+    déjà les mêmes utilisateurs, seule la plus récente devient la conversation directe.
+    """
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationMember = apps.get_model('messaging', 'ConversationMember')
+    direct_ids = Conversation.objects.annotate(n=Count('members')).filter(n=2).values('pk')
+    members = {}
+    for conversation_id, user_id in ConversationMember.objects.filter(conversation_id__in=direct_ids).values_list('conversation_id', 'user_id'):
+        members.setdefault(conversation_id, []).append(user_id)
+    seen = set()
+    conversations = []
+    for conversation in Conversation.objects.filter(pk__in=members).order_by('-updated_at', '-pk').only('pk'):
+        key = ':'.join(str(pk) for pk in sorted(members[conversation.pk]))
+        if key in seen:
+            continue
+        seen.add(key)
+        conversation.participants_key = key
+        conversations.append(conversation)
+    Conversation.objects.bulk_update(conversations, ['participants_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_conversationmember'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='participants_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_participants_key, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,42 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from users.models import User
 
 class Conversation(models.Model):
-    participants = models.ManyToManyField(User, related_name='conversations')
+    participants = models.ManyToManyField(User, through='ConversationMember', related_name='conversations')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Dernier message, dénormalisé pour la boîte de réception (maintenu par messaging.signals)
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Clé canonique des conversations directes ("<plus petit id>:<plus grand id>"), NULL pour les groupes
+    participants_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-updated_at', '-id'], name='messaging_conv_activity_idx'),
+        ]
+
+    @staticmethod
+    def direct_key(user_id, other_id):
+        return ':'.join(str(pk) for pk in sorted((user_id, other_id)))
+
+    @classmethod
+    def get_or_create_direct(cls, user, other):
+        """
+        Conversation directe entre deux utilisateurs: une seule requête sur l'index unique
+        de participants_key, et une seule conversation créée même en cas de clics simultanés.
+        """
+        key = cls.direct_key(user.pk, other.pk)
+        conversation = cls.objects.filter(participants_key=key).first()
+        if conversation is not None:
+            return conversation, False
+        try:
+            with transaction.atomic():
+                conversation = cls.objects.create(participants_key=key)
+                conversation.participants.add(user, other)
+        except IntegrityError:
+            # Créée entre-temps par une autre requête
+            return cls.objects.get(participants_key=key), False
+        return conversation, True
 
     def __str__(self):
         return f"Conversation between {', '.join([user.username for user in self.participants.all()])}"
@@ -14,10 +46,31 @@ class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
 
     def __str__(self):
         return f"From {self.sender.username} in conversation {self.conversation.id}"
 
     class Meta:
-        ordering = ['timestamp']
\ No newline at end of file
+        ordering = ['timestamp']
+        indexes = [
+            # Comptage des non lus: plage d'identifiants au-delà du filigrane de lecture
+            models.Index(fields=['conversation', 'id'], name='messaging_msg_conv_id_idx'),
+        ]
+
+class ConversationMember(models.Model):
+    """
+    Participation d'un utilisateur à une conversation, avec son filigrane de lecture:
+    les messages d'identifiant supérieur à `last_read_message_id` (envoyés par les autres)
+    sont non lus. Marquer une conversation comme lue est l'écriture d'une seule ligne.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    # Identifiant brut plutôt qu'une clé étrangère: la suppression d'un message ne doit pas faire reculer le filigrane
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'messaging_conversation_participants'
+        unique_together = ('conversation', 'user')
+
+    def __str__(self):
+        return f"{self.user.username} in conversation {self.conversation_id}"
\ No newline at end of file
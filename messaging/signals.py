@@ -0,0 +1,43 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import Conversation, ConversationMember, Message
+from .unread import adjust_unread, invalidate_unread
+
+def _participant_ids(conversation_id):
+    return list(ConversationMember.objects.filter(conversation_id=conversation_id).values_list('user_id', flat=True))
+
+@receiver(post_save, sender=Message)
+def update_last_message(sender, instance, created, **kwargs):
+    if created:
+        # Requête UPDATE directe: pas de relecture de la conversation, updated_at ordonne la boîte de réception
+        Conversation.objects.filter(pk=instance.conversation_id).update(last_message=instance, updated_at=instance.timestamp)
+
+@receiver(post_delete, sender=Message)
+def refresh_deleted_last_message(sender, instance, **kwargs):
+    # La clé étrangère est mise à NULL avant la suppression: seules ces conversations sont recalculées
+    from .inbox import refresh_last_message
+    refresh_last_message(Conversation.objects.filter(pk=instance.conversation_id, last_message__isnull=True))
+
+@receiver(post_save, sender=Message)
+def increment_unread_counters(sender, instance, created, **kwargs):
+    if created:
+        recipient_ids = [user_id for user_id in _participant_ids(instance.conversation_id) if user_id != instance.sender_id]
+        transaction.on_commit(partial(adjust_unread, recipient_ids))
+
+@receiver(post_delete, sender=Message)
+def decrement_unread_counters(sender, instance, **kwargs):
+    # Seuls les participants dont le filigrane n'avait pas encore atteint ce message le comptaient comme non lu
+    recipient_ids = list(
+        ConversationMember.objects.filter(conversation_id=instance.conversation_id, last_read_message_id__lt=instance.pk)
+        .exclude(user_id=instance.sender_id)
+        .values_list('user_id', flat=True)
+    )
+    if recipient_ids:
+        transaction.on_commit(partial(adjust_unread, recipient_ids, -1))
+
+@receiver(pre_delete, sender=Conversation)
+def invalidate_conversation_unread_counters(sender, instance, **kwargs):
+    # Les lignes de participation disparaissent avec la conversation: on recalculera
+    transaction.on_commit(partial(invalidate_unread, _participant_ids(instance.pk)))
@@ -1,5 +1,5 @@
 from django import template
-from messaging.models import Message
+from messaging.unread import get_unread_count
 
 register = template.Library()
 
@@ -7,5 +7,5 @@ register = template.Library()
 def unread_messages_count(context):
     request = context.get('request')
     if request and request.user.is_authenticated:
-        return Message.objects.filter(conversation__participants=request.user, is_read=False).exclude(sender=request.user).count()
+        return get_unread_count(request.user)
     return 0
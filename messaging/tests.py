@@ -1,8 +1,15 @@
 import json
+from io import StringIO
+from unittest.mock import patch
+from django.db.models.query import QuerySet
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase, Client
 from django.urls import reverse
 from users.models import User
-from messaging.models import Conversation, Message
+from messaging.models import Conversation, ConversationMember, Message
+from messaging.inbox import inbox_page
+from messaging.unread import compute_unread_counts, get_unread_count, mark_read, set_unread_counts, unread_counts_by_conversation
 
 class MessagingModelTest(TestCase):
     def setUp(self):
@@ -24,24 +31,23 @@ class MessagingModelTest(TestCase):
         self.assertEqual(message.content, 'Hello')
         self.assertEqual(message.sender, self.user1)
         self.assertEqual(message.conversation, conversation)
-        self.assertFalse(message.is_read)
+        self.assertEqual(ConversationMember.objects.get(conversation=conversation, user=self.user2).last_read_message_id, 0)
 
 
 class MessagingViewTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='password')
         self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='password')
         self.user3 = User.objects.create_user(username='user3', email='user3@example.com', password='password')
 
-        self.conversation1 = Conversation.objects.create()
-        self.conversation1.participants.add(self.user1, self.user2)
+        self.conversation1, _ = Conversation.get_or_create_direct(self.user1, self.user2)
         Message.objects.create(conversation=self.conversation1, sender=self.user1, content='Hi user2')
         Message.objects.create(conversation=self.conversation1, sender=self.user2, content='Hi user1')
-        self.unread_message = Message.objects.create(conversation=self.conversation1, sender=self.user2, content='Unread message', is_read=False)
+        self.unread_message = Message.objects.create(conversation=self.conversation1, sender=self.user2, content='Unread message')
 
-        self.conversation2 = Conversation.objects.create()
-        self.conversation2.participants.add(self.user1, self.user3)
+        self.conversation2, _ = Conversation.get_or_create_direct(self.user1, self.user3)
         Message.objects.create(conversation=self.conversation2, sender=self.user1, content='Hi user3')
 
     def test_inbox_view(self):
@@ -61,9 +67,9 @@ class MessagingViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Hi user2')
         self.assertContains(response, 'Unread message')
-        # Check if unread message is marked as read after viewing
-        self.unread_message.refresh_from_db()
-        self.assertTrue(self.unread_message.is_read)
+        # Le filigrane de lecture avance jusqu'au dernier message
+        member = ConversationMember.objects.get(conversation=self.conversation1, user=self.user1)
+        self.assertEqual(member.last_read_message_id, self.unread_message.id)
 
     def test_new_conversation_view_existing(self):
         self.client.login(username='user1', password='password')
@@ -97,3 +103,225 @@ class MessagingViewTest(TestCase):
         self.client.logout()
         response = self.client.get(reverse('messaging:inbox'))
         self.assertRedirects(response, reverse('users:login') + '?next=/messaging/')
+
+
+class DirectConversationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='password')
+        self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='password')
+        self.user3 = User.objects.create_user(username='user3', email='user3@example.com', password='password')
+
+    def test_key_is_canonical(self):
+        conversation, created = Conversation.get_or_create_direct(self.user2, self.user1)
+        self.assertTrue(created)
+        self.assertEqual(conversation.participants_key, f'{self.user1.id}:{self.user2.id}')
+        with self.assertNumQueries(1):
+            self.assertEqual(Conversation.get_or_create_direct(self.user1, self.user2), (conversation, False))
+
+    def test_group_conversation_is_not_reused(self):
+        group = Conversation.objects.create()
+        group.participants.add(self.user1, self.user2, self.user3)
+        self.client.login(username='user1', password='password')
+        self.client.get(reverse('messaging:new_conversation', args=[self.user2.id]))
+        direct = Conversation.objects.get(participants_key=Conversation.direct_key(self.user1.id, self.user2.id))
+        self.assertNotEqual(direct, group)
+        self.assertEqual(direct.participants.count(), 2)
+
+    def test_concurrent_creation_returns_existing(self):
+        existing, _ = Conversation.get_or_create_direct(self.user1, self.user2)
+        # Simule une requête concurrente: la lecture initiale ne voit pas encore la conversation
+        with patch.object(QuerySet, 'first', return_value=None):
+            conversation, created = Conversation.get_or_create_direct(self.user2, self.user1)
+        self.assertEqual((conversation, created), (existing, False))
+        self.assertEqual(Conversation.objects.count(), 1)
+
+
+class InboxTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='password')
+        self.others = [
+            User.objects.create_user(username=f'other{i}', email=f'other{i}@example.com', password='password', first_name=f'Other{i}')
+            for i in range(3)
+        ]
+        self.conversations = []
+        for other in self.others:
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.user1, other)
+            Message.objects.create(conversation=conversation, sender=other, content=f'Bonjour de {other.username}')
+            self.conversations.append(conversation)
+
+    def test_last_message_maintained(self):
+        conversation = self.conversations[0]
+        message = Message.objects.create(conversation=conversation, sender=self.user1, content='Réponse')
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message, message)
+        self.assertEqual(conversation.updated_at, message.timestamp)
+        message.delete()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message.content, 'Bonjour de other0')
+
+    def test_ordered_by_recent_activity_with_unread_counts(self):
+        Message.objects.create(conversation=self.conversations[0], sender=self.others[0], content='Encore')
+        conversations = inbox_page(self.user1)['conversations']
+        self.assertEqual(conversations[0], self.conversations[0])
+        self.assertEqual(conversations[0].unread_count, 2)
+        self.assertEqual(conversations[1].unread_count, 1)
+
+    def test_cursor_pagination(self):
+        first = inbox_page(self.user1, page_size=2)
+        self.assertEqual(len(first['conversations']), 2)
+        second = inbox_page(self.user1, cursor=first['next_cursor'], page_size=2)
+        self.assertIsNone(second['next_cursor'])
+        seen = first['conversations'] + second['conversations']
+        self.assertEqual({c.pk for c in seen}, {c.pk for c in self.conversations})
+        self.assertEqual(len(inbox_page(self.user1, cursor='invalide')['conversations']), 3)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        with self.assertNumQueries(3):
+            conversations = inbox_page(self.user1)['conversations']
+            for conversation in conversations:
+                list(conversation.participants.all())
+                conversation.last_message.sender
+
+    def test_inbox_view_shows_last_messages(self):
+        self.client.login(username='user1', password='password')
+        response = self.client.get(reverse('messaging:inbox'))
+        self.assertEqual(response.status_code, 200)
+        for other in self.others:
+            self.assertContains(response, f'Bonjour de {other.username}')
+        self.assertContains(response, 'aria-label="Messages non lus"', count=3)
+
+
+class ConversationHistoryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='password')
+        self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='password')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+        self.messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.user2 if i % 2 else self.user1, content=f'Message {i}')
+            for i in range(45)
+        ]
+        self.url = reverse('messaging:conversation_messages', args=[self.conversation.id])
+        self.client.login(username='user1', password='password')
+
+    def test_detail_renders_only_the_tail(self):
+        response = self.client.get(reverse('messaging:conversation_detail', args=[self.conversation.id]))
+        self.assertEqual([m.id for m in response.context['messages_page']], [m.id for m in self.messages[-30:]])
+        self.assertTrue(response.context['has_older'])
+        self.assertNotContains(response, '>Message 0<')
+
+    def test_latest_and_older_pages(self):
+        data = self.client.get(self.url, {'limit': 20}).json()
+        self.assertEqual([m['content'] for m in data['messages']], [f'Message {i}' for i in range(25, 45)])
+        self.assertTrue(data['has_more'])
+        data = self.client.get(self.url, {'before_id': data['messages'][0]['id'], 'limit': 20}).json()
+        self.assertEqual([m['content'] for m in data['messages']], [f'Message {i}' for i in range(5, 25)])
+        data = self.client.get(self.url, {'before_id': data['messages'][0]['id'], 'limit': 20}).json()
+        self.assertEqual(len(data['messages']), 5)
+        self.assertFalse(data['has_more'])
+
+    def test_newer_messages_and_read_watermark(self):
+        new = Message.objects.create(conversation=self.conversation, sender=self.user2, content='Nouveau')
+        data = self.client.get(self.url, {'after_id': self.messages[-1].id}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [new.id])
+        self.assertFalse(data['messages'][0]['is_mine'])
+        self.assertEqual(ConversationMember.objects.get(conversation=self.conversation, user=self.user1).last_read_message_id, new.id)
+
+    def test_query_count_does_not_depend_on_history_length(self):
+        # Session, utilisateur, participation, puis une seule requête pour la page de messages
+        with self.assertNumQueries(4):
+            self.client.get(self.url, {'before_id': self.messages[-1].id})
+
+    def test_ajax_send_returns_message(self):
+        response = self.client.post(
+            reverse('messaging:conversation_detail', args=[self.conversation.id]),
+            {'content': 'Envoyé'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['message']['is_mine'])
+
+    def test_invalid_cursor_and_non_participant(self):
+        self.assertEqual(self.client.get(self.url, {'before_id': 'abc'}).status_code, 400)
+        User.objects.create_user(username='user3', email='user3@example.com', password='password')
+        self.client.login(username='user3', password='password')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class UnreadCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user1 = User.objects.create_user(username='user1', email='user1@example.com', password='password')
+        self.user2 = User.objects.create_user(username='user2', email='user2@example.com', password='password')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+        Message.objects.create(conversation=self.conversation, sender=self.user2, content='First')
+
+    def test_counter_is_cached(self):
+        self.assertEqual(get_unread_count(self.user1), 1)
+        self.assertEqual(get_unread_count(self.user2), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user1), 1)
+
+    def test_counter_incremented_on_new_message(self):
+        get_unread_count(self.user1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(conversation=self.conversation, sender=self.user2, content='Second')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user1), 2)
+
+    def test_counter_reset_when_conversation_is_read(self):
+        get_unread_count(self.user1)
+        self.client.login(username='user1', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('messaging:conversation_detail', args=[self.conversation.id]))
+        self.assertEqual(get_unread_count(self.user1), 0)
+
+    def test_marking_read_writes_one_row(self):
+        last = Message.objects.create(conversation=self.conversation, sender=self.user2, content='Second')
+        member = ConversationMember.objects.get(conversation=self.conversation, user=self.user1)
+        # Un comptage de plage et une seule ligne mise à jour
+        with self.assertNumQueries(2):
+            self.assertEqual(mark_read(member, last.id), 2)
+        self.assertEqual(mark_read(member, self.conversation.messages.first().id), 0)
+        self.assertEqual(get_unread_count(self.user1), 0)
+
+    def test_watermarks_are_per_participant(self):
+        user3 = User.objects.create_user(username='user3', email='user3@example.com', password='password')
+        self.conversation.participants.add(user3)
+        self.client.login(username='user1', password='password')
+        self.client.get(reverse('messaging:conversation_detail', args=[self.conversation.id]))
+        # La lecture de user1 ne marque rien comme lu pour user3
+        self.assertEqual(get_unread_count(self.user1), 0)
+        self.assertEqual(get_unread_count(user3), 1)
+        self.assertEqual(unread_counts_by_conversation(user3, [self.conversation]), {self.conversation.id: 1})
+
+    def test_deleting_read_message_keeps_counters(self):
+        message = Message.objects.create(conversation=self.conversation, sender=self.user2, content='Second')
+        mark_read(ConversationMember.objects.get(conversation=self.conversation, user=self.user1), message.id)
+        self.assertEqual(get_unread_count(self.user1), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            message.delete()
+        self.assertEqual(get_unread_count(self.user1), 0)
+        self.assertEqual(compute_unread_counts([self.user1.id]), {})
+
+    def test_reconcile_command_fixes_drift(self):
+        set_unread_counts({self.user1.id: 42, self.user2.id: 7})
+        out = StringIO()
+        with self.settings(CACHE_IS_SHARED=True):
+            call_command('reconcile_unread_counts', stdout=out)
+        self.assertIn('Reconciled unread counters for 2 users.', out.getvalue())
+        self.assertEqual(get_unread_count(self.user1), 1)
+        self.assertEqual(get_unread_count(self.user2), 0)
+
+    def test_reconcile_command_refuses_local_cache(self):
+        set_unread_counts({self.user1.id: 42})
+        with self.settings(CACHE_IS_SHARED=False), self.assertRaisesMessage(CommandError, 'not shared'):
+            call_command('reconcile_unread_counts', stdout=StringIO())
+        self.assertEqual(get_unread_count(self.user1), 42)
@@ -0,0 +1,98 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import ConversationMember, Message
+
+UNREAD_CACHE_KEY = 'messaging:unread:{user_id}'
+UNREAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+def _key(user_id):
+    return UNREAD_CACHE_KEY.format(user_id=user_id)
+
+def _unread_messages():
+    """
+    Messages non lus annotés de leur destinataire: une ligne par (message, participant),
+    au-delà du filigrane de lecture du participant et envoyés par quelqu'un d'autre.
+    Les deux annotations partagent la même jointure sur les participations.
+    """
+    return (
+        Message.objects.annotate(
+            participant=F('conversation__members__user'),
+            watermark=F('conversation__members__last_read_message_id'),
+        )
+        .filter(id__gt=F('watermark'))
+        .exclude(sender=F('participant'))
+    )
+
+def compute_unread_counts(user_ids=None):
+    """
+    Calcule, en une seule requête groupée, le nombre de messages non lus par utilisateur.
+    Retourne un dictionnaire {user_id: nombre}; les utilisateurs sans message non lu sont absents.
+    """
+    messages = _unread_messages()
+    if user_ids is not None:
+        messages = messages.filter(participant__in=user_ids)
+    rows = messages.values('participant').annotate(count=Count('id'))
+    return {row['participant']: row['count'] for row in rows}
+
+def unread_counts_by_conversation(user, conversations):
+    """Messages non lus de l'utilisateur dans chacune des conversations données: {conversation_id: nombre}."""
+    rows = (
+        _unread_messages().filter(participant=user.pk, conversation__in=conversations)
+        .values('conversation_id')
+        .annotate(count=Count('id'))
+    )
+    return {row['conversation_id']: row['count'] for row in rows}
+
+def count_unread_in(conversation_id, user_id, watermark, up_to=None):
+    """Non lus d'un participant dans une conversation: un comptage de plage sur l'index (conversation, id)."""
+    messages = Message.objects.filter(conversation_id=conversation_id, id__gt=watermark).exclude(sender_id=user_id)
+    if up_to is not None:
+        messages = messages.filter(id__lte=up_to)
+    return messages.count()
+
+def mark_read(member, message_id):
+    """
+    Avance le filigrane de lecture de la participation jusqu'à `message_id` (jamais en arrière):
+    une seule ligne écrite, quel que soit le nombre de messages lus. Retourne le nombre de messages marqués.
+    """
+    if not message_id or message_id <= member.last_read_message_id:
+        return 0
+    marked = count_unread_in(member.conversation_id, member.user_id, member.last_read_message_id, up_to=message_id)
+    updated = ConversationMember.objects.filter(pk=member.pk, last_read_message_id__lt=message_id).update(last_read_message_id=message_id)
+    member.last_read_message_id = message_id
+    if updated and marked:
+        transaction.on_commit(partial(adjust_unread, [member.user_id], -marked))
+    return marked
+
+def get_unread_count(user):
+    """Nombre de messages non lus de l'utilisateur, lu depuis le cache quand c'est possible."""
+    key = _key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = compute_unread_counts([user.pk]).get(user.pk, 0)
+        cache.set(key, count, UNREAD_CACHE_TIMEOUT)
+    return count
+
+def adjust_unread(user_ids, delta=1):
+    """
+    Ajoute `delta` (éventuellement négatif) aux compteurs présents en cache.
+    Un compteur absent n'est pas créé: il sera recalculé depuis la base à la prochaine lecture.
+    """
+    for user_id in user_ids:
+        key = _key(user_id)
+        try:
+            count = cache.incr(key, delta)
+        except ValueError:
+            continue
+        if count < 0:
+            cache.delete(key)
+
+def invalidate_unread(user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
+
+def set_unread_counts(counts):
+    cache.set_many({_key(user_id): count for user_id, count in counts.items()}, UNREAD_CACHE_TIMEOUT)
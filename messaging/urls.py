@@ -6,6 +6,7 @@ app_name = 'messaging'
 urlpatterns = [
     path('', views.inbox, name='inbox'),
     path('conversation/<int:conversation_id>/', views.conversation_detail, name='conversation_detail'),
+    path('conversation/<int:conversation_id>/messages/', views.conversation_messages, name='conversation_messages'),
     path('new/<int:recipient_id>/', views.new_conversation, name='new_conversation'),
     path('search_users/', views.search_users, name='search_users'),
 ]
\ No newline at end of file
@@ -1,56 +1,77 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Conversation, Message
+from .models import Conversation, ConversationMember, Message
+from .history import HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, message_page, serialize_message
+from .inbox import inbox_page
+from .unread import mark_read
 from users.models import User
-from django.db.models import Q
+from users.search import search_users as search_user_index
 from django.http import JsonResponse
 
 @login_required
 def inbox(request):
-    conversations = request.user.conversations.all()
-    return render(request, 'messaging/inbox.html', {'conversations': conversations})
+    page = inbox_page(request.user, cursor=request.GET.get('after'))
+    return render(request, 'messaging/inbox.html', {
+        'conversations': page['conversations'],
+        'next_cursor': page['next_cursor'],
+    })
+
+def _get_member(request, conversation_id):
+    return get_object_or_404(ConversationMember.objects.select_related('conversation'), conversation_id=conversation_id, user=request.user)
 
 @login_required
 def conversation_detail(request, conversation_id):
-    conversation = get_object_or_404(Conversation, pk=conversation_id, participants=request.user)
-    # Marquer les messages comme lus
-    conversation.messages.filter(is_read=False).exclude(sender=request.user).update(is_read=True)
+    member = _get_member(request, conversation_id)
+    conversation = member.conversation
+    is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
     if request.method == 'POST':
-        content = request.POST.get('content')
+        content = request.POST.get('content', '').strip()
         if content:
-            Message.objects.create(conversation=conversation, sender=request.user, content=content)
+            message = Message.objects.create(conversation=conversation, sender=request.user, content=content)
+            if is_ajax:
+                return JsonResponse({'status': 'success', 'message': serialize_message(message, request.user)}, status=201)
             return redirect('messaging:conversation_detail', conversation_id=conversation_id)
-    return render(request, 'messaging/conversation_detail.html', {'conversation': conversation})
+        if is_ajax:
+            return JsonResponse({'status': 'error', 'message': 'Le message est vide.'}, status=400)
+    # Marquer la conversation comme lue: le filigrane avance jusqu'au dernier message
+    mark_read(member, conversation.last_message_id)
+    # Seule la fin de l'historique est rendue: les messages plus anciens sont chargés à la demande
+    messages, has_older = message_page(conversation)
+    return render(request, 'messaging/conversation_detail.html', {
+        'conversation': conversation,
+        'messages_page': messages,
+        'has_older': has_older,
+    })
+
+@login_required
+def conversation_messages(request, conversation_id):
+    """
+    Historique paginé au format JSON: `before_id` pour les messages plus anciens,
+    `after_id` pour les nouveaux messages, sinon les derniers messages.
+    """
+    member = _get_member(request, conversation_id)
+    try:
+        before_id = int(request.GET['before_id']) if request.GET.get('before_id') else None
+        after_id = int(request.GET['after_id']) if request.GET.get('after_id') else None
+        limit = min(max(int(request.GET.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Paramètres de pagination invalides.'}, status=400)
+    messages, has_more = message_page(member.conversation, before_id=before_id, after_id=after_id, limit=limit)
+    if messages and before_id is None:
+        mark_read(member, messages[-1].id)
+    return JsonResponse({
+        'messages': [serialize_message(message, request.user) for message in messages],
+        'has_more': has_more,
+    })
 
 @login_required
 def new_conversation(request, recipient_id):
     recipient = get_object_or_404(User, pk=recipient_id)
-    conversation = Conversation.objects.filter(participants=request.user).filter(participants=recipient)
-    if conversation.exists():
-        return redirect('messaging:conversation_detail', conversation_id=conversation.first().id)
-    else:
-        new_conv = Conversation.objects.create()
-        new_conv.participants.add(request.user, recipient)
-        return redirect('messaging:conversation_detail', conversation_id=new_conv.id)
+    conversation, _ = Conversation.get_or_create_direct(request.user, recipient)
+    return redirect('messaging:conversation_detail', conversation_id=conversation.id)
 
 @login_required
 def search_users(request):
-    query = request.GET.get('q', '')
-    users = []
-    if query:
-        users = User.objects.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query) |
-            Q(matricule__icontains=query)
-        ).exclude(id=request.user.id).distinct()[:10] # Limite à 10 résultats
-    
-    users_data = [
-        {
-            'id': user.id,
-            'name': f'{user.first_name} {user.last_name}',
-            'email': user.email,
-            'matricule': user.matricule
-        } for user in users
-    ]
-    return JsonResponse({'users': users_data})
\ No newline at end of file
+    # Recherche par préfixe sur l'index des utilisateurs (users/search.py), mise en cache par requête
+    users = search_user_index(request.GET.get('q', ''), exclude=request.user)
+    return JsonResponse({'users': users})
\ No newline at end of file
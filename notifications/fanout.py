@@ -0,0 +1,111 @@
+from datetime import timedelta
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import User
+from .models import Notification, NotificationFanout
+
+logger = logging.getLogger(__name__)
+
+def get_chunk_size():
+    return getattr(settings, 'NOTIFICATION_FANOUT_CHUNK_SIZE', 500)
+
+def get_max_attempts():
+    return getattr(settings, 'NOTIFICATION_FANOUT_MAX_ATTEMPTS', 5)
+
+def get_lease():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_FANOUT_LEASE_SECONDS', 300))
+
+def get_retry_delay(attempts):
+    """Attente avant un nouvel essai, doublée à chaque échec et plafonnée."""
+    base = getattr(settings, 'NOTIFICATION_FANOUT_RETRY_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), getattr(settings, 'NOTIFICATION_FANOUT_RETRY_MAX_SECONDS', 3600)))
+
+def enqueue_course_notification(course, message, link=None):
+    """Enregistre une diffusion: une seule insertion, quel que soit le nombre d'étudiants."""
+    return NotificationFanout.objects.create(course=course, message=message, link=link)
+
+def claim_fanout(fanout_id):
+    """
+    Réserve une diffusion pour ce worker et retourne le jeton du bail (None si elle est
+    déjà prise). La réservation expire au bout du bail, ce qui permet à un autre worker
+    de reprendre si celui-ci s'arrête en cours de route.
+    """
+    now = timezone.now()
+    token = uuid.uuid4()
+    claimed = NotificationFanout.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        pk=fanout_id,
+        status=NotificationFanout.Status.PENDING,
+    ).update(locked_until=now + get_lease(), lease_token=token)
+    return token if claimed else None
+
+def deliver_fanout(fanout, token, chunk_size=None):
+    """
+    Crée les notifications par paquets de `chunk_size` avec bulk_create. Chaque paquet
+    est validé avec la position atteinte, une reprise ne notifie donc personne deux fois.
+    Le bail est prolongé à chaque paquet; si un autre worker l'a repris entre-temps,
+    on s'arrête sans rien écrire et on retourne False.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    leased = NotificationFanout.objects.filter(pk=fanout.pk, lease_token=token, status=NotificationFanout.Status.PENDING)
+    students = User.objects.filter(courses=fanout.course_id).order_by('id')
+    while True:
+        student_ids = list(students.filter(id__gt=fanout.last_user_id).values_list('id', flat=True)[:chunk_size])
+        if not student_ids:
+            break
+        with transaction.atomic():
+            # Mise à jour conditionnelle d'abord: elle verrouille la ligne jusqu'au commit du paquet
+            now = timezone.now()
+            if not leased.update(last_user_id=student_ids[-1], locked_until=now + get_lease(), updated_at=now):
+                logger.warning(f"Bail perdu sur la diffusion de notifications {fanout.pk}, arrêt du worker sur celle-ci")
+                return False
+            Notification.objects.bulk_create([
+                Notification(user_id=student_id, message=fanout.message, link=fanout.link)
+                for student_id in student_ids
+            ])
+            fanout.last_user_id = student_ids[-1]
+    return leased.update(
+        status=NotificationFanout.Status.DONE, locked_until=None, lease_token=None, updated_at=timezone.now(),
+    ) == 1
+
+def process_pending_fanouts(limit=None, chunk_size=None, max_attempts=None):
+    """
+    Traite les diffusions en attente. En cas d'erreur, la diffusion reste en attente
+    jusqu'à `max_attempts` essais, puis passe en échec.
+    Retourne le nombre de diffusions terminées.
+    """
+    max_attempts = max_attempts or get_max_attempts()
+    pending = NotificationFanout.objects.filter(status=NotificationFanout.Status.PENDING).values_list('id', flat=True)
+    if limit:
+        pending = pending[:limit]
+    done = 0
+    for fanout_id in list(pending):
+        token = claim_fanout(fanout_id)
+        if token is None:
+            continue
+        fanout = NotificationFanout.objects.get(pk=fanout_id)
+        try:
+            if deliver_fanout(fanout, token, chunk_size=chunk_size):
+                done += 1
+        except Exception as e:
+            attempts = fanout.attempts + 1
+            failed = attempts >= max_attempts
+            now = timezone.now()
+            # Écrit seulement si le bail est toujours à nous. La diffusion n'est reprise
+            # qu'après un délai croissant, pour ne pas épuiser les essais pendant une panne
+            NotificationFanout.objects.filter(pk=fanout.pk, lease_token=token).update(
+                attempts=attempts,
+                last_error=str(e),
+                locked_until=None if failed else now + get_retry_delay(attempts),
+                lease_token=None,
+                status=NotificationFanout.Status.FAILED if failed else NotificationFanout.Status.PENDING,
+                updated_at=now,
+            )
+            logger.error(f"Erreur lors de la diffusion de notifications {fanout.pk} (essai {attempts}/{max_attempts}): {e}")
+    return done
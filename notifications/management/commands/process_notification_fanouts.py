@@ -0,0 +1,38 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from notifications.fanout import process_pending_fanouts
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF_SECONDS = 300
+
+class Command(BaseCommand):
+    help = 'Delivers pending course notification fan-outs in chunks (background worker).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None, help='Notifications inserted per bulk_create (defaults to NOTIFICATION_FANOUT_CHUNK_SIZE).')
+        parser.add_argument('--limit', type=int, default=None, help='Maximum number of fan-outs processed per pass.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new fan-outs instead of exiting after one pass.')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait between passes in --loop mode.')
+
+    def handle(self, *args, **options):
+        failures = 0
+        while True:
+            try:
+                done = process_pending_fanouts(limit=options['limit'], chunk_size=options['chunk_size'])
+            except Exception:
+                if not options['loop']:
+                    raise
+                # Erreur passagère: le worker survit et réessaie de plus en plus tard
+                failures += 1
+                delay = min(options['sleep'] * 2 ** (failures - 1), MAX_BACKOFF_SECONDS)
+                logger.exception(f"Échec du passage de diffusion ({failures} de suite), nouvel essai dans {delay:.0f} s")
+                time.sleep(delay)
+                continue
+            failures = 0
+            if done or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Delivered {done} notification fan-out(s).'))
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
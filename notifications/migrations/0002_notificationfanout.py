@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 07:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_category_icon_course_image'),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationFanout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.CharField(max_length=255)),
+                ('link', models.URLField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('DONE', 'Terminée'), ('FAILED', 'Échouée')], default='PENDING', max_length=10)),
+                ('last_user_id', models.BigIntegerField(default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_fanouts', to='courses.course')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='notificatio_status_a246b9_idx')],
+            },
+        ),
+    ]
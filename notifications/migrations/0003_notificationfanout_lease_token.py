@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notificationfanout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationfanout',
+            name='lease_token',
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
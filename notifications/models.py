@@ -1,5 +1,6 @@
 from django.db import models
 from users.models import User
+from courses.models import Course
 
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
@@ -9,4 +10,37 @@ class Notification(models.Model):
     link = models.URLField(blank=True, null=True)
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class NotificationFanout(models.Model):
+    """
+    Diffusion d'une notification à tous les étudiants d'un cours, traitée hors requête
+    par la commande `process_notification_fanouts`.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'En attente'
+        DONE = 'DONE', 'Terminée'
+        FAILED = 'FAILED', 'Échouée'
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='notification_fanouts')
+    message = models.CharField(max_length=255)
+    link = models.URLField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    # Dernier étudiant notifié: permet de reprendre une diffusion interrompue sans doublons
+    last_user_id = models.BigIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # Jeton du worker qui détient le bail: seules ses écritures sont acceptées
+    lease_token = models.UUIDField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.message} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
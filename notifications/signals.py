@@ -5,26 +5,25 @@ from courses.models import Annonce, Course
 from evaluations.models import Activite
 from messaging.models import Message
 from .models import Notification
+from .fanout import enqueue_course_notification
 
 @receiver(post_save, sender=Annonce)
 def create_annonce_notification(sender, instance, created, **kwargs):
     if created:
-        for student in instance.cours.students.all():
-            Notification.objects.create(
-                user=student,
-                message=f"Nouvelle annonce dans le cours {instance.cours.title}: {instance.titre}",
-                link=reverse('users:student_course_detail', args=[instance.cours.id])
-            )
+        enqueue_course_notification(
+            instance.cours,
+            message=f"Nouvelle annonce dans le cours {instance.cours.title}: {instance.titre}",
+            link=reverse('users:student_course_detail', args=[instance.cours.id])
+        )
 
 @receiver(post_save, sender=Activite)
 def create_activite_notification(sender, instance, created, **kwargs):
     if created:
-        for student in instance.course.students.all():
-            Notification.objects.create(
-                user=student,
-                message=f"Nouvelle évaluation dans le cours {instance.course.title}: {instance.title}",
-                link=reverse('users:student_course_detail', args=[instance.course.id])
-            )
+        enqueue_course_notification(
+            instance.course,
+            message=f"Nouvelle évaluation dans le cours {instance.course.title}: {instance.title}",
+            link=reverse('users:student_course_detail', args=[instance.course.id])
+        )
 
 @receiver(post_save, sender=Message)
 def create_message_notification(sender, instance, created, **kwargs):
@@ -53,9 +52,8 @@ def create_visio_notification(sender, instance, created, **kwargs):
             if instance.visio_link:
                 message_text += f" Lien: {instance.visio_link}"
 
-            for student in instance.students.all():
-                Notification.objects.create(
-                    user=student,
-                    message=message_text,
-                    link=reverse('users:student_course_detail', args=[instance.id])
-                )
+            enqueue_course_notification(
+                instance,
+                message=message_text,
+                link=reverse('users:student_course_detail', args=[instance.id])
+            )
@@ -1,9 +1,16 @@
+from datetime import timedelta
+from unittest import mock
+from io import StringIO
+from django.core.management import call_command
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils import timezone
 from users.models import User
 from courses.models import Course, Annonce
 from messaging.models import Conversation, Message
-from .models import Notification
+from evaluations.models import Activite
+from .models import Notification, NotificationFanout
+from .fanout import claim_fanout, deliver_fanout, process_pending_fanouts
 
 class NotificationSignalTest(TestCase):
     def setUp(self):
@@ -14,6 +21,8 @@ class NotificationSignalTest(TestCase):
 
     def test_annonce_notification(self):
         Annonce.objects.create(cours=self.course, titre='Test Annonce', contenu='Contenu')
+        self.assertEqual(Notification.objects.count(), 0)
+        call_command('process_notification_fanouts', stdout=StringIO())
         self.assertEqual(Notification.objects.count(), 1)
         notification = Notification.objects.first()
         self.assertEqual(notification.user, self.student_user)
@@ -28,6 +37,114 @@ class NotificationSignalTest(TestCase):
         self.assertEqual(notification.user, self.student_user)
         self.assertIn('Nouveau message', notification.message)
 
+class NotificationFanoutTest(TestCase):
+    def setUp(self):
+        self.teacher_user = User.objects.create_user(username='teacher', email='teacher@example.com', password='password', role=User.Role.ENSEIGNANT)
+        self.course = Course.objects.create(title='Fanout Course', description='Desc', teacher=self.teacher_user)
+        self.students = [
+            User.objects.create_user(username=f'student{i}', password='password', role=User.Role.ETUDIANT)
+            for i in range(7)
+        ]
+        self.course.students.add(*self.students)
+
+    def test_activite_creation_only_enqueues(self):
+        # Une insertion pour l'annonce, une pour la diffusion, quel que soit le nombre d'étudiants
+        with self.assertNumQueries(2):
+            Annonce.objects.create(cours=self.course, titre='Annonce', contenu='Contenu')
+        Activite.objects.create(course=self.course, title='Quiz', activity_type=Activite.ActivityType.QUIZ)
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(NotificationFanout.objects.filter(status=NotificationFanout.Status.PENDING).count(), 2)
+
+    def test_fanout_is_delivered_in_chunks(self):
+        fanout = NotificationFanout.objects.create(course=self.course, message='Hello', link='/x/')
+        with mock.patch.object(Notification.objects, 'bulk_create', wraps=Notification.objects.bulk_create) as bulk_create:
+            self.assertEqual(process_pending_fanouts(chunk_size=3), 1)
+        self.assertEqual(bulk_create.call_count, 3)
+        self.assertEqual(Notification.objects.filter(message='Hello').count(), 7)
+        fanout.refresh_from_db()
+        self.assertEqual(fanout.status, NotificationFanout.Status.DONE)
+        self.assertEqual(fanout.last_user_id, self.students[-1].id)
+
+    def test_failed_fanout_is_retried_without_duplicates(self):
+        fanout = NotificationFanout.objects.create(course=self.course, message='Retry')
+        original_bulk_create = Notification.objects.bulk_create
+        calls = []
+
+        def failing_bulk_create(objs, *args, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 2:
+                raise RuntimeError('database unavailable')
+            return original_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=failing_bulk_create):
+            self.assertEqual(process_pending_fanouts(chunk_size=3), 0)
+        fanout.refresh_from_db()
+        self.assertEqual(fanout.status, NotificationFanout.Status.PENDING)
+        self.assertEqual(fanout.attempts, 1)
+        self.assertIn('database unavailable', fanout.last_error)
+        # Nouvel essai différé: le passage suivant ne la reprend pas tout de suite
+        self.assertGreater(fanout.locked_until, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(process_pending_fanouts(chunk_size=3), 0)
+
+        NotificationFanout.objects.filter(pk=fanout.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(process_pending_fanouts(chunk_size=3), 1)
+        self.assertEqual(Notification.objects.filter(message='Retry').count(), 7)
+        self.assertEqual(Notification.objects.filter(message='Retry').values('user').distinct().count(), 7)
+
+    def test_fanout_fails_after_max_attempts(self):
+        fanout = NotificationFanout.objects.create(course=self.course, message='Broken')
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            process_pending_fanouts(max_attempts=2)
+            NotificationFanout.objects.filter(pk=fanout.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+            process_pending_fanouts(max_attempts=2)
+        fanout.refresh_from_db()
+        self.assertIsNone(fanout.locked_until)
+        self.assertEqual(fanout.status, NotificationFanout.Status.FAILED)
+        self.assertEqual(fanout.attempts, 2)
+
+    def test_lease_is_extended_on_each_chunk(self):
+        fanout = NotificationFanout.objects.create(course=self.course, message='Long')
+        # Bail pris il y a une heure: il aurait expiré depuis longtemps sans prolongation
+        with mock.patch('notifications.fanout.timezone.now', return_value=timezone.now() - timedelta(hours=1)):
+            token = claim_fanout(fanout.pk)
+        original_bulk_create = Notification.objects.bulk_create
+        steals = []
+
+        def checking_bulk_create(objs, *args, **kwargs):
+            self.assertGreater(NotificationFanout.objects.get(pk=fanout.pk).locked_until, timezone.now())
+            steals.append(claim_fanout(fanout.pk))
+            return original_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=checking_bulk_create):
+            self.assertTrue(deliver_fanout(fanout, token, chunk_size=3))
+        self.assertEqual(steals, [None, None, None])
+        fanout.refresh_from_db()
+        self.assertEqual(fanout.status, NotificationFanout.Status.DONE)
+        self.assertIsNone(fanout.lease_token)
+
+    def test_worker_stops_when_its_lease_is_taken_over(self):
+        fanout = NotificationFanout.objects.create(course=self.course, message='Stolen')
+        token = claim_fanout(fanout.pk)
+        original_bulk_create = Notification.objects.bulk_create
+        takeover = []
+
+        def stalling_bulk_create(objs, *args, **kwargs):
+            result = original_bulk_create(objs, *args, **kwargs)
+            if not takeover:
+                # Le worker a pris trop de retard: son bail expire et un autre le reprend
+                NotificationFanout.objects.filter(pk=fanout.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+                takeover.append(claim_fanout(fanout.pk))
+            return result
+
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=stalling_bulk_create):
+            self.assertFalse(deliver_fanout(fanout, token, chunk_size=3))
+        # Seul le premier paquet a été écrit par l'ancien worker
+        self.assertEqual(Notification.objects.filter(message='Stolen').count(), 3)
+
+        self.assertTrue(deliver_fanout(NotificationFanout.objects.get(pk=fanout.pk), takeover[0], chunk_size=3))
+        self.assertEqual(Notification.objects.filter(message='Stolen').values('user').distinct().count(), 7)
+        self.assertEqual(Notification.objects.filter(message='Stolen').count(), 7)
+
 class NotificationViewTest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -1,5 +1,4 @@
 from .models import PlatformSettings
 
 def platform_settings(request):
-    settings, created = PlatformSettings.objects.get_or_create(pk=1)
-    return {'platform_settings': settings}
+    return {'platform_settings': PlatformSettings.load()}
@@ -1,4 +1,19 @@
-from django.db import models
+import time
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+SETTINGS_VERSION_KEY = 'platform_settings:version'
+SETTINGS_CACHE_KEY = 'platform_settings:v{version}'
+# Durée de vie finie: une entrée orpheline (clé de version évincée) finit par disparaître
+SETTINGS_CACHE_TIMEOUT = 60 * 60
+
+def new_settings_version():
+    # Valeur de départ unique (horodatage en ns) plutôt qu'un petit entier: si la clé de version
+    # est évincée, la version recréée ne retombe jamais sur une ancienne entrée encore en cache
+    return time.time_ns()
 
 class PlatformSettings(models.Model):
     logo = models.ImageField(upload_to='logos/', blank=True, null=True)
@@ -9,4 +24,37 @@ class PlatformSettings(models.Model):
         return "Platform Settings"
 
     class Meta:
-        verbose_name_plural = "Platform Settings"
\ No newline at end of file
+        verbose_name_plural = "Platform Settings"
+
+    @classmethod
+    def load(cls):
+        """
+        Retourne les paramètres de la plateforme depuis le cache partagé.
+        La base n'est interrogée que lorsque la version courante n'est pas en cache.
+        """
+        version = cache.get(SETTINGS_VERSION_KEY)
+        if version is None:
+            version = new_settings_version()
+            if not cache.add(SETTINGS_VERSION_KEY, version, None):
+                # Un autre worker l'a créée entre-temps
+                version = cache.get(SETTINGS_VERSION_KEY, version)
+        key = SETTINGS_CACHE_KEY.format(version=version)
+        settings = cache.get(key)
+        if settings is None:
+            settings, created = cls.objects.get_or_create(pk=1)
+            cache.set(key, settings, SETTINGS_CACHE_TIMEOUT)
+        return settings
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Passe à une nouvelle version : tous les workers relisent la base."""
+        try:
+            cache.incr(SETTINGS_VERSION_KEY)
+        except ValueError:
+            cache.set(SETTINGS_VERSION_KEY, new_settings_version(), None)
+
+@receiver(post_save, sender=PlatformSettings)
+@receiver(post_delete, sender=PlatformSettings)
+def invalidate_platform_settings_cache(sender, **kwargs):
+    # Après le commit, sinon un autre worker pourrait remettre l'ancienne valeur en cache
+    transaction.on_commit(PlatformSettings.invalidate_cache)
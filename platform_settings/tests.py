@@ -1,7 +1,14 @@
-from django.test import TestCase, Client
+import os
+import subprocess
+import sys
+from unittest import mock
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.test import TestCase, Client, RequestFactory
 from django.urls import reverse
 from users.models import User
-from .models import PlatformSettings
+from .models import PlatformSettings, SETTINGS_CACHE_TIMEOUT, SETTINGS_VERSION_KEY
+from .context_processors import platform_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 class PlatformSettingsTest(TestCase):
@@ -26,4 +33,61 @@ class PlatformSettingsTest(TestCase):
             'logo': logo
         })
         self.assertEqual(response.status_code, 200)
-        self.assertIn('logo', response.context['form'].errors)
\ No newline at end of file
+        self.assertIn('logo', response.context['form'].errors)
+
+class PlatformSettingsCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.admin_user = User.objects.create_user(username='admin', email='admin@example.com', password='password', is_superuser=True)
+
+    def test_load_is_cached(self):
+        settings = PlatformSettings.load()
+        self.assertEqual(settings.pk, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(PlatformSettings.load().primary_color, settings.primary_color)
+
+    def test_context_processor_has_no_queries_in_steady_state(self):
+        request = RequestFactory().get('/')
+        platform_settings(request)
+        with self.assertNumQueries(0):
+            context = platform_settings(request)
+        self.assertEqual(context['platform_settings'].pk, 1)
+
+    def test_save_invalidates_cache(self):
+        PlatformSettings.load()
+        self.client.login(username='admin', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('platform_settings:platform_settings'), {
+                'primary_color': '#111111',
+                'secondary_color': '#222222',
+            })
+        self.assertRedirects(response, reverse('platform_settings:platform_settings'))
+        self.assertEqual(PlatformSettings.load().primary_color, '#111111')
+
+    def test_evicted_version_key_does_not_revive_old_entries(self):
+        PlatformSettings.load()
+        PlatformSettings.objects.filter(pk=1).update(primary_color='#333333')
+        with self.captureOnCommitCallbacks(execute=True):
+            PlatformSettings.objects.get(pk=1).save()
+        # Éviction de la clé de version (politique LRU, redémarrage): aucune ancienne version n'est relue
+        cache.delete(SETTINGS_VERSION_KEY)
+        self.assertEqual(PlatformSettings.load().primary_color, '#333333')
+        cache.delete(SETTINGS_VERSION_KEY)
+        PlatformSettings.objects.filter(pk=1).update(primary_color='#444444')
+        PlatformSettings.invalidate_cache()
+        self.assertEqual(PlatformSettings.load().primary_color, '#444444')
+
+    def test_versioned_entries_expire(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            PlatformSettings.load()
+        self.assertEqual(cache_set.call_args.args[2], SETTINGS_CACHE_TIMEOUT)
+
+    def test_production_refuses_local_memory_cache(self):
+        # Sous Render, chaque worker aurait sa propre copie: l'invalidation ne serait pas vue des autres
+        env = {key: value for key, value in os.environ.items() if key != 'REDIS_URL'}
+        env['RENDER'] = '1'
+        result = subprocess.run([sys.executable, '-c', 'import e_istc.settings'], env=env, cwd=django_settings.BASE_DIR,
+                                capture_output=True, text=True)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('REDIS_URL', result.stderr)
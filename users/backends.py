@@ -1,13 +1,32 @@
 from django.contrib.auth.backends import ModelBackend
-from django.db.models import Q
 from .models import User
 
 class EmailOrMatriculeBackend(ModelBackend):
+    # Champs d'identification, par ordre de priorité. Chacun est indexé: une requête
+    # par sonde au lieu d'un OR qui empêche l'utilisation des index.
+    LOGIN_FIELDS = ('matricule', 'username', 'email')
+
+    def find_user(self, identifier):
+        """
+        Retrouve l'utilisateur correspondant à un identifiant de connexion (matricule,
+        nom d'utilisateur ou e-mail). Un e-mail partagé par plusieurs comptes est ignoré.
+        """
+        identifier = (identifier or '').strip()
+        if not identifier:
+            return None
+        for field in self.LOGIN_FIELDS:
+            users = list(User.objects.filter(**{field: identifier})[:2])
+            if len(users) == 1:
+                return users[0]
+        return None
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            # Essayer de trouver un utilisateur par matricule ou par username/email
-            user = User.objects.get(Q(matricule=username) | Q(username=username) | Q(email=username))
-        except User.DoesNotExist:
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        user = self.find_user(username)
+        if user is None:
+            # Même coût qu'un mot de passe vérifié, pour ne pas révéler l'existence du compte
+            User().set_password(password)
             return None
 
         if user.check_password(password):
@@ -15,7 +34,10 @@ class EmailOrMatriculeBackend(ModelBackend):
         return None
 
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
+        # Appelé à chaque requête authentifiée: l'utilisateur est servi depuis le cache,
+        # invalidé à chaque enregistrement (profil, modification, verrouillage)
+        user = User.get_cached(user_id)
+        if user is None or user.is_locked:
+            # Un compte verrouillé perd immédiatement ses sessions ouvertes
             return None
+        return user
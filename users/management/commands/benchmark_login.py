@@ -0,0 +1,53 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from users.backends import EmailOrMatriculeBackend
+from users.models import User
+
+class Command(BaseCommand):
+    help = 'Benchmarks the login identifier lookup of EmailOrMatriculeBackend on the existing users (see generate_load_dataset).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=1000, help='Number of lookups per identifier type.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--compare-legacy', action='store_true', help='Also time the former single OR query.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user_ids = list(User.objects.values_list('id', flat=True))
+        if not user_ids:
+            raise CommandError('Aucun utilisateur: lancez generate_load_dataset au préalable.')
+        sample_ids = [rng.choice(user_ids) for _ in range(options['samples'])]
+        rows = User.objects.filter(pk__in=sample_ids).values('matricule', 'username', 'email')
+        identifiers = {field: [row[field] for row in rows if row[field]] for field in EmailOrMatriculeBackend.LOGIN_FIELDS}
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{len(user_ids)} users'))
+
+        backend = EmailOrMatriculeBackend()
+        for field, values in identifiers.items():
+            self.report(field, values, backend.find_user)
+            if options['compare_legacy']:
+                self.report(f'{field} (legacy OR)', values, lambda value: User.objects.filter(Q(matricule=value) | Q(username=value) | Q(email=value)).first())
+
+    def report(self, label, values, lookup):
+        if not values:
+            self.stdout.write(f'{label:>22}: no sample')
+            return
+        timings, queries = [], []
+        for value in values:
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                lookup(value)
+                timings.append(time.perf_counter() - start)
+            queries.append(len(captured))
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f'{label:>22}: p50 {statistics.median(timings) * 1000:7.3f} ms | p95 {p95 * 1000:7.3f} ms | '
+            f'{statistics.mean(queries):.1f} queries/lookup ({len(values)} samples)'
+        ))
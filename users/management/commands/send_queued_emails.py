@@ -0,0 +1,45 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from users.outbox import purge_sent_emails, send_queued_emails
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF_SECONDS = 300
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+class Command(BaseCommand):
+    help = 'Sends queued outbox e-mails in batches over a single SMTP connection (background worker).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='E-mails sent per connection (defaults to EMAIL_OUTBOX_BATCH_SIZE).')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting once it is empty.')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait between passes in --loop mode.')
+
+    def handle(self, *args, **options):
+        total = 0
+        failures = 0
+        last_purge = None
+        while True:
+            try:
+                sent = send_queued_emails(batch_size=options['batch_size'])
+                # File vide: au plus une purge des e-mails envoyés par heure
+                if not sent and (last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL_SECONDS):
+                    purge_sent_emails()
+                    last_purge = time.monotonic()
+            except Exception:
+                if not options['loop']:
+                    raise
+                # Serveur SMTP (ou base) indisponible: le worker survit et réessaie de plus en plus tard
+                failures += 1
+                delay = min(options['sleep'] * 2 ** (failures - 1), MAX_BACKOFF_SECONDS)
+                logger.exception(f"Échec du passage d'envoi ({failures} de suite), nouvel essai dans {delay:.0f} s")
+                time.sleep(delay)
+                continue
+            failures = 0
+            total += sent
+            if not sent:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {total} queued e-mail(s).'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0006_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='users_user_email_idx'),
+        ),
+    ]
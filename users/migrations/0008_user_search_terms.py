@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-17 08:35
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Copies figées de users.search (SEARCH_FIELDS, normalize): la migration ne doit pas
+# changer de comportement quand le code applicatif évolue
+SEARCH_FIELDS = ('email', 'first_name', 'last_name', 'matricule', 'username')
+TERM_MAX_LENGTH = 64
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', (text or '').replace('_', ' ')).encode('ascii', 'ignore').decode('ascii').lower()
+    return {token[:TERM_MAX_LENGTH] for token in re.findall(r'\w+', text) if len(token) > 1}
+
+
+def build_search_terms(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UserSearchTerm = apps.get_model('users', 'UserSearchTerm')
+    UserSearchTerm.objects.bulk_create([
+        UserSearchTerm(user_id=row[0], term=term)
+        for row in User.objects.values_list('pk', *SEARCH_FIELDS).iterator()
+        for term in normalize(' '.join(filter(None, row[1:])))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_email_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('term', 'user')},
+            },
+        ),
+        migrations.RunPython(build_search_terms, migrations.RunPython.noop),
+    ]
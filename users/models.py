@@ -1,8 +1,8 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
@@ -12,6 +12,11 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+USER_CACHE_KEY = 'users:user:{user_id}'
+# L'invalidation (post_save + on_commit) passe par le cache partagé; la durée de vie courte
+# borne le temps pendant lequel un processus pourrait encore servir une copie périmée
+USER_CACHE_TIMEOUT = 60
+
 class User(AbstractUser):
     class Role(models.TextChoices):
         ADMIN = "ADMIN", "Admin"
@@ -28,6 +33,10 @@ class User(AbstractUser):
     courses = models.ManyToManyField('courses.Course', related_name='students', blank=True)
     is_locked = models.BooleanField(default=False)
 
+    class Meta(AbstractUser.Meta):
+        # L'e-mail sert d'identifiant de connexion (voir users/backends.py)
+        indexes = [models.Index(fields=['email'], name='users_user_email_idx')]
+
     def save(self, *args, **kwargs):
         if self.role != self.Role.ETUDIANT:
             self.matricule = None
@@ -35,6 +44,24 @@ class User(AbstractUser):
             self.specialite = None
         super().save(*args, **kwargs)
 
+    @classmethod
+    def get_cached(cls, user_id):
+        """
+        Utilisateur de la session, lu depuis le cache partagé (durée de vie courte).
+        Retourne None si l'utilisateur n'existe pas.
+        """
+        key = USER_CACHE_KEY.format(user_id=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = cls.objects.filter(pk=user_id).first()
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
+
+    @classmethod
+    def invalidate_cache(cls, user_id):
+        cache.delete(USER_CACHE_KEY.format(user_id=user_id))
+
     @property
     def is_etudiant(self):
         return self.role == self.Role.ETUDIANT
@@ -47,26 +74,96 @@ class User(AbstractUser):
     def is_admin(self):
         return self.role == self.Role.ADMIN
 
+class UserSearchTerm(models.Model):
+    """
+    Index inversé (terme -> utilisateur) de la recherche d'utilisateurs par préfixe:
+    prénom, nom, identifiant, e-mail et matricule normalisés. Voir users/search.py.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+
+    class Meta:
+        # Sert aussi la recherche par préfixe: plage sur term, parcourue dans l'ordre (term, user_id)
+        unique_together = ('term', 'user')
+
+class OutgoingEmail(models.Model):
+    """
+    E-mail en attente d'envoi (outbox). Il est écrit dans la même transaction que
+    l'objet qui le déclenche, puis envoyé par la commande `send_queued_emails`.
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "En attente"
+        SENT = "SENT", "Envoyé"
+        FAILED = "FAILED", "Échoué"
+
+    to = models.EmailField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
 @receiver(post_save, sender=User)
 def send_welcome_email(sender, instance, created, **kwargs):
     if created and instance.email:
-        try:
-            # Générer le lien de réinitialisation de mot de passe
-            token = default_token_generator.make_token(instance)
-            uid = urlsafe_base64_encode(force_bytes(instance.pk))
-            reset_link = f"http://localhost:8000{reverse('users:password_reset_confirm', kwargs={'uidb64': uid, 'token': token})}"
-
-            # Déterminer l'identifiant
-            identifier = instance.matricule if instance.role == User.Role.ETUDIANT else instance.username
-
-            # Rendre le template de l'e-mail
-            mail_subject = 'Bienvenue sur la plateforme E-ISTC !'
-            message = render_to_string('users/email/bienvenue.html', {
-                'user': instance,
-                'identifier': identifier,
-                'reset_link': reset_link,
-            })
-            send_mail(mail_subject, message, 'no-reply@istc.ci', [instance.email], html_message=message)
-            logger.info(f"E-mail de bienvenue envoyé à {instance.email} (ID: {instance.id})")
-        except Exception as e:
-            logger.error(f"Erreur lors de l'envoi de l'e-mail de bienvenue à {instance.email} (ID: {instance.id}): {e}")
\ No newline at end of file
+        # Générer le lien de réinitialisation de mot de passe
+        token = default_token_generator.make_token(instance)
+        uid = urlsafe_base64_encode(force_bytes(instance.pk))
+        reset_link = f"http://localhost:8000{reverse('users:password_reset_confirm', kwargs={'uidb64': uid, 'token': token})}"
+
+        # Déterminer l'identifiant
+        identifier = instance.matricule if instance.role == User.Role.ETUDIANT else instance.username
+
+        # Rendre le template de l'e-mail; l'envoi SMTP se fait hors requête
+        mail_subject = 'Bienvenue sur la plateforme E-ISTC !'
+        message = render_to_string('users/email/bienvenue.html', {
+            'user': instance,
+            'identifier': identifier,
+            'reset_link': reset_link,
+        })
+        OutgoingEmail.objects.create(
+            to=instance.email,
+            subject=mail_subject,
+            body=message,
+            html_body=message,
+            from_email='no-reply@istc.ci',
+        )
+        logger.info(f"E-mail de bienvenue mis en file pour {instance.email} (ID: {instance.id})")
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    # Tout de suite, puis après le commit: une requête concurrente a pu remettre
+    # l'ancienne ligne en cache avant la fin de la transaction
+    user_id = instance.pk
+    User.invalidate_cache(user_id)
+    transaction.on_commit(lambda: User.invalidate_cache(user_id))
+
+@receiver(post_save, sender=User)
+def index_user_for_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    from .search import SEARCH_FIELDS, index_users, invalidate_user_search
+    # La connexion ne met à jour que last_login: inutile de réindexer
+    if raw or (update_fields is not None and not SEARCH_FIELDS.intersection(update_fields)):
+        return
+    index_users([instance])
+    transaction.on_commit(invalidate_user_search)
+
+@receiver(post_delete, sender=User)
+def remove_user_from_search(sender, instance, **kwargs):
+    from .search import invalidate_user_search
+    # Les termes sont supprimés en cascade; seuls les résultats en cache sont à invalider
+    transaction.on_commit(invalidate_user_search)
@@ -0,0 +1,106 @@
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+def get_batch_size():
+    return getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+
+def get_max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+def get_lease():
+    return timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300))
+
+def get_retry_delay(attempts):
+    """Attente avant un nouvel essai, doublée à chaque échec et plafonnée."""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), getattr(settings, 'EMAIL_OUTBOX_RETRY_MAX_SECONDS', 3600)))
+
+def get_retention():
+    return timedelta(days=getattr(settings, 'EMAIL_OUTBOX_RETENTION_DAYS', 7))
+
+def claim_batch(batch_size):
+    """
+    Réserve jusqu'à `batch_size` e-mails en attente pour ce worker. La réservation
+    expire au bout du bail si le worker s'arrête avant d'avoir terminé.
+    """
+    now = timezone.now()
+    available = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    pending = OutgoingEmail.objects.filter(available, status=OutgoingEmail.Status.PENDING)
+    claimed = []
+    for email_id in pending.values_list('id', flat=True)[:batch_size]:
+        if OutgoingEmail.objects.filter(available, pk=email_id, status=OutgoingEmail.Status.PENDING).update(locked_until=now + get_lease()):
+            claimed.append(email_id)
+    return list(OutgoingEmail.objects.filter(pk__in=claimed))
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(email.subject, email.body, email.from_email, [email.to], connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+def send_queued_emails(batch_size=None, max_attempts=None):
+    """
+    Envoie un lot d'e-mails en attente en réutilisant une seule connexion SMTP.
+    Retourne le nombre d'e-mails envoyés.
+    """
+    batch_size = batch_size or get_batch_size()
+    max_attempts = max_attempts or get_max_attempts()
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0
+
+    sent = 0
+    try:
+        connection = get_connection()
+        connection.open()
+    except Exception as e:
+        # Serveur SMTP injoignable: on libère le lot pour le prochain passage
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(locked_until=None)
+        logger.error(f"Connexion au serveur d'e-mail impossible: {e}")
+        raise
+    with connection:
+        for email in emails:
+            try:
+                connection.send_messages([build_message(email, connection)])
+            except Exception as e:
+                email.attempts += 1
+                email.last_error = str(e)
+                # Pas de nouvel essai immédiat: une panne SMTP passagère n'épuise pas les essais
+                email.locked_until = timezone.now() + get_retry_delay(email.attempts)
+                if email.attempts >= max_attempts:
+                    email.status = OutgoingEmail.Status.FAILED
+                    email.locked_until = None
+                email.save(update_fields=['attempts', 'last_error', 'locked_until', 'status'])
+                logger.error(f"Erreur lors de l'envoi de l'e-mail {email.pk} à {email.to} (essai {email.attempts}/{max_attempts}): {e}")
+            else:
+                email.status = OutgoingEmail.Status.SENT
+                email.sent_at = timezone.now()
+                email.locked_until = None
+                email.save(update_fields=['status', 'sent_at', 'locked_until'])
+                sent += 1
+    logger.info(f"{sent} e-mail(s) envoyé(s) sur {len(emails)}.")
+    return sent
+
+def purge_sent_emails(retention=None):
+    """
+    Supprime les e-mails envoyés depuis plus de `retention` (EMAIL_OUTBOX_RETENTION_DAYS par
+    défaut): leur corps contient des liens de réinitialisation qui n'ont pas à être conservés.
+    Retourne le nombre d'e-mails supprimés.
+    """
+    cutoff = timezone.now() - (retention or get_retention())
+    # created_at précède sent_at: le filtre sur created_at borne le parcours de l'index (status, created_at)
+    deleted, _ = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.Status.SENT, created_at__lt=cutoff, sent_at__lt=cutoff,
+    ).delete()
+    if deleted:
+        logger.info(f"{deleted} e-mail(s) envoyé(s) supprimé(s) de l'outbox.")
+    return deleted
@@ -0,0 +1,120 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from e_istc.text import tokenize
+from .models import User, UserSearchTerm
+
+SEARCH_FIELDS = frozenset({'first_name', 'last_name', 'username', 'email', 'matricule'})
+TERM_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyz'
+USER_SEARCH_LIMIT = 10
+SELECTIVITY_SAMPLE = 1000
+USER_SEARCH_CACHE_TIMEOUT = 60
+# Le numéro de version change à chaque modification d'un utilisateur: les résultats
+# mis en cache pour l'ancienne version ne sont plus jamais lus
+USER_SEARCH_VERSION_KEY = 'users:search:version'
+USER_SEARCH_CACHE_KEY = 'users:search:{version}:{role}:{limit}:{terms}'
+TERM_MAX_LENGTH = UserSearchTerm._meta.get_field('term').max_length
+
+def normalize(text):
+    """
+    Termes de recherche: ceux de e_istc.text.tokenize, coupés aussi sur « _ ».
+    Ils ne contiennent alors que [0-9a-z], dont l'ordre est le même pour toutes les collations.
+    """
+    return tokenize((text or '').replace('_', ' '), TERM_MAX_LENGTH)
+
+def user_terms(user):
+    return normalize(' '.join(filter(None, (getattr(user, field) for field in sorted(SEARCH_FIELDS)))))
+
+def prefix_range(term):
+    """Bornes (incluse, exclue) des termes commençant par `term`; la borne haute vaut None pour « zzz »."""
+    chars = list(term)
+    while chars:
+        position = TERM_ALPHABET.find(chars[-1])
+        if 0 <= position < len(TERM_ALPHABET) - 1:
+            chars[-1] = TERM_ALPHABET[position + 1]
+            return term, ''.join(chars)
+        chars.pop()
+    return term, None
+
+def _prefix_filter(term):
+    lower, upper = prefix_range(term)
+    return Q(term__gte=lower, term__lt=upper) if upper else Q(term__gte=lower)
+
+def index_users(users):
+    """Recalcule les termes de recherche (préfixes indexés) des utilisateurs donnés."""
+    users = list(users)
+    with transaction.atomic():
+        UserSearchTerm.objects.filter(user__in=users).delete()
+        UserSearchTerm.objects.bulk_create([
+            UserSearchTerm(user=user, term=term)
+            for user in users
+            for term in user_terms(user)
+        ], batch_size=1000)
+
+def rebuild_user_search_index(users=None, batch_size=1000):
+    if users is None:
+        users = User.objects.all()
+    users = users.order_by('pk').only('pk', 'first_name', 'last_name', 'username', 'email', 'matricule')
+    last_pk = 0
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        index_users(batch)
+        last_pk = batch[-1].pk
+
+def _estimated_matches(term):
+    # Comptage plafonné, lu sur l'index seul: suffisant pour choisir le mot qui guide la recherche
+    return UserSearchTerm.objects.filter(_prefix_filter(term))[:SELECTIVITY_SAMPLE].count()
+
+def _version():
+    return cache.get_or_set(USER_SEARCH_VERSION_KEY, 1, None)
+
+def invalidate_user_search():
+    try:
+        cache.incr(USER_SEARCH_VERSION_KEY)
+    except ValueError:
+        cache.set(USER_SEARCH_VERSION_KEY, 1, None)
+
+def search_users(query, role=None, exclude=None, limit=USER_SEARCH_LIMIT):
+    """
+    Utilisateurs dont un terme (prénom, nom, identifiant, e-mail, matricule) commence par
+    chacun des mots de `query`, triés par terme: une recherche par plage sur l'index (term, user_id)
+    au lieu de LIKE '%...%' sur toute la table. Les résultats sont mis en cache par requête normalisée.
+    Utilisée par la messagerie et par l'administration.
+    """
+    terms = sorted(normalize(query))
+    if not terms:
+        return []
+    # Un résultat de plus en cache, pour pouvoir exclure l'utilisateur courant sans autre requête
+    key = USER_SEARCH_CACHE_KEY.format(version=_version(), role=role or '', limit=limit, terms=','.join(terms))
+    results = cache.get(key)
+    if results is None:
+        # Parcours ordonné de l'index (term, user_id) sur le mot le plus sélectif, les autres vérifiés
+        # par EXISTS: seules les premières lignes sont lues, sans trier l'ensemble des correspondances
+        if len(terms) > 1:
+            terms.sort(key=_estimated_matches)
+        rows = UserSearchTerm.objects.filter(_prefix_filter(terms[0]))
+        for term in terms[1:]:
+            rows = rows.filter(Exists(UserSearchTerm.objects.filter(_prefix_filter(term), user_id=OuterRef('user_id'))))
+        if role:
+            rows = rows.filter(user__role=role)
+        # Un utilisateur peut avoir plusieurs termes correspondants (nom et e-mail)
+        user_ids = list(dict.fromkeys(rows.order_by('term', 'user_id').values_list('user_id', flat=True)[:(limit + 1) * 3]))[:limit + 1]
+        users = User.objects.only('pk', 'first_name', 'last_name', 'email', 'matricule', 'role').in_bulk(user_ids)
+        results = [
+            {
+                'id': user.pk,
+                'name': f'{user.first_name} {user.last_name}',
+                'email': user.email,
+                'matricule': user.matricule,
+                'role': user.role,
+            }
+            # Un utilisateur supprimé entre la lecture de l'index et celle de la table est ignoré
+            for user in (users.get(user_id) for user_id in user_ids)
+            if user is not None
+        ]
+        cache.set(key, results, USER_SEARCH_CACHE_TIMEOUT)
+    exclude_id = getattr(exclude, 'pk', exclude)
+    return [result for result in results if result['id'] != exclude_id][:limit]
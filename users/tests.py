@@ -1,7 +1,22 @@
 import json
+from datetime import timedelta
+from io import StringIO
+from importlib import import_module
+from unittest import mock
+from django.apps import apps as global_apps
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
 from django.test import TestCase, Client
 from django.urls import reverse
-from users.models import User
+from django.utils import timezone
+from users.models import User, OutgoingEmail, UserSearchTerm
+from users.outbox import get_retry_delay, purge_sent_emails, send_queued_emails
+from users.backends import EmailOrMatriculeBackend
+from users.search import search_users, rebuild_user_search_index, user_terms
 from users.forms import CustomUserCreationForm, CustomUserChangeForm
 from courses.models import Course
 from evaluations.models import Activite, QuestionSondage, ReponseSondage
@@ -42,6 +57,216 @@ class UserModelTest(TestCase):
         self.assertTrue(admin.is_admin)
 
 
+class WelcomeEmailOutboxTest(TestCase):
+    def test_user_creation_queues_welcome_email(self):
+        User.objects.create_user(username='newbie', email='newbie@example.com', password='password')
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, 'newbie@example.com')
+        self.assertEqual(email.status, OutgoingEmail.Status.PENDING)
+
+    def test_user_without_email_queues_nothing(self):
+        User.objects.create_user(username='noemail', password='password')
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_command_sends_batch_over_one_connection(self):
+        for i in range(3):
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='password')
+        with mock.patch('users.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            out = StringIO()
+            call_command('send_queued_emails', stdout=out)
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertIn('Sent 3 queued e-mail(s).', out.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].subject, 'Bienvenue sur la plateforme E-ISTC !')
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(OutgoingEmail.objects.filter(status=OutgoingEmail.Status.PENDING).exists())
+
+    def test_failed_send_is_retried(self):
+        User.objects.create_user(username='retry', email='retry@example.com', password='password')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP down')):
+            self.assertEqual(send_queued_emails(max_attempts=2), 0)
+            # Nouvel essai différé: le passage suivant ne reprend pas l'e-mail tout de suite
+            self.assertEqual(send_queued_emails(max_attempts=2), 0)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.Status.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.locked_until, timezone.now() + timedelta(seconds=50))
+        OutgoingEmail.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(send_queued_emails(max_attempts=2), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmail.Status.SENT)
+        self.assertIsNotNone(email.sent_at)
+
+    def test_retry_delay_grows_and_is_capped(self):
+        self.assertEqual([get_retry_delay(attempts).total_seconds() for attempts in (1, 2, 3)], [60, 120, 240])
+        self.assertEqual(get_retry_delay(20).total_seconds(), 3600)
+
+    def test_sent_emails_are_purged_after_retention(self):
+        for username in ('old', 'recent'):
+            User.objects.create_user(username=username, email=f'{username}@example.com', password='password')
+        call_command('send_queued_emails', stdout=StringIO())
+        eight_days_ago = timezone.now() - timedelta(days=8)
+        OutgoingEmail.objects.filter(to='old@example.com').update(created_at=eight_days_ago, sent_at=eight_days_ago)
+        User.objects.create_user(username='pending', email='pending@example.com', password='password')
+        OutgoingEmail.objects.filter(to='pending@example.com').update(created_at=eight_days_ago)
+        self.assertEqual(purge_sent_emails(), 1)
+        self.assertEqual(set(OutgoingEmail.objects.values_list('to', flat=True)), {'recent@example.com', 'pending@example.com'})
+
+    def test_loop_survives_connection_failures(self):
+        User.objects.create_user(username='later', email='later@example.com', password='password')
+
+        class StopLoop(Exception):
+            pass
+
+        open_calls = iter([OSError('SMTP down'), OSError('SMTP down')])
+        def flaky_open(self):
+            error = next(open_calls, None)
+            if error:
+                raise error
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', flaky_open, create=True), \
+                mock.patch('users.management.commands.send_queued_emails.time.sleep', side_effect=[None, None, StopLoop]) as sleep, \
+                self.assertLogs('users.management.commands.send_queued_emails', 'ERROR'):
+            with self.assertRaises(StopLoop):
+                call_command('send_queued_emails', loop=True, sleep=5, stdout=StringIO())
+        # Deux échecs avec attente croissante, puis l'envoi et l'attente normale sur une file vide
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [5, 10, 5])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.Status.SENT)
+
+    def test_single_pass_still_reports_connection_failure(self):
+        User.objects.create_user(username='later', email='later@example.com', password='password')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('SMTP down'), create=True):
+            with self.assertRaises(OSError):
+                call_command('send_queued_emails', stdout=StringIO())
+        self.assertIsNone(OutgoingEmail.objects.get().locked_until)
+
+
+class EmailOrMatriculeBackendTest(TestCase):
+    def setUp(self):
+        self.backend = EmailOrMatriculeBackend()
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='password', role=User.Role.ETUDIANT, matricule='ISTC0001')
+
+    def test_authenticate_with_each_identifier(self):
+        for identifier in ('ISTC0001', 'student', 'student@example.com', ' student@example.com '):
+            self.assertEqual(self.backend.authenticate(None, username=identifier, password='password'), self.student)
+        self.assertIsNone(self.backend.authenticate(None, username='student', password='wrong'))
+        self.assertIsNone(self.backend.authenticate(None, username='nobody', password='password'))
+
+    def test_lookup_uses_one_indexed_query_per_probe(self):
+        with self.assertNumQueries(1):
+            self.backend.find_user('ISTC0001')
+        with self.assertNumQueries(3):
+            self.backend.find_user('student@example.com')
+
+    def test_colliding_identifiers_do_not_raise(self):
+        # Le nom d'utilisateur de l'un est l'e-mail de l'autre: le nom d'utilisateur est prioritaire
+        other = User.objects.create_user(username='student@example.com', email='other@example.com', password='other')
+        self.assertEqual(self.backend.authenticate(None, username='student@example.com', password='other'), other)
+        # Un e-mail partagé par deux comptes est ambigu
+        User.objects.create_user(username='twin', email='other@example.com', password='password')
+        self.assertIsNone(self.backend.find_user('other@example.com'))
+
+    def test_benchmark_login_command(self):
+        out = StringIO()
+        call_command('benchmark_login', samples=5, compare_legacy=True, stdout=out)
+        self.assertIn('queries/lookup', out.getvalue())
+        self.assertIn('legacy OR', out.getvalue())
+
+class CachedSessionUserTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.backend = EmailOrMatriculeBackend()
+        self.admin_user = User.objects.create_user(username='admin', email='admin@example.com', password='password', role=User.Role.ADMIN, is_staff=True)
+        self.student = User.objects.create_user(username='student', email='student@example.com', password='password', role=User.Role.ETUDIANT)
+
+    def test_get_user_is_cached(self):
+        self.assertEqual(self.backend.get_user(self.student.pk), self.student)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.backend.get_user(self.student.pk), self.student)
+        self.assertIsNone(self.backend.get_user(0))
+
+    def test_profile_update_invalidates_cache(self):
+        self.client.login(username='student', password='password')
+        self.backend.get_user(self.student.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('users:profile'), {'first_name': 'Nouveau', 'last_name': 'Nom', 'email': 'student@example.com'})
+        self.assertEqual(self.backend.get_user(self.student.pk).first_name, 'Nouveau')
+
+    def test_lock_user_ends_open_sessions_immediately(self):
+        student_client = Client()
+        student_client.login(username='student', password='password')
+        self.assertEqual(student_client.get(reverse('users:etudiant_dashboard')).status_code, 200)
+        self.client.login(username='admin', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('administration:api_lock_user', args=[self.student.pk]))
+        self.assertIsNone(self.backend.get_user(self.student.pk))
+        self.assertEqual(student_client.get(reverse('users:etudiant_dashboard')).status_code, 302)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('administration:api_unlock_user', args=[self.student.pk]))
+        self.assertEqual(self.backend.get_user(self.student.pk), self.student)
+
+class UserSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.amelie = User.objects.create_user(username='amelie', email='amelie.durand@example.com', password='password',
+                                               first_name='Amélie', last_name='Durand', matricule='ETU2024001')
+        self.marc = User.objects.create_user(username='mdupont', email='marc@example.com', password='password',
+                                             first_name='Marc', last_name='Dupont', role=User.Role.ENSEIGNANT)
+
+    def names(self, results):
+        return [result['name'] for result in results]
+
+    def test_prefix_search_on_every_field(self):
+        self.assertEqual(self.names(search_users('ame')), ['Amélie Durand'])
+        self.assertEqual(self.names(search_users('etu2024')), ['Amélie Durand'])
+        self.assertEqual(self.names(search_users('du')), ['Marc Dupont', 'Amélie Durand'])
+        self.assertEqual(self.names(search_users('du mar')), ['Marc Dupont'])
+        # Recherche par préfixe: pas de correspondance au milieu d'un mot
+        self.assertEqual(search_users('pont'), [])
+
+    def test_role_and_exclude(self):
+        self.assertEqual(self.names(search_users('du', role=User.Role.ENSEIGNANT)), ['Marc Dupont'])
+        self.assertEqual(self.names(search_users('du', exclude=self.amelie)), ['Marc Dupont'])
+
+    def test_results_cached_and_invalidated_on_save(self):
+        search_users('du')
+        with self.assertNumQueries(0):
+            search_users('du')
+        self.marc.last_name = 'Martin'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.marc.save()
+        self.assertEqual(self.names(search_users('du')), ['Amélie Durand'])
+        self.assertEqual(self.names(search_users('mart')), ['Marc Martin'])
+
+    def test_login_does_not_reindex(self):
+        with self.assertNumQueries(1):
+            self.marc.save(update_fields=['last_login'])
+
+    def test_rebuild_index(self):
+        self.amelie.search_terms.all().delete()
+        rebuild_user_search_index()
+        cache.clear()
+        self.assertEqual(self.names(search_users('amel')), ['Amélie Durand'])
+
+    def test_user_deleted_during_search_is_skipped(self):
+        # Suppression concurrente: l'index a encore renvoyé l'identifiant, la table ne l'a plus
+        in_bulk = QuerySet.in_bulk
+        def racing_in_bulk(queryset, id_list=None, **kwargs):
+            User.objects.filter(pk=self.marc.pk).delete()
+            return in_bulk(queryset, id_list, **kwargs)
+        with mock.patch.object(QuerySet, 'in_bulk', racing_in_bulk):
+            self.assertEqual(self.names(search_users('du')), ['Amélie Durand'])
+
+    def test_migration_terms_match_runtime_terms(self):
+        migration = import_module('users.migrations.0008_user_search_terms')
+        UserSearchTerm.objects.all().delete()
+        migration.build_search_terms(global_apps, None)
+        for user in (self.amelie, self.marc):
+            self.assertEqual(set(user.search_terms.values_list('term', flat=True)), user_terms(user))
+
+
 class UserFormTest(TestCase):
     def test_custom_user_creation_form_valid(self):
         form_data = {
@@ -126,6 +351,29 @@ class UserViewTest(TestCase):
         self.assertContains(response, 'Python Basics')
         self.assertNotContains(response, 'Java Advanced')
 
+    def test_etudiant_dashboard_query_count_does_not_grow_with_courses(self):
+        cache.clear()
+        self.client.login(username='student', password='password')
+
+        def dashboard_queries():
+            self.client.get(reverse('users:etudiant_dashboard'))  # remplit les caches
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('users:etudiant_dashboard'))
+            return response, len(queries)
+
+        for i in range(2):
+            self.student_user.courses.add(Course.objects.create(title=f'Cours {i}', description='Desc', teacher=self.teacher_user))
+        response, few = dashboard_queries()
+        for i in range(2, 10):
+            course = Course.objects.create(title=f'Cours {i}', description='Desc', teacher=self.teacher_user)
+            if i % 2:
+                self.student_user.courses.add(course)
+        response, many = dashboard_queries()
+        self.assertEqual(few, many)
+        enrolled = [course for course in response.context['courses'] if course.is_enrolled]
+        self.assertEqual(len(enrolled), 6)
+        self.assertContains(response, 'aria-label="Se désinscrire"', count=6)
+
 
 class UserAPITest(TestCase):
     def setUp(self):
@@ -8,13 +8,15 @@ from users.forms import UserProfileForm
 from .decorators import role_required
 from .models import User
 from django.contrib.auth.views import LoginView, PasswordResetView, PasswordResetConfirmView
-from django.db.models import Q
 from django.contrib.auth.forms import AuthenticationForm
 from courses.models import Course
 from courses.forms import CourseForm, TeacherCourseForm
 from courses.models import CourseProgress
-from evaluations.models import Activite, Soumission, Question, Choix, Tentative, QuestionSondage, ReponseSondage
+from courses.membership import enrolled_course_ids, is_enrolled
+from courses.catalog import catalog_page
+from evaluations.models import Activite, Soumission, Choix, Tentative, QuestionSondage, ReponseSondage
 from evaluations.forms import SoumissionForm
+from evaluations.answer_key import get_answer_key, grade_quiz
 import json
 from django.contrib import messages
 
@@ -72,17 +74,33 @@ def landing_page(request):
 @login_required
 @role_required(User.Role.ETUDIANT)
 def etudiant_dashboard(request):
-    query = request.GET.get('q')
-    if query:
-        courses = Course.objects.filter(Q(title__icontains=query) | Q(description__icontains=query)).order_by('-created_at')
-    else:
-        courses = Course.objects.all().order_by('-created_at')
-    return render(request, 'users/dashboard_etudiant.html', {'courses': courses})
+    query = request.GET.get('q', '').strip()
+    category = request.GET.get('category')
+    catalog = catalog_page(query=query, category=category, cursor=request.GET.get('after'))
+    courses = catalog['courses']
+    # Progression lue depuis les compteurs stockés: une seule requête pour la page
+    progress_by_course = {
+        progress.course_id: progress
+        for progress in CourseProgress.objects.filter(student=request.user, course__in=courses)
+    }
+    # Ensemble des cours suivis, en cache: aucune requête par carte de cours
+    enrolled_ids = enrolled_course_ids(request.user)
+    for course in courses:
+        course.student_progress = progress_by_course.get(course.pk)
+        course.is_enrolled = course.pk in enrolled_ids
+    return render(request, 'users/dashboard_etudiant.html', {
+        'courses': courses,
+        'query': query,
+        'category': category,
+        'facets': catalog['facets'],
+        'total': catalog['total'],
+        'next_cursor': catalog['next_cursor'],
+    })
 
 @login_required
 @role_required(User.Role.ENSEIGNANT)
 def enseignant_dashboard(request):
-    courses = Course.objects.filter(teacher=request.user).order_by('-created_at')
+    courses = Course.objects.filter(teacher=request.user).select_related('stats').order_by('-created_at')
     return render(request, 'users/dashboard_enseignant.html', {'courses': courses})
 
 # API pour les cours (enseignants)
@@ -164,7 +182,7 @@ def student_course_detail(request, course_id):
     from django.http import Http404
     try:
         course = Course.objects.get(pk=course_id)
-        if not request.user.courses.filter(pk=course_id).exists():
+        if not is_enrolled(request.user, course_id):
             raise PermissionDenied("Vous n'êtes pas inscrit à ce cours.")
         activites = course.activites.all().order_by('due_date')
         annonces = course.annonces.all()
@@ -179,7 +197,7 @@ def student_course_detail(request, course_id):
             question__activite__in=activites
         ).values_list('question__activite_id', flat=True).distinct()
 
-        progress, created = CourseProgress.objects.get_or_create(student=request.user, course=course)
+        progress, created = CourseProgress.get_or_create_for(request.user, course)
         completed_ressources_ids = progress.completed_ressources.values_list('id', flat=True)
 
         context = {
@@ -255,29 +273,16 @@ def take_quiz(request, activity_id):
         # Rediriger vers une page de résultats ou un message indiquant que le quiz a déjà été passé
         return render(request, 'users/quiz_already_taken.html', {'activite': activite})
 
-    questions = activite.questions.all().order_by('id')
-    if not questions.exists():
+    # Corrigé compilé et mis en cache: la correction se fait en mémoire
+    answer_key = get_answer_key(activite)
+    if not answer_key:
         return render(request, 'users/quiz_no_questions.html', {'activite': activite})
 
     if request.method == 'POST':
         # Logique de traitement des réponses du quiz
-        score = 0
-        total_questions = questions.count()
+        score = grade_quiz(answer_key, request.POST)
+        total_questions = len(answer_key)
 
-        for question in questions:
-            if question.type_question == Question.QuestionType.CHOIX_UNIQUE:
-                submitted_choice_id = request.POST.get(f'question_{question.id}')
-                correct_choice = question.choix.filter(est_correct=True).first()
-                if correct_choice and str(correct_choice.id) == submitted_choice_id:
-                    score += 1
-            elif question.type_question == Question.QuestionType.CHOIX_MULTIPLE:
-                submitted_choices_ids = request.POST.getlist(f'question_{question.id}')
-                correct_choices = set(question.choix.filter(est_correct=True).values_list('id', flat=True))
-                submitted_choices = set(map(int, submitted_choices_ids))
-
-                if correct_choices == submitted_choices:
-                    score += 1
-        
         # Enregistrer la tentative
         Tentative.objects.create(
             activite=activite,
@@ -289,6 +294,7 @@ def take_quiz(request, activity_id):
         return render(request, 'users/quiz_results.html', {'activite': activite, 'score': score, 'total_questions': total_questions})
 
     # Afficher la première question (ou toutes les questions pour un quiz simple)
+    questions = activite.questions.prefetch_related('choix').order_by('id')
     return render(request, 'users/take_quiz.html', {'activite': activite, 'questions': questions})
 
 @login_required